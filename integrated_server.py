@@ -5,14 +5,16 @@ Combines blood test reference API with MCP protocol support
 """
 
 from fastmcp import FastMCP
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Dict, List, Any, Optional, Callable
 from abc import ABC, abstractmethod
 import json
 import yaml
 from pathlib import Path
+import hmac
 import logging
 import os
 
@@ -25,8 +27,8 @@ from bloodtest_tools.reference_values import (
 
 # Import the sequential thinking tool
 from utils.sequential_thinking import setup_sequential_thinking_tool
-# Import RAG system
-from utils.rag_system import RAGSystem, setup_rag_tool
+# The RAG system (langchain, sentence-transformers, torch, faiss) is imported
+# only when the book config enables it, see _init_rag_system
 
 # Configuration classes (same as before)
 class BookConfig(BaseModel):
@@ -118,12 +120,47 @@ class IntegratedBloodtestServer:
         index_directory = os.getenv("INDEX_DIRECTORY", rag_config.get("index_directory", "./faiss_index"))
         
         try:
+            from utils.rag_system import RAGSystem
+            
             self.rag_system = RAGSystem(
                 index_name=index_name,
                 index_directory=index_directory,
                 chunk_size=rag_config.get("chunk_size", 1000),
                 chunk_overlap=rag_config.get("chunk_overlap", 200),
-                embedding_model=rag_config.get("embedding_model", "sentence-transformers/all-MiniLM-L6-v2")
+                embedding_model=rag_config.get("embedding_model", "sentence-transformers/all-MiniLM-L6-v2"),
+                search_workers=int(os.getenv("RAG_SEARCH_WORKERS", rag_config.get("search_workers", 0))) or None,
+                max_pending_searches=rag_config.get("max_pending_searches", 64),
+                query_cache_size=rag_config.get("query_cache_size", 1024),
+                result_cache_size=rag_config.get("result_cache_size", 256),
+                result_cache_ttl=rag_config.get("result_cache_ttl", 3600),
+                result_cache_backend=rag_config.get("result_cache_backend", "memory"),
+                result_cache_path=rag_config.get("result_cache_path"),
+                batch_window_ms=rag_config.get("batch_window_ms", 2.0),
+                max_batch_size=rag_config.get("max_batch_size", 32),
+                index_factory=rag_config.get("index_factory", "Flat"),
+                metric=rag_config.get("metric", "l2"),
+                nprobe=rag_config.get("nprobe"),
+                ef_search=rag_config.get("ef_search"),
+                refine_k_factor=rag_config.get("refine_k_factor"),
+                mmap_index=rag_config.get("mmap_index", False),
+                prefault_index=rag_config.get("prefault_index", False),
+                # Bind the port right away; the model and index load in the background
+                background_warmup=rag_config.get("background_warmup", True),
+                warmup_wait=rag_config.get("warmup_wait_seconds", 2.0),
+                embedding_backend=os.getenv("RAG_EMBEDDING_BACKEND", rag_config.get("embedding_backend", "torch")),
+                onnx_quantize=rag_config.get("onnx_quantize", True),
+                onnx_threads=rag_config.get("onnx_threads"),
+                onnx_model_dir=rag_config.get("onnx_model_dir"),
+                retrieval_mode=rag_config.get("retrieval_mode", "hybrid"),
+                rrf_k=rag_config.get("rrf_k", 60),
+                fusion_candidates=rag_config.get("fusion_candidates", 20),
+                lexical_fast_path=rag_config.get("lexical_fast_path", True),
+                rerank=rag_config.get("rerank"),
+                rerank_candidates=rag_config.get("rerank_candidates", 50),
+                rerank_budget_ms=rag_config.get("rerank_budget_ms", 50.0),
+                reranker_model=rag_config.get("reranker_model"),
+                merge_adjacent=rag_config.get("merge_adjacent", True),
+                index_watch_interval=rag_config.get("index_watch_interval")
             )
             self.logger.info("RAG system initialized successfully")
         except Exception as e:
@@ -172,6 +209,7 @@ class IntegratedBloodtestServer:
         
         if self.rag_system:
             try:
+                from utils.rag_system import setup_rag_tool
                 setup_rag_tool(self.mcp, self.rag_system)
                 self.logger.info("RAG tool setup successfully")
             except Exception as e:
@@ -226,6 +264,9 @@ Strictly apply the book's methodology using the information provided.
                     "GET /parameters": "List all available parameters",
                     "GET /reference/{parameter}": "Get reference range for a specific parameter",
                     "GET /health": "Health check endpoint",
+                    "GET /ready": "Readiness endpoint (RAG warm-up state)",
+                    "GET /search/stream": "Streaming book search (Server-Sent Events)",
+                    "POST /admin/reload-index": "Hot-reload the rebuilt RAG index (requires RAG_ADMIN_TOKEN)",
                     "GET /sse": "MCP Server-Sent Events endpoint"
                 },
                 "mcp_enabled": True,
@@ -247,6 +288,52 @@ Strictly apply the book's methodology using the information provided.
                 }
             }
         
+        @self.mcp.get("/ready")
+        async def ready_check():
+            """Readiness endpoint: 503 until the RAG model and index are loaded"""
+            if self.rag_system:
+                readiness = self.rag_system.readiness()
+            else:
+                readiness = {"ready": True, "state": "disabled", "error": None, "components": {}}
+            return JSONResponse(
+                {
+                    "status": "ready" if readiness["ready"] else readiness["state"],
+                    "rag": readiness
+                },
+                status_code=200 if readiness["ready"] else 503
+            )
+        
+        @self.mcp.get("/search/stream")
+        async def search_stream(query: str, max_results: int = 5, book_title: Optional[str] = None):
+            """Stream one "result" event per ranked chunk, then a "summary" event"""
+            if not self.rag_system:
+                raise HTTPException(status_code=404, detail="RAG is not enabled")
+            from utils.rag_system import stream_search_events
+            return StreamingResponse(
+                stream_search_events(
+                    self.rag_system,
+                    query,
+                    k=max_results,
+                    filter_metadata={"book_title": book_title} if book_title else None
+                ),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+        
+        @self.mcp.post("/admin/reload-index")
+        async def reload_index(force: bool = False, authorization: Optional[str] = Header(None)):
+            """Load the rebuilt FAISS index in the background and swap it in"""
+            if not self.rag_system:
+                raise HTTPException(status_code=404, detail="RAG is not enabled")
+            # Bearer token required; without RAG_ADMIN_TOKEN the endpoint is disabled
+            token = os.getenv("RAG_ADMIN_TOKEN")
+            if not token:
+                raise HTTPException(status_code=403, detail="Index reload is disabled (RAG_ADMIN_TOKEN not set)")
+            if not hmac.compare_digest((authorization or "").encode(), f"Bearer {token}".encode()):
+                raise HTTPException(status_code=401, detail="Unauthorized")
+            result = await self.rag_system.areload_index(force=force)
+            return JSONResponse(result, status_code=500 if result["status"] == "error" else 200)
+        
         @self.mcp.get("/parameters")
         async def get_parameters():
             """List all available blood test parameters"""
@@ -298,6 +385,9 @@ if __name__ == "__main__":
     print("Available endpoints:")
     print("  - API: http://localhost:8000/")
     print("  - Health: http://localhost:8000/health") 
+    print("  - Ready: http://localhost:8000/ready")
+    print("  - Search stream: http://localhost:8000/search/stream?query=...")
+    print("  - Index reload: POST http://localhost:8000/admin/reload-index")
     print("  - Parameters: http://localhost:8000/parameters")
     print("  - Reference: http://localhost:8000/reference/{parameter}")
     print("  - MCP SSE: http://localhost:8000/sse")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Embedding backend benchmark: parity and latency/throughput comparison.
+
+Encodes the same texts with each backend (PyTorch, ONNX fp32, ONNX int8) and
+reports:
+- load time,
+- single-query latency (p50/p95),
+- batch throughput (texts/s),
+- cosine similarity of each backend's embeddings against the reference
+  backend (torch by default).
+
+The run fails if any backend's minimum cosine falls below --min-cosine.
+
+Usage:
+    python scripts/benchmark_embeddings.py
+    python scripts/benchmark_embeddings.py --threads 1 --threads 4
+    python scripts/benchmark_embeddings.py --index-directory faiss_index --index-name supplement-therapy
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.chunk_store import ChunkStore
+from utils.embeddings import PARITY_SENTENCES, cosine_parity, create_embedding_backend
+
+BACKENDS = {
+    "torch": {"backend": "torch"},
+    "onnx-fp32": {"backend": "onnx", "quantize": False},
+    "onnx-int8": {"backend": "onnx", "quantize": True},
+}
+
+
+def load_texts(index_directory: Optional[str], index_name: Optional[str], count: int) -> List[str]:
+    """Chunks of an existing index, or synthetic chunk-sized texts"""
+    if index_directory and index_name and ChunkStore.exists(Path(index_directory), index_name):
+        chunks = ChunkStore.load(Path(index_directory), index_name)
+        rows = np.random.default_rng(0).choice(len(chunks), size=min(count, len(chunks)), replace=False)
+        return [chunks.get_text(int(row)) for row in rows]
+    texts = []
+    for i in range(count):
+        start = i % len(PARITY_SENTENCES)
+        texts.append(". ".join(PARITY_SENTENCES[start:] + PARITY_SENTENCES[:start]) * (1 + i % 4))
+    return texts
+
+
+def benchmark(backend, queries: List[str], texts: List[str], batch_size: int) -> Dict[str, float]:
+    """Single-query latency and batch throughput of one backend"""
+    backend.embed_query("warm-up")
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        backend.embed_query(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    for start in range(0, len(texts), batch_size):
+        backend.embed_documents(texts[start:start + batch_size])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+        "texts_per_s": len(texts) / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--reference", default="torch", choices=list(BACKENDS),
+                        help="Backend the others are compared against")
+    parser.add_argument("--threads", type=int, action="append",
+                        help="ONNX Runtime intra-op threads (repeatable, default: ORT default)")
+    parser.add_argument("--model-dir", default="faiss_index/onnx", help="Exported ONNX models")
+    parser.add_argument("--queries", type=int, default=200, help="Single queries timed")
+    parser.add_argument("--texts", type=int, default=256, help="Texts encoded for throughput")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--index-directory", help="Sample texts from this index's chunk store")
+    parser.add_argument("--index-name")
+    parser.add_argument("--min-cosine", type=float, default=0.98,
+                        help="Minimum cosine similarity against the reference backend")
+    args = parser.parse_args()
+
+    texts = load_texts(args.index_directory, args.index_name, args.texts)
+    queries = [PARITY_SENTENCES[i % len(PARITY_SENTENCES)] for i in range(args.queries)]
+    parity_texts = PARITY_SENTENCES + texts[:64]
+
+    runs = []
+    names = [args.reference] + [name for name in args.backends if name != args.reference]
+    for name in names:
+        for threads in (args.threads or [None]) if name.startswith("onnx") else [None]:
+            label = f"{name} ({threads} threads)" if threads else name
+            started = time.perf_counter()
+            try:
+                backend = create_embedding_backend(
+                    args.model,
+                    model_dir=args.model_dir,
+                    intra_op_threads=threads,
+                    **BACKENDS[name]
+                )
+            except Exception as e:
+                print(f"{label}: unavailable ({e})")
+                continue
+            load_s = time.perf_counter() - started
+            result = benchmark(backend, queries, texts, args.batch_size)
+            runs.append((name, label, load_s, result, backend.embed_documents(parity_texts)))
+
+    if not runs:
+        sys.exit("No embedding backend could be loaded")
+
+    reference = next((embedded for name, _, _, _, embedded in runs if name == args.reference), None)
+    if reference is None:
+        print(f"Reference backend '{args.reference}' unavailable: parity not checked")
+
+    print(f"\n{len(queries)} single queries, {len(texts)} texts in batches of {args.batch_size}\n")
+    print(f"{'backend':<26} {'load s':>7} {'p50 ms':>8} {'p95 ms':>8} {'texts/s':>9} {'min cos':>8} {'mean cos':>9}")
+    failed = False
+    for name, label, load_s, result, embedded in runs:
+        parity = {"min_cosine": float("nan"), "mean_cosine": float("nan")}
+        if reference is not None:
+            parity = cosine_parity(reference, embedded)
+            failed |= parity["min_cosine"] < args.min_cosine
+        print(
+            f"{label:<26} {load_s:>7.2f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+            f"{result['texts_per_s']:>9.1f} {parity['min_cosine']:>8.4f} {parity['mean_cosine']:>9.4f}"
+        )
+
+    if failed:
+        print(f"\nParity check failed: a backend is below min cosine {args.min_cosine}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Offline RAG search benchmark, using the deterministic hashing embedder.
+
+Builds a synthetic corpus of chunk-sized texts, indexes it with each FAISS
+index type through RAGSystem.index_texts and reports:
+- index build time, bytes/vector and recall@10 against an exact index,
+- single-search latency (p50/p95) with the result cache off and warm,
+- search_batch throughput (queries/s),
+- concurrent asearch throughput (queries/s, micro-batched).
+
+No model weights or network access are needed, so the search path can be
+benchmarked in any sandbox at realistic dimensions and corpus sizes.
+
+Usage:
+    python scripts/benchmark_rag.py
+    python scripts/benchmark_rag.py --chunks 50000 --factories Flat HNSW32 IVF256,Flat
+    python scripts/benchmark_rag.py --dimension 768 --concurrency 64
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.rag_system import RAGSystem
+
+VOCABULARY = (
+    "ferritin iron vitamin magnesium zinc selenium omega homocysteine b12 folate "
+    "thyroid tsh cortisol insulin glucose hba1c cholesterol ldl hdl triglycerides "
+    "crp inflammation optimal level range deficiency supplement dose daily morning "
+    "evening absorption fatigue sleep energy muscle bone immune liver kidney blood "
+    "test laboratory therapy lifestyle nutrition protein fat carbohydrate fiber"
+).split()
+
+
+def synthetic_corpus(count: int, words_per_chunk: int, seed: int = 0) -> List[str]:
+    """Chunk-sized pseudo-texts drawn from a blood-test vocabulary (Zipf-like)"""
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, len(VOCABULARY) + 1)
+    weights /= weights.sum()
+    words = rng.choice(len(VOCABULARY), size=(count, words_per_chunk), p=weights)
+    return [" ".join(VOCABULARY[w] for w in row) + f" section {i}." for i, row in enumerate(words)]
+
+
+def percentiles(latencies_ms: List[float]) -> Dict[str, float]:
+    latencies_ms = sorted(latencies_ms)
+    return {
+        "p50_ms": statistics.median(latencies_ms),
+        "p95_ms": latencies_ms[int(0.95 * (len(latencies_ms) - 1))],
+    }
+
+
+def time_searches(rag: RAGSystem, queries: List[str], k: int) -> Dict[str, float]:
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        rag.search(query, k=k)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return percentiles(latencies)
+
+
+async def concurrent_qps(rag: RAGSystem, queries: List[str], k: int, concurrency: int) -> float:
+    """Queries/s of asearch with `concurrency` callers in flight"""
+    pending = iter(queries)
+
+    async def caller():
+        for query in pending:
+            await rag.asearch(query, k=k)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    return len(queries) / (time.perf_counter() - started)
+
+
+def benchmark_factory(factory: str, texts: List[str], queries: List[str], args) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as directory:
+        options = dict(
+            index_name="benchmark",
+            index_directory=directory,
+            embedding_model=f"hashing:{args.dimension}",
+            index_factory=factory,
+            metric=args.metric,
+            nprobe=args.nprobe,
+            ef_search=args.ef_search,
+            retrieval_mode=args.retrieval_mode,
+        )
+        rag = RAGSystem(result_cache_size=0, batch_window_ms=0, **options)
+        metadatas = [{"book_title": f"book-{i % args.books}", "chunk_index": i} for i in range(len(texts))]
+        started = time.perf_counter()
+        rag.index_texts(texts, metadatas, rebuild=True)
+        build_s = time.perf_counter() - started
+        report = rag.index_config.get("build_report", {})
+
+        cold = time_searches(rag, queries, args.k)
+        started = time.perf_counter()
+        for start in range(0, len(queries), args.batch_size):
+            rag.search_batch(queries[start:start + args.batch_size], k=args.k)
+        batch_qps = len(queries) / (time.perf_counter() - started)
+        rag.close()
+
+        # Instances reloaded from the saved index
+        batched = RAGSystem(result_cache_size=0, batch_window_ms=2.0, **options)
+        async_qps = asyncio.run(concurrent_qps(batched, queries, args.k, args.concurrency))
+        batched.close()
+
+        cached = RAGSystem(result_cache_size=len(queries), batch_window_ms=0, **options)
+        cached.search_batch(queries, k=args.k)
+        warm = time_searches(cached, queries, args.k)
+        cached.close()
+
+    return {
+        "build_s": build_s,
+        "bytes_per_vector": report.get("bytes_per_vector", float("nan")),
+        "recall": report.get("recall_at_k") or float("nan"),
+        "cold_p50_ms": cold["p50_ms"],
+        "cold_p95_ms": cold["p95_ms"],
+        "cached_p50_ms": warm["p50_ms"],
+        "batch_qps": batch_qps,
+        "async_qps": async_qps,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20000, help="Chunks in the synthetic corpus")
+    parser.add_argument("--words", type=int, default=180, help="Words per chunk (~1000 characters)")
+    parser.add_argument("--dimension", type=int, default=384, help="Embedding dimension")
+    parser.add_argument("--books", type=int, default=10, help="Distinct book_title values")
+    parser.add_argument("--factories", nargs="+", default=["Flat", "HNSW32", "IVF256,Flat", "IVF256,SQ8"])
+    parser.add_argument("--metric", default="l2", choices=["l2", "ip"])
+    parser.add_argument("--retrieval-mode", default="hybrid", choices=["hybrid", "vector", "lexical"])
+    parser.add_argument("--nprobe", type=int)
+    parser.add_argument("--ef-search", type=int)
+    parser.add_argument("--queries", type=int, default=500, help="Distinct queries timed")
+    parser.add_argument("-k", type=int, default=5, help="Results per query")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent asearch callers")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    texts = synthetic_corpus(args.chunks, args.words)
+    queries = [" ".join(text.split()[:6]) for text in synthetic_corpus(args.queries, 12, seed=1)]
+    print(f"{len(texts)} chunks, {len(queries)} queries, dimension {args.dimension} "
+          f"(corpus built in {time.perf_counter() - started:.1f}s)\n")
+
+    print(f"{'factory':<16} {'build s':>8} {'B/vec':>7} {'recall':>7} {'p50 ms':>7} {'p95 ms':>7} "
+          f"{'cached':>7} {'batch q/s':>10} {'async q/s':>10}")
+    for factory in args.factories:
+        try:
+            r = benchmark_factory(factory, texts, queries, args)
+        except Exception as e:
+            print(f"{factory:<16} failed: {e}")
+            continue
+        print(
+            f"{factory:<16} {r['build_s']:>8.2f} {r['bytes_per_vector']:>7.1f} {r['recall']:>7.3f} "
+            f"{r['cold_p50_ms']:>7.2f} {r['cold_p95_ms']:>7.2f} {r['cached_p50_ms']:>7.3f} "
+            f"{r['batch_qps']:>10.0f} {r['async_qps']:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Import-time budget check for the server entry points.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter for
+each entry point and reports the cumulative import time, broken down by
+top-level package. It fails when:
+- an entry point imports one of the heavy RAG dependencies (langchain,
+  sentence-transformers, torch, faiss) at module import, or
+- the import takes longer than its budget.
+
+Usage:
+    python scripts/check_import_time.py
+    python scripts/check_import_time.py --budget server=2500 --top 15
+    python scripts/check_import_time.py --skip-budget server
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+REPO_ROOT = Path(__file__).parent.parent
+
+# Packages that must only load once a RAG index is configured and used
+HEAVY_PACKAGES = {
+    "langchain",
+    "langchain_community",
+    "langchain_core",
+    "langchain_text_splitters",
+    "sentence_transformers",
+    "transformers",
+    "torch",
+    "faiss",
+}
+
+# Cumulative import time budgets, in milliseconds
+DEFAULT_BUDGETS_MS = {
+    "server": 4000,
+    "integrated_server": 4000,
+    "run_health_lifestyle": 4000,
+    "utils.rag_system": 1000,
+}
+
+# utils.rag_system is the RAG module itself: FAISS is expected there
+ALLOWED_HEAVY = {
+    "utils.rag_system": {"faiss"},
+}
+
+
+def measure_imports(module: str) -> List[Tuple[str, int, int, int]]:
+    """
+    Import a module in a fresh interpreter with -X importtime.
+
+    Returns:
+        (module name, depth, self time in us, cumulative time in us) for every
+        imported module, in import completion order
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Cannot import {module}:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def breakdown(entries: List[Tuple[str, int, int, int]]) -> Dict[str, int]:
+    """Cumulative import time (us) per top-level package, for direct imports of the target"""
+    packages: Dict[str, int] = {}
+    for name, depth, _, cumulative_us in entries:
+        if depth == 1:
+            package = name.split(".")[0]
+            packages[package] = packages.get(package, 0) + cumulative_us
+    return packages
+
+
+def check_module(module: str, budget_ms: float, runs: int, top: int, skip_budget: bool) -> bool:
+    """Measure one entry point, print its report and return whether it passes"""
+    measurements = [measure_imports(module) for _ in range(runs)]
+    # The fastest run is the least disturbed by the machine's load
+    entries = min(measurements, key=lambda e: e[-1][3])
+    total_ms = entries[-1][3] / 1000
+
+    imported = {name.split(".")[0] for name, _, _, _ in entries}
+    heavy = sorted((imported & HEAVY_PACKAGES) - ALLOWED_HEAVY.get(module, set()))
+    over_budget = not skip_budget and total_ms > budget_ms
+
+    status = "FAIL" if heavy or over_budget else "OK"
+    budget = "not checked" if skip_budget else f"budget {budget_ms:.0f} ms"
+    print(f"\n[{status}] import {module}: {total_ms:.0f} ms ({budget}, best of {runs})")
+    for package, cumulative_us in sorted(breakdown(entries).items(), key=lambda p: -p[1])[:top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {package}")
+    if heavy:
+        print(f"  Heavy RAG dependencies imported at module import: {', '.join(heavy)}")
+    return status == "OK"
+
+
+def parse_budgets(values: List[str]) -> Dict[str, float]:
+    budgets = dict(DEFAULT_BUDGETS_MS)
+    for value in values:
+        module, _, budget = value.partition("=")
+        if not budget:
+            raise SystemExit(f"Invalid budget '{value}', expected MODULE=MS")
+        budgets[module] = float(budget)
+    return budgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", help="Modules to check (default: all entry points)")
+    parser.add_argument("--budget", action="append", default=[], metavar="MODULE=MS",
+                        help="Override the import time budget of a module")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per module, the fastest is kept")
+    parser.add_argument("--top", type=int, default=10, help="Packages shown in the breakdown")
+    parser.add_argument("--skip-budget", action="store_true",
+                        help="Only check that heavy dependencies are not imported")
+    args = parser.parse_args()
+
+    budgets = parse_budgets(args.budget)
+    modules = args.modules or list(DEFAULT_BUDGETS_MS)
+    results = [
+        check_module(module, budgets.get(module, float("inf")), args.runs, args.top, args.skip_budget)
+        for module in modules
+    ]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
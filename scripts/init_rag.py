@@ -29,12 +29,20 @@ def main():
     index_name = os.getenv("INDEX_NAME", "book_knowledge")
     index_directory = os.getenv("INDEX_DIRECTORY", "faiss_index")
     force_reindex = os.getenv("FORCE_REINDEX", "false").lower() == "true"
+    index_factory = os.getenv("INDEX_FACTORY", "Flat")
+    index_metric = os.getenv("INDEX_METRIC", "l2")
+    # Pipeline: lecture des PDFs en parallèle, embeddings par lots, une sauvegarde
+    ingest_workers = int(os.getenv("INGEST_WORKERS", os.cpu_count() or 1))
+    embed_batch_size = int(os.getenv("EMBED_BATCH_SIZE", 256))
+    checkpoint_every = int(os.getenv("CHECKPOINT_EVERY", 0)) or None
     
     logger.info("=== RAG Initialization Script (FAISS) ===")
     logger.info(f"PDF Directory: {pdf_directory}")
     logger.info(f"Index Name: {index_name}")
     logger.info(f"Index Directory: {index_directory}")
     logger.info(f"Force Reindex: {force_reindex}")
+    logger.info(f"Index Factory: {index_factory} ({index_metric})")
+    logger.info(f"Ingest Workers: {ingest_workers}, Embed Batch Size: {embed_batch_size}")
     
     # Trouver les PDFs dans le répertoire
     pdf_dir_path = Path(pdf_directory)
@@ -54,19 +62,23 @@ def main():
             index_name=index_name,
             index_directory=index_directory,
             chunk_size=1000,
-            chunk_overlap=200
+            chunk_overlap=200,
+            index_factory=index_factory,
+            metric=index_metric
         )
         
         total_chunks_added = 0
         
-        # Indexer chaque PDF
-        for pdf_path in pdf_files:
-            logger.info(f"--- Indexing {pdf_path.name} ---")
-            result = rag_system.index_pdf(
-                pdf_path=str(pdf_path),
-                force_reindex=force_reindex
-            )
-            
+        # Indexer les PDFs en pipeline
+        results = rag_system.index_pdfs(
+            [str(pdf_path) for pdf_path in pdf_files],
+            force_reindex=force_reindex,
+            parse_workers=ingest_workers,
+            embed_batch_size=embed_batch_size,
+            checkpoint_every=checkpoint_every
+        )
+        
+        for pdf_path, result in zip(pdf_files, results):
             if result["status"] == "success":
                 chunks = result.get('chunks_added', 0)
                 total_chunks_added += chunks
@@ -2,6 +2,7 @@
 # BASE FRAMEWORK
 # =======================
 
+import hmac
 import os
 
 from fastmcp import FastMCP
@@ -16,8 +17,8 @@ import logging
 
 # Import the sequential thinking tool
 from utils.sequential_thinking import setup_sequential_thinking_tool
-# Import RAG system
-from utils.rag_system import RAGSystem, setup_rag_tool
+# The RAG system (langchain, sentence-transformers, torch, faiss) is imported
+# only when the book config enables it, see _init_rag_system
 
 # Configuration de base pour un livre
 class BookConfig(BaseModel):
@@ -77,12 +78,47 @@ class BookMCPServer(ABC):
         index_directory = os.getenv("INDEX_DIRECTORY", rag_config.get("index_directory", "./faiss_index"))
         
         try:
+            from utils.rag_system import RAGSystem
+            
             self.rag_system = RAGSystem(
                 index_name=index_name,
                 index_directory=index_directory,
                 chunk_size=rag_config.get("chunk_size", 1000),
                 chunk_overlap=rag_config.get("chunk_overlap", 200),
-                embedding_model=rag_config.get("embedding_model", "sentence-transformers/all-MiniLM-L6-v2")
+                embedding_model=rag_config.get("embedding_model", "sentence-transformers/all-MiniLM-L6-v2"),
+                search_workers=int(os.getenv("RAG_SEARCH_WORKERS", rag_config.get("search_workers", 0))) or None,
+                max_pending_searches=rag_config.get("max_pending_searches", 64),
+                query_cache_size=rag_config.get("query_cache_size", 1024),
+                result_cache_size=rag_config.get("result_cache_size", 256),
+                result_cache_ttl=rag_config.get("result_cache_ttl", 3600),
+                result_cache_backend=rag_config.get("result_cache_backend", "memory"),
+                result_cache_path=rag_config.get("result_cache_path"),
+                batch_window_ms=rag_config.get("batch_window_ms", 2.0),
+                max_batch_size=rag_config.get("max_batch_size", 32),
+                index_factory=rag_config.get("index_factory", "Flat"),
+                metric=rag_config.get("metric", "l2"),
+                nprobe=rag_config.get("nprobe"),
+                ef_search=rag_config.get("ef_search"),
+                refine_k_factor=rag_config.get("refine_k_factor"),
+                mmap_index=rag_config.get("mmap_index", False),
+                prefault_index=rag_config.get("prefault_index", False),
+                # Bind the port right away; the model and index load in the background
+                background_warmup=rag_config.get("background_warmup", True),
+                warmup_wait=rag_config.get("warmup_wait_seconds", 2.0),
+                embedding_backend=os.getenv("RAG_EMBEDDING_BACKEND", rag_config.get("embedding_backend", "torch")),
+                onnx_quantize=rag_config.get("onnx_quantize", True),
+                onnx_threads=rag_config.get("onnx_threads"),
+                onnx_model_dir=rag_config.get("onnx_model_dir"),
+                retrieval_mode=rag_config.get("retrieval_mode", "hybrid"),
+                rrf_k=rag_config.get("rrf_k", 60),
+                fusion_candidates=rag_config.get("fusion_candidates", 20),
+                lexical_fast_path=rag_config.get("lexical_fast_path", True),
+                rerank=rag_config.get("rerank"),
+                rerank_candidates=rag_config.get("rerank_candidates", 50),
+                rerank_budget_ms=rag_config.get("rerank_budget_ms", 50.0),
+                reranker_model=rag_config.get("reranker_model"),
+                merge_adjacent=rag_config.get("merge_adjacent", True),
+                index_watch_interval=rag_config.get("index_watch_interval")
             )
             self.logger.info("RAG system initialized successfully with FAISS")
         except Exception as e:
@@ -255,6 +291,7 @@ Strictly apply the book's methodology using the information provided.
         if self.rag_system:
             self.logger.debug("Setting up RAG tool.")
             try:
+                from utils.rag_system import setup_rag_tool
                 setup_rag_tool(self.mcp, self.rag_system)
                 self.logger.info("RAG tool setup successfully.")
             except Exception as e:
@@ -280,20 +317,103 @@ Strictly apply the book's methodology using the information provided.
                 "rag_enabled": bool(self.rag_system)
             })
         
-        # Create a route for the health check
+        async def ready_check(request):
+            """Readiness endpoint: 503 until the RAG model and index are loaded"""
+            readiness = self._rag_readiness()
+            return JSONResponse(
+                {
+                    "status": "ready" if readiness["ready"] else readiness["state"],
+                    "rag": readiness
+                },
+                status_code=200 if readiness["ready"] else 503
+            )
+        
+        # Create routes for the health (liveness) and readiness checks
         health_route = Route("/health", health_check, methods=["GET"])
+        ready_route = Route("/ready", ready_check, methods=["GET"])
         
-        # Add the route to the FastMCP server's HTTP app
+        # Add the routes to the FastMCP server's HTTP app
         if not hasattr(self.mcp, '_additional_http_routes'):
             self.mcp._additional_http_routes = []
-        self.mcp._additional_http_routes.append(health_route)
+        self.mcp._additional_http_routes.extend([health_route, ready_route])
+        
+        self.logger.info("Health check endpoint configured at /health, readiness at /ready")
+    
+    def _setup_search_stream(self):
+        """Configures the streaming search endpoint (Server-Sent Events)"""
+        if not self.rag_system:
+            return
+        from starlette.responses import JSONResponse, StreamingResponse
+        from starlette.routing import Route
+        from utils.rag_system import stream_search_events
+        
+        async def search_stream(request):
+            """Streams one "result" event per ranked chunk, then a "summary" event"""
+            query = request.query_params.get("query")
+            if not query:
+                return JSONResponse({"error": "Missing 'query' parameter"}, status_code=400)
+            try:
+                max_results = int(request.query_params.get("max_results", 5))
+            except ValueError:
+                return JSONResponse({"error": "'max_results' must be an integer"}, status_code=400)
+            book_title = request.query_params.get("book_title")
+            return StreamingResponse(
+                stream_search_events(
+                    self.rag_system,
+                    query,
+                    k=max_results,
+                    filter_metadata={"book_title": book_title} if book_title else None
+                ),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
         
-        self.logger.info("Health check endpoint configured at /health")
+        if not hasattr(self.mcp, '_additional_http_routes'):
+            self.mcp._additional_http_routes = []
+        self.mcp._additional_http_routes.append(Route("/search/stream", search_stream, methods=["GET"]))
+        
+        self.logger.info("Streaming search endpoint configured at /search/stream")
+    
+    def _setup_admin_routes(self):
+        """Configures the index hot-reload endpoint (only when RAG_ADMIN_TOKEN is set)"""
+        if not self.rag_system:
+            return
+        token = os.getenv("RAG_ADMIN_TOKEN")
+        if not token:
+            self.logger.info("RAG_ADMIN_TOKEN not set; index reload endpoint disabled")
+            return
+        from starlette.responses import JSONResponse
+        from starlette.routing import Route
+        
+        async def reload_index(request):
+            """Loads the rebuilt FAISS index in the background and swaps it in"""
+            authorization = request.headers.get("authorization", "")
+            if not hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode()):
+                return JSONResponse({"error": "Unauthorized"}, status_code=401)
+            force = request.query_params.get("force", "false").lower() == "true"
+            result = await self.rag_system.areload_index(force=force)
+            return JSONResponse(result, status_code=500 if result["status"] == "error" else 200)
+        
+        if not hasattr(self.mcp, '_additional_http_routes'):
+            self.mcp._additional_http_routes = []
+        self.mcp._additional_http_routes.append(
+            Route("/admin/reload-index", reload_index, methods=["POST"])
+        )
+        
+        self.logger.info("Index reload endpoint configured at /admin/reload-index")
+    
+    def _rag_readiness(self) -> Dict[str, Any]:
+        """Readiness of the RAG system (always ready when RAG is disabled)"""
+        if not self.rag_system:
+            return {"ready": True, "state": "disabled", "error": None, "components": {}}
+        return self.rag_system.readiness()
     
     def run(self, **kwargs):
         """Starts the MCP server"""
         self.logger.info(f"Starting MCP server with args: {kwargs}")
         self._setup_health_check()
+        self._setup_search_stream()
+        self._setup_admin_routes()
         
         # Configure CORS middleware if using HTTP transport
         middleware = None
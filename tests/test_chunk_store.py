@@ -0,0 +1,101 @@
+"""
+Tests for the offset-indexed chunk store.
+"""
+from utils.chunk_store import ChunkStore
+
+
+def test_chunk_store_round_trip(tmp_path):
+    """Test that chunks saved to disk are read back identically."""
+    store = ChunkStore(tmp_path, "books")
+    ids = store.add(
+        ["Ferritin reflects iron stores.", "Vitamin D: 60–80 ng/ml optimal.", ""],
+        [
+            {"book_title": "Blutwerte", "page": 1},
+            {"book_title": "Blutwerte", "page": 2},
+            {"book_title": "Naehrstoff-Therapie", "page": 1}
+        ]
+    )
+    assert list(ids) == [0, 1, 2]
+    store.save()
+    store.close()
+
+    loaded = ChunkStore.load(tmp_path, "books")
+    assert len(loaded) == 3
+    assert loaded.get_text(1) == "Vitamin D: 60–80 ng/ml optimal."
+    assert loaded.get_text(2) == ""
+    assert loaded.get_metadata(2) == {"book_title": "Naehrstoff-Therapie", "page": 1}
+    assert loaded.column("book_title") == ["Blutwerte", "Blutwerte", "Naehrstoff-Therapie"]
+
+
+def test_chunk_store_append_after_load(tmp_path):
+    """Test that pending chunks are readable before save and appended on save."""
+    store = ChunkStore(tmp_path, "books")
+    store.add(["Ferritin"], [{"book_title": "Blutwerte"}])
+    store.save()
+
+    ids = store.add(["Magnesium"], [{"book_title": "Blutwerte", "chapter": "Minerals"}])
+    assert list(ids) == [1]
+    assert store.get_text(1) == "Magnesium"
+    assert store.stats()["pending_chunks"] == 1
+    store.save()
+    store.close()
+
+    loaded = ChunkStore.load(tmp_path, "books")
+    assert [loaded.get_text(i) for i in range(2)] == ["Ferritin", "Magnesium"]
+    # A column added later is absent from earlier chunks
+    assert loaded.get_metadata(0) == {"book_title": "Blutwerte"}
+    assert loaded.column("chapter") == [None, "Minerals"]
+
+
+def test_chunk_store_dictionary_encodes_metadata(tmp_path):
+    """Test that repeated metadata values are stored once per column."""
+    store = ChunkStore(tmp_path, "books")
+    store.add(["a", "b", "c"], [{"book_title": "Blutwerte", "page": 1}] * 3)
+    store.save()
+
+    assert store._values["book_title"] == ["Blutwerte"]
+    assert ChunkStore.exists(tmp_path, "books")
+    assert not ChunkStore.exists(tmp_path, "other")
+
+
+def test_chunk_store_deletes_and_compacts(tmp_path):
+    """Test that deletions keep row ids, persist, and are dropped by compaction."""
+    store = ChunkStore(tmp_path, "books")
+    store.add(["a", "b", "c", "d"], [{"page": i} for i in range(4)])
+    store.save()
+    assert store.delete([1, 3, 3, 9]) == 2
+    store.save()
+
+    loaded = ChunkStore.load(tmp_path, "books")
+    assert len(loaded) == 4
+    assert loaded.deleted_ids().tolist() == [1, 3]
+    assert loaded.live_ids().tolist() == [0, 2]
+    assert loaded.get_text(2) == "c"
+
+    compacted = loaded.compact(loaded.live_ids())
+    assert [compacted.get_text(i) for i in range(len(compacted))] == ["a", "c"]
+    assert compacted.get_metadata(1) == {"page": 2}
+    assert len(compacted.deleted_ids()) == 0
+    loaded.close()
+    assert len(ChunkStore.load(tmp_path, "books").deleted_ids()) == 0
+
+
+def test_chunk_store_save_appends_only_new_text(tmp_path):
+    """Test that a save appends new chunks to the text file instead of rewriting it."""
+    store = ChunkStore(tmp_path, "books")
+    store.add(["Ferritin"], [{"page": 1}])
+    store.save()
+    inode = store.text_path.stat().st_ino
+
+    store.add(["Magnesium"], [{"page": 2}])
+    store.save()
+    assert store.text_path.stat().st_ino == inode
+    assert store.text_path.read_bytes() == b"FerritinMagnesium"
+
+    # Pending chunks are saved before compaction copies the kept rows
+    store.add(["Zinc"], [{"page": 3}])
+    store.delete([0])
+    compacted = store.compact([1, 2])
+    assert [compacted.get_text(i) for i in range(len(compacted))] == ["Magnesium", "Zinc"]
+    assert compacted.get_metadata(1) == {"page": 3}
+    assert compacted.text_path.read_bytes() == b"MagnesiumZinc"
@@ -0,0 +1,71 @@
+"""
+Tests for the embedding backends.
+"""
+import numpy as np
+import pytest
+
+from utils.embeddings import PARITY_SENTENCES, _mean_pool, cosine_parity, create_embedding_backend
+
+
+def test_mean_pool_ignores_padding():
+    """Test that padded positions do not change the pooled embedding."""
+    hidden = np.array([[[1.0, 0.0], [0.0, 1.0], [9.0, 9.0]]], dtype=np.float32)
+    pooled = _mean_pool(hidden, np.array([[1, 1, 0]]))
+    np.testing.assert_allclose(pooled, [[2 ** -0.5, 2 ** -0.5]], rtol=1e-6)
+
+
+def test_cosine_parity_reports_min_and_mean():
+    """Test the row-wise cosine similarity summary."""
+    reference = np.array([[1.0, 0.0], [0.0, 1.0]])
+    candidate = np.array([[1.0, 0.0], [1.0, 1.0]])
+    parity = cosine_parity(reference, candidate)
+    assert parity["min_cosine"] == pytest.approx(2 ** -0.5, abs=1e-5)
+    assert parity["mean_cosine"] == pytest.approx((1 + 2 ** -0.5) / 2, abs=1e-5)
+
+
+def test_hashing_backend_is_deterministic():
+    """Test that the hashing embedder is deterministic, normalized and sized by its name."""
+    backend = create_embedding_backend("hashing:64")
+    embeddings = backend.embed_documents(PARITY_SENTENCES)
+    assert embeddings.shape == (len(PARITY_SENTENCES), 64)
+    np.testing.assert_allclose(np.linalg.norm(embeddings, axis=1), 1.0, rtol=1e-5)
+    again = create_embedding_backend("hashing:64").embed_query(PARITY_SENTENCES[0])
+    np.testing.assert_array_equal(again, embeddings[0])
+    assert create_embedding_backend("hashing").embed_query("ferritin").shape == (384,)
+
+
+def test_unknown_backend_is_rejected():
+    """Test that an unknown backend name raises a ValueError."""
+    with pytest.raises(ValueError):
+        create_embedding_backend("sentence-transformers/all-MiniLM-L6-v2", backend="tensorflow")
+
+
+def test_onnx_backend_matches_torch(tmp_path):
+    """Test the ONNX export of a small local BERT against its PyTorch embeddings."""
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("tokenizers")
+    pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+
+    words = " ".join(PARITY_SENTENCES).lower().replace(":", " ").replace("?", " ").split()
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + sorted(set(words))
+    model_path = tmp_path / "tiny-bert"
+    model_path.mkdir()
+    (model_path / "vocab.txt").write_text("\n".join(vocab))
+    transformers.BertTokenizerFast(str(model_path / "vocab.txt")).save_pretrained(str(model_path))
+    config = transformers.BertConfig(
+        vocab_size=len(vocab), hidden_size=32, num_hidden_layers=2,
+        num_attention_heads=2, intermediate_size=64
+    )
+    transformers.BertModel(config).save_pretrained(str(model_path))
+
+    backend = create_embedding_backend(
+        str(model_path), backend="onnx", model_dir=tmp_path / "onnx", quantize=False, intra_op_threads=1
+    )
+    assert backend.stats()["parity_vs_torch"]["min_cosine"] > 0.999
+
+    embeddings = backend.embed_documents(PARITY_SENTENCES)
+    assert embeddings.shape == (len(PARITY_SENTENCES), 32)
+    np.testing.assert_allclose(np.linalg.norm(embeddings, axis=1), 1.0, rtol=1e-5)
+    # Length-sorted batching keeps the input order
+    np.testing.assert_allclose(backend.embed_query(PARITY_SENTENCES[3]), embeddings[3], atol=1e-5)
@@ -0,0 +1,18 @@
+"""
+Tests that the server entry points do not import the heavy RAG dependencies.
+"""
+import subprocess
+import sys
+from pathlib import Path
+
+SCRIPT = Path(__file__).parent.parent / "scripts" / "check_import_time.py"
+
+
+def test_entry_points_do_not_import_rag_dependencies():
+    """Test that langchain, sentence-transformers, torch and faiss load lazily."""
+    result = subprocess.run(
+        [sys.executable, str(SCRIPT), "--skip-budget", "--runs", "1", "server", "integrated_server"],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,88 @@
+"""
+Tests for the BM25 lexical index.
+"""
+import threading
+
+import numpy as np
+
+from utils.lexical_index import LexicalIndex, tokenize
+
+CHUNKS = [
+    "Der optimale 25-OH Vitamin D Spiegel liegt zwischen 60 und 80 ng/ml.",
+    "Holotranscobalamin ist der aktive Anteil von Vitamin B12.",
+    "TSH über 2,5 deutet auf eine latente Schilddrüsenunterfunktion hin.",
+    "Vitamin D und Vitamin K2 gemeinsam einnehmen.",
+]
+
+
+def test_tokenize_normalizes_case_and_punctuation():
+    """Test that tokens are casefolded and split on punctuation."""
+    assert tokenize("25-OH Vitamin D") == ["25", "oh", "vitamin", "d"]
+    assert tokenize("Schilddrüse STRASSE Straße") == ["schilddrüse", "strasse", "strasse"]
+
+
+def test_search_ranks_exact_terms_first():
+    """Test BM25 ranking, filtering by candidate ids and the all-terms mode."""
+    index = LexicalIndex.build(CHUNKS)
+    assert index.search("holotranscobalamin", k=3)[0][0] == 1
+    assert [chunk_id for chunk_id, _ in index.search("vitamin d", k=4)][:2] == [3, 0]
+    assert [chunk_id for chunk_id, _ in index.search("vitamin", k=4, candidate_ids=np.array([1, 2]))] == [1]
+    assert index.search("vitamin d", k=4, require_all_terms=True) == index.search("vitamin d", k=2)
+    assert index.search("ferritin", k=4) == []
+
+
+def test_incremental_add_and_reload_match_a_full_build(tmp_path):
+    """Test that appended chunks and a saved index search like a full build."""
+    index = LexicalIndex.build(CHUNKS[:2])
+    index.add(range(2, 4), CHUNKS[2:])
+    index.save(tmp_path / "lexical.npz")
+    reloaded = LexicalIndex.load(tmp_path / "lexical.npz")
+
+    expected = LexicalIndex.build(CHUNKS)
+    for query in ["vitamin d", "TSH", "Holotranscobalamin B12"]:
+        assert index.search(query, k=4) == expected.search(query, k=4)
+        assert reloaded.search(query, k=4) == expected.search(query, k=4)
+    assert reloaded.stats() == expected.stats()
+
+
+def test_selective_queries():
+    """Test which queries qualify for the exact-term fast path."""
+    index = LexicalIndex.build(CHUNKS + ["Filler text about sleep."] * 36)
+    assert index.is_selective("TSH")
+    assert index.is_selective("Holotranscobalamin")
+    assert not index.is_selective("vitamin")  # in 3 of 40 chunks
+    assert not index.is_selective("ferritin")  # not indexed
+    assert not index.is_selective("TSH Holotranscobalamin 25 oh")  # too many terms
+
+
+def test_batched_adds_merge_once_into_the_same_postings():
+    """Test that adds stay pending until a search and then match a full build exactly."""
+    index = LexicalIndex.build(CHUNKS[:1])
+    for chunk_id in range(1, 4):
+        index.add([chunk_id], [CHUNKS[chunk_id]])
+    assert len(index) == 4 and index._pending_lengths
+
+    expected = LexicalIndex.build(CHUNKS)
+    assert index.search("vitamin", k=4) == expected.search("vitamin", k=4)
+    assert not index._pending_lengths
+    for name in ["_offsets", "_doc_ids", "_frequencies", "_doc_lengths"]:
+        assert np.array_equal(getattr(index, name), getattr(expected, name))
+
+
+def test_search_during_compaction_waits_for_the_merged_postings():
+    """Test that a concurrent search never reads postings merged without their length norms."""
+    index = LexicalIndex.build(CHUNKS[:1])
+    index.add(range(1, 4), CHUNKS[1:])
+    results = []
+    reader = threading.Thread(target=lambda: results.append(index.search("vitamin", k=4)))
+    length_norms_of = index._length_norms_of
+
+    def start_reader_mid_compaction(doc_lengths):
+        reader.start()
+        reader.join(timeout=0.2)
+        return length_norms_of(doc_lengths)
+
+    index._length_norms_of = start_reader_mid_compaction
+    index._compact()
+    reader.join()
+    assert results == [LexicalIndex.build(CHUNKS).search("vitamin", k=4)]
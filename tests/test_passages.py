@@ -0,0 +1,125 @@
+"""
+Tests for merging adjacent chunks into passages, collapsing duplicates and
+packing them into a budget.
+"""
+import pytest
+
+from utils.passages import (
+    budget_chars,
+    collapse_duplicates,
+    content_hash,
+    merge_adjacent_chunks,
+    pack_results,
+    strip_overlap,
+    truncate_at_sentence,
+)
+
+
+def chunk(source, chunk_index, content, score):
+    return {
+        "content": content,
+        "metadata": {"source": source, "chunk_index": chunk_index},
+        "similarity_score": score,
+    }
+
+
+def test_strip_overlap():
+    """Test that only a real overlap of at least a few characters is removed."""
+    previous = "Ferritin stores iron in the liver."
+    assert strip_overlap(previous, "in the liver. It is measured", 50) == " It is measured"
+    assert strip_overlap("Ends with a dot.", ". Starts", 50) == ". Starts"
+    assert strip_overlap("abcdefghij", "cdefghijkl", 5) == "cdefghijkl"
+
+
+def test_adjacent_chunks_are_merged_at_the_best_rank():
+    """Test that neighbouring chunks of a book become one passage without the overlap."""
+    results = [
+        chunk("a.pdf", 4, "optimal ferritin level is 70 to 150 ng/ml.", 0.1),
+        chunk("b.pdf", 1, "Vitamin D3 with K2.", 0.2),
+        chunk("a.pdf", 3, "Low ferritin causes fatigue. The optimal ferritin level", 0.3),
+        chunk("a.pdf", 9, "Unrelated section.", 0.4),
+        chunk("a.pdf", 5, "Retest after three months.", 0.5),
+    ]
+    passages = merge_adjacent_chunks(results, max_overlap=50)
+
+    assert [p["metadata"].get("merged_chunk_indices") for p in passages] == [[3, 4, 5], None, None]
+    assert passages[0]["content"] == (
+        "Low ferritin causes fatigue. The optimal ferritin level is 70 to 150 ng/ml.\n"
+        "Retest after three months."
+    )
+    assert passages[0]["similarity_score"] == 0.1
+    assert passages[0]["metadata"]["chunk_index"] == 3
+    assert [p["content"] for p in passages[1:]] == ["Vitamin D3 with K2.", "Unrelated section."]
+
+
+def test_results_without_chunk_metadata_are_kept():
+    """Test that results from different sources or without chunk_index are untouched."""
+    results = [
+        chunk("a.pdf", 1, "First.", 0.1),
+        chunk("b.pdf", 2, "Second.", 0.2),
+        {"content": "No metadata.", "metadata": {}, "similarity_score": 0.3},
+    ]
+    assert merge_adjacent_chunks(results, max_overlap=50) == results
+
+
+def test_truncate_at_sentence():
+    """Test that truncation keeps whole sentences, or whole words without any."""
+    text = "Ferritin stores iron. Low values cause fatigue! Retest in 3 months."
+    assert truncate_at_sentence(text, 200) == text
+    assert truncate_at_sentence(text, 50) == "Ferritin stores iron. Low values cause fatigue!"
+    assert truncate_at_sentence(text, 30) == "Ferritin stores iron."
+    assert truncate_at_sentence("no sentence end in this text", 15) == "no sentence end"
+
+
+def test_pack_results_fills_the_budget_in_rank_order():
+    """Test that packing skips duplicates, truncates the overflow and reports omissions."""
+    first = "Optimal ferritin is 70 to 150 ng/ml. " * 3
+    second = "Vitamin D3 should be taken with K2. Check the level twice a year. " * 3
+    results = [
+        chunk("a.pdf", 1, first, 0.1),
+        chunk("b.pdf", 7, " ".join(first.split()), 0.2),
+        chunk("a.pdf", 8, second, 0.3),
+        chunk("c.pdf", 2, "Magnesium in the evening. " * 10, 0.4),
+    ]
+    packed, report = pack_results(results, max_chars=len(first) + 100)
+
+    assert [r["metadata"]["source"] for r in packed] == ["a.pdf", "a.pdf"]
+    assert packed[0] == results[0]
+    assert packed[1]["truncated"] is True
+    assert packed[1]["content"] == "Vitamin D3 should be taken with K2. Check the level twice a year."
+    assert report["returned_chars"] == len(first) + len(packed[1]["content"])
+    assert report["returned_chars"] <= report["max_chars"]
+    assert report["omitted_results"] == 1
+    assert report["omitted_chars"] == len(second) - len(packed[1]["content"]) + 260
+    assert report["truncated"] is True
+
+
+def test_budget_chars_uses_the_tighter_limit():
+    """Test that a token budget converts to characters and the tighter budget wins."""
+    assert budget_chars() is None
+    assert budget_chars(max_tokens=100) == 400
+    assert budget_chars(max_tokens=100, max_chars=250) == 250
+    assert budget_chars(max_chars=1000, max_tokens=50) == 200
+
+
+def test_budget_chars_rejects_empty_budgets():
+    """Test that a zero or negative budget is an error instead of no limit."""
+    for budget in ({"max_tokens": 0}, {"max_chars": 0}, {"max_tokens": -5}, {"max_chars": -1, "max_tokens": 10}):
+        with pytest.raises(ValueError):
+            budget_chars(**budget)
+
+
+def test_duplicates_collapse_into_one_result_citing_every_book():
+    """Test that identical passages from two editions become one result at the best rank."""
+    text = "Zinc and copper compete for absorption."
+    results = [
+        chunk("2022.pdf", 4, text, 0.1),
+        chunk("other.pdf", 1, "Selenium supports the thyroid.", 0.2),
+        chunk("2023.pdf", 7, "Zinc and  copper compete\nfor absorption.", 0.3),
+    ]
+    assert content_hash(text) == content_hash(results[2]["content"])
+
+    collapsed = collapse_duplicates(results)
+    assert [r["metadata"]["source"] for r in collapsed] == ["2022.pdf", "other.pdf"]
+    assert collapsed[0]["metadata"]["sources"] == [{"source": "2022.pdf"}, {"source": "2023.pdf"}]
+    assert collapse_duplicates(results[:2]) == results[:2]
@@ -0,0 +1,80 @@
+"""
+Tests for the RAG cache primitives.
+"""
+import pytest
+
+from utils.rag_cache import LRUCache, SQLiteCache, create_cache
+
+
+def test_lru_cache_hit_and_miss_counters():
+    """Test that lookups are counted as hits or misses."""
+    cache = LRUCache(max_size=2)
+    assert cache.get("ferritin") is None
+    cache.put("ferritin", [0.1, 0.2])
+    assert cache.get("ferritin") == [0.1, 0.2]
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """Test that the least recently used entry is evicted first."""
+    cache = LRUCache(max_size=2)
+    cache.put("ferritin", 1)
+    cache.put("vitamin d", 2)
+    cache.get("ferritin")  # "vitamin d" is now the oldest entry
+    cache.put("magnesium", 3)
+
+    assert cache.get("vitamin d") is None
+    assert cache.get("ferritin") == 1
+    assert cache.get("magnesium") == 3
+    assert cache.stats()["evictions"] == 1
+    assert len(cache) == 2
+
+
+def test_lru_cache_disabled_with_zero_size():
+    """Test that a zero-sized cache never stores anything."""
+    cache = LRUCache(max_size=0)
+    cache.put("ferritin", 1)
+    assert cache.get("ferritin") is None
+    assert len(cache) == 0
+
+
+def test_lru_cache_entries_expire_after_ttl(monkeypatch):
+    """Test that entries older than the TTL are treated as misses."""
+    now = [1000.0]
+    monkeypatch.setattr("utils.rag_cache.time.monotonic", lambda: now[0])
+
+    cache = LRUCache(max_size=10, ttl=60)
+    cache.put("ferritin", 1)
+    now[0] += 59
+    assert cache.get("ferritin") == 1
+    now[0] += 2
+    assert cache.get("ferritin") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_sqlite_cache_persists_across_instances(tmp_path):
+    """Test that the SQLite backend survives a reopen and keeps the LRU bound."""
+    path = tmp_path / "results.sqlite"
+    cache = SQLiteCache(str(path), max_size=2)
+    cache.put("ferritin", [{"content": "Ferritin", "similarity_score": 0.5}])
+    cache.put("vitamin d", [])
+    cache.get("ferritin")  # "vitamin d" is now the oldest entry
+    cache.put("magnesium", [])
+
+    reopened = SQLiteCache(str(path), max_size=2)
+    assert reopened.get("ferritin") == [{"content": "Ferritin", "similarity_score": 0.5}]
+    assert reopened.get("vitamin d") is None
+    assert len(reopened) == 2
+    assert cache.stats()["evictions"] == 1
+
+
+def test_create_cache_backends(tmp_path):
+    """Test the cache factory."""
+    assert isinstance(create_cache("memory", max_size=4), LRUCache)
+    assert isinstance(create_cache("sqlite", path=str(tmp_path / "c.sqlite")), SQLiteCache)
+    with pytest.raises(ValueError, match="Unknown cache backend"):
+        create_cache("redis")
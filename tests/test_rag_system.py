@@ -0,0 +1,935 @@
+"""
+Offline tests for the RAG system, using the deterministic hashing embedder.
+"""
+import asyncio
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from utils.embeddings import HashingEmbeddingBackend
+from utils.faiss_index import (
+    build_index, enable_reconstruction, evaluate_index, exact_search, make_search_params, read_index
+)
+from utils.passages import strip_overlap
+from utils.rag_system import RAGSystem, setup_rag_tool, stream_search_events
+
+FERRITIN_BOOK = [
+    "Ferritin is the storage form of iron. An optimal ferritin level lies between 70 and 150 ng/ml.",
+    "Low ferritin causes fatigue, hair loss and reduced exercise tolerance.",
+]
+VITAMIN_D_BOOK = [
+    "Vitamin D3 should be taken together with vitamin K2 and magnesium.",
+    "The optimal 25-OH vitamin D level is between 60 and 80 ng/ml.",
+]
+
+MARKERS = ["ferritin", "vitamin D", "magnesium", "zinc", "TSH", "homocysteine", "omega-3 index"]
+
+
+def lab_notes(n):
+    """`n` distinct short notes, enough to train IVF and HNSW indexes."""
+    return [
+        f"Note {i}: {MARKERS[i % 7]} at {i * 37 % 500} units, "
+        f"checked with {MARKERS[i * 3 % 7]} and {MARKERS[i // 7 % 7]}."
+        for i in range(n)
+    ]
+
+
+def write_pdf(path, pages):
+    """Write a minimal PDF with one text line per entry in `pages`."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, written once the page objects are numbered
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for text in pages:
+        escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        stream = f"BT /F1 10 Tf 40 800 Td ({escaped}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{i} 0 R" for i in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>"
+
+    data = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    data += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.fixture
+def books(tmp_path):
+    """Two small PDF books"""
+    return {
+        "ferritin": write_pdf(tmp_path / "ferritin.pdf", FERRITIN_BOOK),
+        "vitamin_d": write_pdf(tmp_path / "vitamin_d.pdf", VITAMIN_D_BOOK),
+    }
+
+
+def make_rag(tmp_path, **kwargs):
+    kwargs.setdefault("batch_window_ms", 0)
+    kwargs.setdefault("chunk_size", 200)
+    kwargs.setdefault("chunk_overlap", 0)
+    return RAGSystem(
+        index_name="test",
+        index_directory=str(tmp_path / "index"),
+        embedding_model="hashing",
+        **kwargs
+    )
+
+
+def test_index_and_search(tmp_path, books):
+    """Test that indexed chunks are found by a lexically close query."""
+    rag = make_rag(tmp_path)
+    result = rag.index_pdf(books["ferritin"])
+    assert result["status"] == "success"
+    assert result["chunks_added"] == 2
+    rag.index_pdf(books["vitamin_d"])
+
+    results = rag.search("optimal ferritin level", k=2)
+    assert len(results) == 2
+    assert "ferritin" in results[0]["content"].lower()
+    assert results[0]["metadata"]["book_title"] == "ferritin"
+
+
+def test_index_pdf_skips_already_indexed(tmp_path, books):
+    """Test that an unchanged PDF is not indexed twice."""
+    rag = make_rag(tmp_path)
+    rag.index_pdf(books["ferritin"])
+    assert rag.index_pdf(books["ferritin"])["status"] == "already_indexed"
+    assert rag.get_index_stats()["total_vectors"] == 2
+
+
+def test_search_filters_by_book_title(tmp_path, books):
+    """Test that the book_title filter restricts the results to one book."""
+    rag = make_rag(tmp_path)
+    rag.index_pdf(books["ferritin"])
+    rag.index_pdf(books["vitamin_d"])
+
+    results = rag.search("optimal ferritin level", k=5, filter_metadata={"book_title": "vitamin_d"})
+    assert len(results) == 2
+    assert {r["metadata"]["book_title"] for r in results} == {"vitamin_d"}
+    assert rag.search("ferritin", k=5, filter_metadata={"book_title": "unknown"}) == []
+
+
+@pytest.mark.parametrize("factory", ["IVF8,Flat", "IVF8,PQ16x4", "HNSW16"])
+def test_selective_filter_returns_k_hits_on_approximate_indexes(tmp_path, factory):
+    """Test that a filter matching few chunks still returns k hits when the index search misses them."""
+    texts = lab_notes(1000)
+    metadatas = [{"book_title": "rare" if i % 100 == 0 else "common"} for i in range(len(texts))]
+    rag = make_rag(tmp_path, retrieval_mode="vector", index_factory=factory)
+    rag.index_texts(texts, metadatas)
+    assert rag.index_config["index_factory"] == factory
+
+    results = rag.search("ferritin checked with zinc", k=8, filter_metadata={"book_title": "rare"})
+    assert len(results) == 8
+    assert {r["metadata"]["book_title"] for r in results} == {"rare"}
+
+
+def test_index_reloads_from_disk(tmp_path, books):
+    """Test that a new instance serves the same results from the saved index."""
+    rag = make_rag(tmp_path)
+    rag.index_pdf(books["ferritin"])
+    rag.index_pdf(books["vitamin_d"])
+    expected = rag.search("vitamin D magnesium", k=3)
+
+    reloaded = make_rag(tmp_path, result_cache_size=0)
+    assert reloaded.search("vitamin D magnesium", k=3) == expected
+
+
+@pytest.mark.parametrize("factory, params", [
+    ("IVF16,Flat", {"nprobe": 4}),
+    ("HNSW16", {"ef_search": 64}),
+])
+def test_index_factories_find_the_exact_neighbours(factory, params):
+    """Test that IVF and HNSW indexes return the neighbours of an exact search."""
+    embedder = HashingEmbeddingBackend()
+    vectors = embedder.embed_documents(lab_notes(1000))
+    queries = embedder.embed_documents(
+        [f"{marker} checked at {units} units" for marker in MARKERS for units in (40, 250)]
+    )
+
+    index, effective_factory = build_index(factory, vectors.shape[1], "l2", vectors)
+    assert effective_factory == factory and index.is_trained
+    index.add(vectors)
+    enable_reconstruction(index)
+
+    _, expected = exact_search(index, queries, 10, np.arange(len(vectors)))
+    _, found = index.search(queries, 10, params=make_search_params(index, **params))
+    recall = np.mean([len(np.intersect1d(e, f)) / 10 for e, f in zip(expected, found)])
+    assert recall >= 0.9
+
+
+def test_untrainable_index_factory_falls_back_to_flat(tmp_path):
+    """Test that a factory with more centroids than chunks builds a Flat index instead."""
+    rag = make_rag(tmp_path, index_factory="IVF256,Flat")
+    rag.index_texts(lab_notes(20))
+
+    assert rag.index_config["index_factory"] == "Flat"
+    assert rag.index_config["requested_index_factory"] == "IVF256,Flat"
+    assert rag.search("ferritin at 37 units", k=1)
+
+
+def test_ivf_index_with_all_lists_probed_matches_flat_search(tmp_path):
+    """Test that the configured factory is used and searched like a Flat index when exhaustive."""
+    texts = lab_notes(1000)
+    (tmp_path / "flat").mkdir()
+    (tmp_path / "ivf").mkdir()
+    flat = make_rag(tmp_path / "flat", retrieval_mode="vector")
+    flat.index_texts(texts)
+    ivf = make_rag(tmp_path / "ivf", retrieval_mode="vector", index_factory="IVF16,Flat", nprobe=16)
+    ivf.index_texts(texts)
+
+    assert ivf.index_config["index_factory"] == "IVF16,Flat"
+    assert ivf.index_config["trained_on"] == len(texts)
+    for query in ("zinc at 100 units", "homocysteine checked with TSH"):
+        assert [r["content"] for r in ivf.search(query, k=5)] == [r["content"] for r in flat.search(query, k=5)]
+
+
+def test_index_build_report_measures_memory_and_recall(tmp_path):
+    """Test that building a compressed index reports its bytes per vector and recall against Flat."""
+    rag = make_rag(tmp_path, index_factory="SQ4")
+    rag.index_texts(lab_notes(1000))
+
+    report = rag.get_index_stats()["index_config"]["build_report"]
+    assert set(report) == {"bytes_per_vector", "float32_bytes_per_vector", "recall_at_k", "k"}
+    assert report["float32_bytes_per_vector"] == 384 * 4
+    # 4 bits per component, plus the quantizer's ranges spread over the corpus
+    assert report["bytes_per_vector"] < report["float32_bytes_per_vector"] / 4
+    assert 0 < report["recall_at_k"] < 1
+    assert report["k"] == 10
+    # The report is persisted with the index
+    assert make_rag(tmp_path).index_config["build_report"] == report
+
+
+def test_index_evaluation_on_an_uncompressed_index():
+    """Test that an exhaustive index has full recall, and that k is bounded by the corpus size."""
+    vectors = HashingEmbeddingBackend().embed_documents(lab_notes(5))
+    index, _ = build_index("Flat", vectors.shape[1], "l2", vectors)
+    index.add(vectors)
+
+    report = evaluate_index(index, vectors)
+    assert report["recall_at_k"] == 1.0
+    assert report["k"] == 5
+    assert report["bytes_per_vector"] >= report["float32_bytes_per_vector"]
+
+
+@pytest.mark.parametrize("factory", ["Flat", "IVF16,Flat"])
+def test_mapped_index_serves_the_same_results(tmp_path, books, factory):
+    """Test that an index reopened with mmap returns the results of the in-memory index."""
+    rag = make_rag(tmp_path, index_factory=factory, nprobe=4)
+    rag.index_texts(lab_notes(1000))
+    queries = ["zinc at 100 units", "homocysteine checked with TSH", "Note 512"]
+    expected = [rag.search(query, k=5) for query in queries]
+
+    mapped = make_rag(tmp_path, index_factory=factory, nprobe=4, mmap_index=True, result_cache_size=0)
+    assert mapped.get_index_stats()["index_mmapped"]
+    assert [mapped.search(query, k=5) for query in queries] == expected
+
+    # Same vectors and neighbours from the mapped FAISS index itself
+    path = tmp_path / "index" / "test.faiss"
+    in_memory, on_disk = read_index(path), read_index(path, use_mmap=True)
+    vectors = HashingEmbeddingBackend().embed_documents(queries)
+    neighbours = [
+        index.search(vectors, 10, params=make_search_params(index, nprobe=4))[1]
+        for index in (in_memory, on_disk)
+    ]
+    assert np.array_equal(*neighbours)
+
+    # A mapped index is read-only: indexing copies it back into memory first
+    assert mapped.index_pdf(books["ferritin"])["status"] == "success"
+    assert mapped.search("optimal ferritin level", k=1)[0]["metadata"]["book_title"] == "ferritin"
+    assert mapped.get_index_stats()["index_mmapped"]
+
+
+def test_search_batch_matches_single_searches(tmp_path, books):
+    """Test that batched searches return the same results as single searches."""
+    rag = make_rag(tmp_path, result_cache_size=0)
+    rag.index_pdf(books["ferritin"])
+    rag.index_pdf(books["vitamin_d"])
+    queries = ["ferritin fatigue", "vitamin K2", "optimal level"]
+
+    assert rag.search_batch(queries, k=2) == [rag.search(q, k=2) for q in queries]
+
+
+def test_result_cache_hit_and_invalidation(tmp_path, books):
+    """Test that repeated searches hit the cache until the index changes."""
+    rag = make_rag(tmp_path)
+    rag.index_pdf(books["ferritin"])
+    rag.search("ferritin", k=2)
+    rag.search("  ferritin ", k=2)  # same query once normalized
+    assert rag.get_index_stats()["result_cache"]["hits"] == 1
+
+    rag.index_pdf(books["vitamin_d"])
+    results = rag.search("ferritin", k=4)
+    assert len(results) == 4
+    assert rag.get_index_stats()["result_cache"]["hits"] == 1
+
+
+def test_persistent_result_cache_is_keyed_by_the_search_settings(tmp_path, books):
+    """Test that a restart with other retrieval settings does not serve the cached results."""
+    rag = make_rag(tmp_path, result_cache_backend="sqlite", retrieval_mode="vector")
+    rag.index_pdf(books["ferritin"])
+    rag.index_pdf(books["vitamin_d"])
+    vector_results = rag.search("vitamin K2 magnesium", k=3)
+
+    restarted = make_rag(tmp_path, result_cache_backend="sqlite", retrieval_mode="vector")
+    assert restarted.search("vitamin K2 magnesium", k=3) == vector_results
+    assert restarted.get_index_stats()["result_cache"]["hits"] == 1
+
+    lexical = make_rag(tmp_path, result_cache_backend="sqlite", retrieval_mode="lexical")
+    lexical_results = lexical.search("vitamin K2 magnesium", k=3)
+    assert lexical.get_index_stats()["result_cache"]["hits"] == 0
+    assert all(r["lexical_score"] > 0 for r in lexical_results)
+
+
+def test_concurrent_async_searches_are_batched(tmp_path, books):
+    """Test that concurrent asearch calls share micro-batches and match search."""
+    rag = make_rag(tmp_path, batch_window_ms=20, result_cache_size=0)
+    rag.index_pdf(books["ferritin"])
+    rag.index_pdf(books["vitamin_d"])
+    queries = ["ferritin", "vitamin D", "magnesium", "hair loss"]
+
+    async def run():
+        return await asyncio.gather(*(rag.asearch(q, k=2) for q in queries))
+
+    assert asyncio.run(run()) == [rag.search(q, k=2) for q in queries]
+    assert rag.get_index_stats()["query_batching"]["largest_batch"] > 1
+
+
+def test_background_warmup_reports_readiness(tmp_path, books):
+    """Test that a background warm-up ends in the ready state with timings."""
+    make_rag(tmp_path).index_pdf(books["ferritin"])
+    rag = make_rag(tmp_path, background_warmup=True)
+
+    assert asyncio.run(rag.wait_ready(timeout=30))
+    readiness = rag.readiness()
+    assert readiness["state"] == "ready"
+    assert all(c["state"] == "ready" for c in readiness["components"].values())
+    assert rag.search("ferritin", k=1)
+
+
+def test_index_of_another_embedding_model_is_refused(tmp_path, books):
+    """Test that an index is not opened with an embedding model other than its own."""
+    make_rag(tmp_path).index_pdf(books["ferritin"])
+    config = json.loads((tmp_path / "index" / "test_index.json").read_text())
+    assert config["embedding_model"] == "hashing"
+    assert config["dimension"] == 384
+
+    with pytest.raises(ValueError, match="embedding model 'hashing'"):
+        RAGSystem(
+            index_name="test",
+            index_directory=str(tmp_path / "index"),
+            embedding_model="hashing:256"
+        )
+
+    # An index built before the model was persisted is checked on its dimension
+    del config["embedding_model"]
+    (tmp_path / "index" / "test_index.json").write_text(json.dumps(config))
+    with pytest.raises(ValueError, match="384-dimensional"):
+        RAGSystem(
+            index_name="test",
+            index_directory=str(tmp_path / "index"),
+            embedding_model="hashing:256"
+        )
+    assert make_rag(tmp_path).search("ferritin", k=1)
+
+
+def test_exact_term_query_skips_the_embedding(tmp_path):
+    """Test that a rare exact term is answered by BM25 alone, without embedding."""
+    rag = make_rag(tmp_path, result_cache_size=0)
+    texts = [f"Holotranscobalamin measurement {i} for vitamin B12 status." for i in range(5)]
+    texts += [f"General advice on sleep and exercise, part {i}." for i in range(95)]
+    rag.index_texts(texts, [{"book_title": "b12"}] * 5 + [{"book_title": "lifestyle"}] * 95)
+
+    def fail(texts):
+        raise AssertionError("query was embedded")
+
+    rag.embeddings.embed_documents = fail
+
+    results = rag.search("Holotranscobalamin", k=5)
+    assert len(results) == 5
+    assert all("Holotranscobalamin" in r["content"] for r in results)
+    assert results[0]["similarity_score"] is None and results[0]["lexical_score"] > 0
+    assert all(r["fusion_score"] > 0 for r in results)
+    assert rag.get_index_stats()["retrieval"]["lexical_fast_path_hits"] == 1
+
+
+def test_hybrid_search_fuses_vector_and_lexical_ranks(tmp_path, books):
+    """Test that hybrid results carry both scores and survive a reload."""
+    rag = make_rag(tmp_path)
+    rag.index_pdf(books["ferritin"])
+    rag.index_pdf(books["vitamin_d"])
+
+    results = rag.search("vitamin K2 magnesium", k=3)
+    assert results[0]["metadata"]["book_title"] == "vitamin_d"
+    assert results[0]["similarity_score"] is not None and results[0]["lexical_score"] > 0
+    fusion_scores = [r["fusion_score"] for r in results]
+    assert fusion_scores == sorted(fusion_scores, reverse=True)
+
+    vector_only = make_rag(tmp_path, retrieval_mode="vector", result_cache_size=0)
+    assert set(vector_only.search("ferritin", k=1)[0]) == {"content", "metadata", "similarity_score"}
+
+    # A missing lexical index is rebuilt from the chunk store
+    (tmp_path / "index" / "test_lexical.npz").unlink()
+    lexical_only = make_rag(tmp_path, retrieval_mode="lexical", result_cache_size=0)
+    assert lexical_only.search("magnesium", k=1)[0]["content"] == VITAMIN_D_BOOK[0]
+
+
+def test_hybrid_hits_found_only_by_bm25_get_a_similarity_score(tmp_path):
+    """Test that lexical-only hybrid hits are scored on their vectors like FAISS hits."""
+    texts = lab_notes(50)
+    rag = make_rag(tmp_path, fusion_candidates=5, lexical_fast_path=False)
+    rag.index_texts(texts)
+    vector = make_rag(tmp_path, retrieval_mode="vector", result_cache_size=0)
+
+    query = "homocysteine checked with zinc"
+    vector_hits = {r["content"]: r["similarity_score"] for r in vector.search(query, k=50)}
+    results = rag.search(query, k=10)
+    # Some of the results are outside the 10 FAISS candidates
+    assert any(r["content"] not in list(vector_hits)[:10] for r in results)
+    for r in results:
+        assert r["fusion_score"] > 0
+        assert r["similarity_score"] == pytest.approx(vector_hits[r["content"]], abs=1e-4)
+
+
+def test_vector_rerank_rescores_fused_candidates(tmp_path, books):
+    """Test that the exact vector re-ranker scores every first-stage candidate."""
+    rag = make_rag(tmp_path, rerank="vectors", rerank_candidates=10, rerank_budget_ms=1000)
+    rag.index_pdf(books["ferritin"])
+    rag.index_pdf(books["vitamin_d"])
+
+    results = rag.search("vitamin K2 magnesium", k=4)
+    assert len(results) == 4
+    rerank_scores = [r["rerank_score"] for r in results]
+    assert rerank_scores == sorted(rerank_scores, reverse=True)
+    # L2 metric: the re-rank score is the negated exact squared distance
+    assert results[0]["rerank_score"] == pytest.approx(-results[0]["similarity_score"], abs=1e-4)
+    assert rag.get_index_stats()["rerank"]["reranked_candidates"] == 4
+
+
+def test_search_stream_sends_lexical_hits_before_the_final_ranking(tmp_path, books):
+    """Test that the streaming search yields BM25 hits while the query is embedded, then the ranking, as SSE."""
+    rag = make_rag(tmp_path, result_cache_size=0, query_cache_size=0)
+    rag.index_pdf(books["ferritin"])
+    rag.index_pdf(books["vitamin_d"])
+    expected = rag.search("optimal level", k=3)
+    lexical = rag._search_lexical_shard("optimal level", 3)
+    embed_documents = rag.embeddings.embed_documents
+    rag.embeddings.embed_documents = lambda texts: time.sleep(0.3) or embed_documents(texts)
+
+    async def collect():
+        return [event async for event in stream_search_events(rag, "optimal level", k=3)]
+
+    events = asyncio.run(collect())
+    names = [event.split("\n")[0] for event in events]
+    assert lexical
+    assert names == ["event: partial"] * len(lexical) + ["event: result"] * 3 + ["event: summary"]
+    payloads = [json.loads(event.split("\n")[1][len("data: "):]) for event in events]
+    partial, results, summary = payloads[:len(lexical)], payloads[len(lexical):-1], payloads[-1]
+    assert [p["content"] for p in partial] == [r["content"] for r in lexical]
+    assert {p["shard"] for p in partial} == {"lexical"}
+    assert [p["content"] for p in results] == [r["content"] for r in expected]
+    assert [p["rank"] for p in results] == [1, 2, 3]
+    assert summary["results_count"] == 3
+    # The first chunk leaves before the query embedding ends
+    assert summary["first_event_ms"] < 300 <= summary["search_ms"]
+
+
+def test_streaming_tool_reports_each_chunk_as_progress(tmp_path, books):
+    """Test that the MCP streaming tool sends one progress notification per chunk."""
+    fastmcp = pytest.importorskip("fastmcp")
+    rag = make_rag(tmp_path, retrieval_mode="vector")
+    rag.index_pdf(books["ferritin"])
+    mcp = fastmcp.FastMCP("test")
+    setup_rag_tool(mcp, rag)
+    progress = []
+
+    async def on_progress(value, total, message):
+        progress.append(json.loads(message))
+
+    arguments = {"query": "ferritin", "max_results": 2}
+
+    async def call():
+        async with fastmcp.Client(mcp, progress_handler=on_progress) as client:
+            return (await client.call_tool("search_book_knowledge_stream", arguments)).data
+
+    async def call_without_progress_token():
+        async with fastmcp.Client(mcp) as client:
+            # The plain MCP session sends no progressToken
+            return (await client.session.call_tool("search_book_knowledge_stream", arguments)).structuredContent
+
+    response = asyncio.run(call())
+    expected = [r["content"] for r in rag.search("ferritin", k=2)]
+    assert [(p["event"], p["rank"]) for p in progress] == [("result", 1), ("result", 2)]
+    assert [p["content"] for p in progress] == expected
+    assert response["results_count"] == 2
+    # The chunks were already sent as progress: the response is only the summary
+    assert "results" not in response
+
+    # Without a progress token nothing can be notified: the results come with the summary
+    response = asyncio.run(call_without_progress_token())
+    assert [r["content"] for r in response["results"]] == expected
+
+
+def test_search_tool_packs_results_into_a_token_budget(tmp_path, books):
+    """Test that max_tokens bounds the returned text and reports what was omitted."""
+    fastmcp = pytest.importorskip("fastmcp")
+    rag = make_rag(tmp_path)
+    for pdf in books.values():
+        rag.index_pdf(pdf)
+    mcp = fastmcp.FastMCP("test")
+    setup_rag_tool(mcp, rag)
+
+    async def call(arguments):
+        async with fastmcp.Client(mcp) as client:
+            return (await client.call_tool("search_book_knowledge", arguments)).data
+
+    unbounded = asyncio.run(call({"query": "ferritin", "max_results": 5}))
+    assert "packing" not in unbounded
+    packed = asyncio.run(call({"query": "ferritin", "max_results": 5, "max_tokens": 60}))
+    report = packed["packing"]
+    assert report["max_chars"] == 240
+    assert sum(len(r["content"]) for r in packed["results"]) == report["returned_chars"] <= 240
+    assert packed["results_count"] >= 1
+    assert report["omitted_results"] + packed["results_count"] == unbounded["results_count"]
+
+
+def test_search_tool_returns_stage_timings_on_request(tmp_path, books):
+    """Test that debug_timings adds per-stage latencies and stats keep histograms."""
+    fastmcp = pytest.importorskip("fastmcp")
+    rag = make_rag(tmp_path, result_cache_size=0)
+    rag.index_pdf(books["ferritin"])
+    mcp = fastmcp.FastMCP("test")
+    setup_rag_tool(mcp, rag)
+
+    async def call(arguments):
+        async with fastmcp.Client(mcp) as client:
+            return (await client.call_tool("search_book_knowledge", arguments)).data
+
+    assert "metadata" not in asyncio.run(call({"query": "optimal ferritin level"}))
+    response = asyncio.run(call({"query": "optimal ferritin level", "debug_timings": True}))
+    timings = response["metadata"]["timings_ms"]
+    for stage in ("embedding", "vector_search", "lexical_search", "fusion", "docstore", "serialize"):
+        assert timings[stage] >= 0
+    assert timings["request_total"] >= timings["total"] >= timings["embedding"]
+
+    latency = rag.get_index_stats()["search_latency"]
+    assert latency["total"]["count"] == 2
+    assert latency["vector_search"]["p95_ms"] >= latency["vector_search"]["p50_ms"]
+
+
+def test_adjacent_chunks_are_merged_into_one_passage(tmp_path):
+    """Test that overlapping chunks of one page come back as the original text."""
+    text = " ".join(
+        f"Sentence {i} explains why ferritin, vitamin D and magnesium matter." for i in range(12)
+    )
+    pdf = write_pdf(tmp_path / "long.pdf", [text])
+    rag = make_rag(tmp_path, merge_adjacent=True, chunk_overlap=60, retrieval_mode="vector")
+    assert rag.index_pdf(pdf)["chunks_added"] > 3
+
+    results = rag.search("ferritin vitamin D magnesium", k=20)
+    assert len(results) == 1
+    assert results[0]["content"] == text
+    chunks = rag.get_index_stats()["total_vectors"]
+    assert results[0]["metadata"]["merged_chunk_indices"] == list(range(chunks))
+
+
+def test_hot_reload_swaps_generations_after_in_flight_searches(tmp_path, books):
+    """Test that a reload loads a rebuilt index and swaps it once readers drain."""
+    writer = make_rag(tmp_path)
+    writer.index_pdf(books["ferritin"])
+    server = make_rag(tmp_path)
+    assert server.reload_index()["status"] == "unchanged"
+
+    writer.index_pdf(books["vitamin_d"])
+    assert server.index_changed_on_disk()
+    old_store = server.vector_store
+    outcome = {}
+    with server._lock.read():  # a search in flight on the old generation
+        reload = threading.Thread(target=lambda: outcome.update(server.reload_index()))
+        reload.start()
+        deadline = time.monotonic() + 10
+        while not server._lock._writers_waiting and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert server._lock._writers_waiting == 1
+        assert server.vector_store is old_store
+        assert "Ferritin" in old_store.chunks.get_text(0)
+    reload.join()
+
+    assert outcome["status"] == "reloaded"
+    assert outcome["index_generation"] != outcome["previous_generation"]
+    assert server.vector_store is not old_store
+    assert old_store.chunks._text is None  # old generation released
+    assert not server.index_changed_on_disk()
+    results = server.search("vitamin K2", k=1, filter_metadata={"book_title": "vitamin_d"})
+    assert results and "K2" in results[0]["content"]
+    assert server.get_index_stats()["hot_reload"]["reloads"] == 1
+
+
+def test_index_watch_reloads_a_rebuilt_index(tmp_path, books):
+    """Test that the file watch picks up an index written by another process."""
+    writer = make_rag(tmp_path)
+    writer.index_pdf(books["ferritin"])
+    server = make_rag(tmp_path, index_watch_interval=0.05)
+    writer.index_pdf(books["vitamin_d"])
+
+    deadline = time.monotonic() + 10
+    while server.get_index_stats()["hot_reload"]["reloads"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert server.get_index_stats()["total_vectors"] == writer.get_index_stats()["total_vectors"]
+    server.close()
+
+
+def test_reindexing_a_document_replaces_only_its_chunks(tmp_path, books):
+    """Test that an updated PDF replaces its own chunks and embeds only itself."""
+    rag = make_rag(tmp_path)
+    rag.index_pdf(books["ferritin"])
+    rag.index_pdf(books["vitamin_d"])
+    embedded = []
+    embed_documents = rag.embeddings.embed_documents
+    rag.embeddings.embed_documents = lambda texts: embedded.append(len(texts)) or embed_documents(texts)
+
+    write_pdf(tmp_path / "ferritin.pdf", ["Ferritin should be retested after iron infusions."])
+    result = rag.index_pdf(books["ferritin"])
+    assert result["chunks_added"] == 1
+    assert result["chunks_removed"] == len(FERRITIN_BOOK)
+    assert embedded == [1]
+
+    ferritin = rag.search("ferritin", k=5, filter_metadata={"book_title": "ferritin"})
+    assert [r["content"] for r in ferritin] == ["Ferritin should be retested after iron infusions."]
+    assert all("optimal ferritin" not in r["content"] for r in rag.search("optimal ferritin level", k=10))
+    assert rag.search("vitamin K2", k=1, filter_metadata={"book_title": "vitamin_d"})
+
+
+def test_remove_document_persists_and_compacts(tmp_path, books):
+    """Test that a removed document disappears from every search path and on reload."""
+    rag = make_rag(tmp_path, compact_deleted_ratio=0.9)
+    rag.index_pdf(books["ferritin"])
+    rag.index_pdf(books["vitamin_d"])
+    assert rag.remove_document("missing.pdf")["status"] == "not_found"
+
+    assert rag.remove_document(books["vitamin_d"]) == {
+        "status": "removed", "source": books["vitamin_d"], "chunks_removed": len(VITAMIN_D_BOOK)
+    }
+    assert all("vitamin" not in r["content"].lower() for r in rag.search("vitamin K2 magnesium", k=10))
+    assert all("K2" not in r["content"] for r in rag.search("K2", k=3))
+    assert rag.search("vitamin", k=3, filter_metadata={"book_title": "vitamin_d"}) == []
+    assert books["vitamin_d"] not in rag.get_index_stats()["documents"]
+
+    reloaded = make_rag(tmp_path)
+    assert reloaded.get_index_stats()["deleted_chunks"]["count"] == len(VITAMIN_D_BOOK)
+    assert all("vitamin" not in r["content"].lower() for r in reloaded.search("vitamin K2", k=10))
+
+    # Past the ratio, the index is rewritten without the deleted chunks
+    reloaded.compact_deleted_ratio = 0.5
+    reloaded.remove_document(books["ferritin"])
+    reloaded.index_pdf(books["vitamin_d"])
+    stats = reloaded.get_index_stats()
+    assert stats["total_vectors"] == len(VITAMIN_D_BOOK)
+    assert stats["deleted_chunks"] == {"count": 0, "compact_ratio": 0.5, "compactions": 1}
+    assert "K2" in reloaded.search("K2", k=1)[0]["content"]
+
+
+@pytest.mark.parametrize("parse_workers", [0, 2])
+def test_pipelined_ingestion_matches_single_pdf_indexing(tmp_path, books, parse_workers):
+    """Test that index_pdfs embeds across documents in batches and saves once."""
+    (tmp_path / "sequential").mkdir()
+    sequential = make_rag(tmp_path / "sequential")
+    for pdf in books.values():
+        sequential.index_pdf(pdf)
+
+    rag = make_rag(tmp_path)
+    embedded = []
+    embed_documents = rag.embeddings.embed_documents
+    rag.embeddings.embed_documents = lambda texts: embedded.append(len(texts)) or embed_documents(texts)
+    saves = []
+    save_vector_store = rag._save_vector_store
+    rag._save_vector_store = lambda: saves.append(1) or save_vector_store()
+    paths = [books["ferritin"], books["vitamin_d"], str(tmp_path / "missing.pdf")]
+    results = rag.index_pdfs(paths, parse_workers=parse_workers, embed_batch_size=3)
+
+    assert [r["status"] for r in results] == ["success", "success", "error"]
+    assert [r["chunks_added"] for r in results[:2]] == [len(FERRITIN_BOOK), len(VITAMIN_D_BOOK)]
+    assert embedded == [3, 1]
+    assert len(saves) == 1
+    assert sorted(rag.get_index_stats()["documents"]) == sorted(books.values())
+    for query in ["ferritin", "vitamin K2"]:
+        assert [r["content"] for r in rag.search(query, k=2)] == [
+            r["content"] for r in sequential.search(query, k=2)
+        ]
+
+    assert [r["status"] for r in rag.index_pdfs(paths[:2], parse_workers=parse_workers)] == [
+        "already_indexed", "already_indexed"
+    ]
+    assert make_rag(tmp_path).get_index_stats()["total_vectors"] == len(FERRITIN_BOOK) + len(VITAMIN_D_BOOK)
+
+
+def test_pipelined_ingestion_withdraws_only_the_documents_of_a_failed_batch(tmp_path, books):
+    """Test that a failed batch rolls back its unfinished documents, reports them, and keeps the others."""
+    magnesium = write_pdf(tmp_path / "magnesium.pdf", [
+        "Magnesium glycinate is best taken in the evening.",
+        "Magnesium deficiency shows up as muscle cramps and poor sleep.",
+    ])
+    zinc = write_pdf(tmp_path / "zinc.pdf", [
+        "Zinc and copper compete for absorption in the gut.",
+        "Take zinc picolinate away from meals rich in phytates.",
+    ])
+    rag = make_rag(tmp_path)
+    calls = []
+    embed_documents = rag.embeddings.embed_documents
+
+    def embed_once_failing(texts):
+        calls.append(len(texts))
+        if len(calls) == 2:
+            raise RuntimeError("embedding backend unavailable")
+        return embed_documents(texts)
+
+    rag.embeddings.embed_documents = embed_once_failing
+    paths = [books["ferritin"], books["vitamin_d"], magnesium, zinc]
+    results = rag.index_pdfs(paths, parse_workers=0, embed_batch_size=3)
+
+    # Batches: ferritin 1-2 + vitamin D 1, vitamin D 2 + magnesium 1-2 (fails), zinc 1-2
+    assert calls == [3, 3, 2]
+    assert [r["status"] for r in results] == ["success", "error", "error", "success"]
+    assert results[1]["error"] == results[2]["error"] == "embedding backend unavailable"
+    # The first vitamin D chunk, added with the first batch, is withdrawn
+    assert all("vitamin" not in r["content"].lower() for r in rag.search("vitamin D", k=8))
+
+    reopened = make_rag(tmp_path)
+    assert sorted(reopened.get_index_stats()["documents"]) == sorted([books["ferritin"], zinc])
+    assert len(reopened.vector_store.chunks.live_ids()) == 4
+    rag.embeddings.embed_documents = embed_documents
+    assert [r["status"] for r in rag.index_pdfs(paths, parse_workers=0)] == [
+        "already_indexed", "success", "success", "already_indexed"
+    ]
+
+
+def test_pipelined_ingestion_checkpoints_only_complete_documents(tmp_path, books):
+    """Test that checkpoints wait for the documents spread over several batches to be fully added."""
+    magnesium = write_pdf(tmp_path / "magnesium.pdf", [
+        "Magnesium glycinate is best taken in the evening.",
+        "Magnesium deficiency shows up as muscle cramps and poor sleep.",
+    ])
+    rag = make_rag(tmp_path)
+    checkpoints = []
+    checkpoint_ingestion = rag._checkpoint_ingestion
+
+    def record_checkpoint():
+        chunks = rag.vector_store.chunks
+        sources = [chunks.get_metadata(int(i))["source"] for i in chunks.live_ids()]
+        checkpoints.append({source: sources.count(source) for source in sources})
+        checkpoint_ingestion()
+
+    rag._checkpoint_ingestion = record_checkpoint
+    paths = [books["ferritin"], books["vitamin_d"], magnesium]
+    results = rag.index_pdfs(paths, parse_workers=0, embed_batch_size=3, checkpoint_every=1)
+
+    assert [r["status"] for r in results] == ["success"] * 3
+    # Batches: ferritin 1-2 + vitamin D 1, vitamin D 2 (flushed for the checkpoint), magnesium 1-2
+    assert checkpoints == [
+        {books["ferritin"]: 2, books["vitamin_d"]: 2},
+        {books["ferritin"]: 2, books["vitamin_d"]: 2, magnesium: 2},
+        {books["ferritin"]: 2, books["vitamin_d"]: 2, magnesium: 2},
+    ]
+
+
+def test_pipelined_ingestion_trains_a_new_index_on_a_full_sample(tmp_path):
+    """Test that index_pdfs gathers the training sample across documents before creating an IVF index."""
+    notes = lab_notes(200)
+    paths = [write_pdf(tmp_path / f"notes{i}.pdf", notes[i::2]) for i in range(2)]
+    rag = RAGSystem(
+        index_name="test",
+        index_directory=str(tmp_path / "index"),
+        embedding_model="hashing:64",
+        index_factory="IVF4,Flat",
+        batch_window_ms=0,
+        chunk_size=200,
+        chunk_overlap=0
+    )
+
+    results = rag.index_pdfs(paths, parse_workers=0, embed_batch_size=32)
+
+    assert [r["status"] for r in results] == ["success", "success"]
+    assert rag.index_config["index_factory"] == "IVF4,Flat"
+    assert rag.index_config["trained_on"] == 156
+    assert rag.index_config["build_report"]["recall_at_k"] is not None
+
+
+def test_streaming_indexing_embeds_fixed_size_batches_across_pages(tmp_path):
+    """Test that index_pdf chunks pages as they are read and carries the overlap over page breaks."""
+    pages = [
+        " ".join(
+            f"Note {page}.{line}: homocysteine above 10 umol/l calls for methylated folate and vitamin B12."
+            for line in range(5)
+        )
+        for page in range(1, 4)
+    ]
+    pdf = write_pdf(tmp_path / "homocysteine.pdf", pages)
+    rag = make_rag(tmp_path, chunk_overlap=40)
+    embedded = []
+    embed_documents = rag.embeddings.embed_documents
+    rag.embeddings.embed_documents = lambda texts: embedded.append(len(texts)) or embed_documents(texts)
+
+    result = rag.index_pdf(pdf, embed_batch_size=2)
+
+    assert result["status"] == "success"
+    chunks = rag.vector_store.chunks
+    assert result["chunks_added"] == len(chunks) > len(pages)
+    assert max(embedded) == 2 and sum(embedded) == len(chunks)
+    metadatas = [chunks.get_metadata(row) for row in range(len(chunks))]
+    assert [m["chunk_index"] for m in metadatas] == list(range(len(chunks)))
+    assert {m["total_chunks"] for m in metadatas} == {len(chunks)}
+    assert {m["page"] for m in metadatas} == {0, 1, 2}
+    page_breaks = [row for row in range(1, len(chunks)) if metadatas[row]["page"] != metadatas[row - 1]["page"]]
+    assert len(page_breaks) == 2
+    for row in page_breaks:
+        # The first chunk of a page repeats the end of the previous page
+        previous, text = chunks.get_text(row - 1), chunks.get_text(row)
+        assert strip_overlap(previous, text, 40) != text
+
+
+def test_failed_streaming_indexing_leaves_no_partial_document(tmp_path, books):
+    """Test that batches already added are withdrawn when a later batch fails."""
+    rag = make_rag(tmp_path)
+    rag.index_pdf(books["vitamin_d"])
+    calls = []
+    embed_documents = rag.embeddings.embed_documents
+
+    def failing_embed(texts):
+        calls.append(len(texts))
+        if len(calls) > 1:
+            raise RuntimeError("embedding backend unavailable")
+        return embed_documents(texts)
+
+    rag.embeddings.embed_documents = failing_embed
+    result = rag.index_pdf(books["ferritin"], embed_batch_size=1)
+
+    assert result["status"] == "error"
+    assert calls == [1, 1]
+    assert all("ferritin" not in r["content"].lower() for r in rag.search("ferritin", k=4))
+    assert books["ferritin"] not in rag.indexed_hashes
+    rag.embeddings.embed_documents = embed_documents
+    assert rag.index_pdf(books["ferritin"])["chunks_added"] == len(FERRITIN_BOOK)
+
+
+def test_streaming_indexing_trains_a_new_index_on_a_full_sample(tmp_path):
+    """Test that a new IVF index is trained on its training sample, not on the first batch, and reported once."""
+    pdf = write_pdf(tmp_path / "notes.pdf", lab_notes(300))
+    rag = RAGSystem(
+        index_name="test",
+        index_directory=str(tmp_path / "index"),
+        embedding_model="hashing:64",
+        index_factory="IVF4,Flat",
+        nprobe=4,
+        batch_window_ms=0,
+        chunk_size=200,
+        chunk_overlap=0
+    )
+    reported = []
+    report_index_build = rag._report_index_build
+    rag._report_index_build = lambda vectors: reported.append(len(vectors)) or report_index_build(vectors)
+
+    result = rag.index_pdf(pdf, embed_batch_size=32)
+
+    assert result["status"] == "success" and result["chunks_added"] == 300
+    # 39 vectors per centroid, at least the dimension: 156 chunks, not 32
+    assert rag.index_config["index_factory"] == "IVF4,Flat"
+    assert rag.index_config["trained_on"] == 156
+    # Measured once, on every vector of the document
+    assert reported == [300]
+    assert rag.index_config["build_report"]["recall_at_k"] == 1.0
+
+
+EDITION_2022 = [
+    "Zinc and copper compete for absorption; supplement them hours apart.",
+    "The 2022 edition lists selenium at 100 micrograms per day.",
+]
+EDITION_2023 = [
+    "Zinc and copper compete for absorption; supplement them hours apart.",
+    "The 2023 edition raises selenium to 200 micrograms per day.",
+]
+
+
+def test_identical_chunks_of_two_editions_are_stored_once(tmp_path):
+    """Test that a chunk repeated by a second edition is embedded once and cites both books."""
+    editions = {
+        "2022": write_pdf(tmp_path / "therapie-2022.pdf", EDITION_2022),
+        "2023": write_pdf(tmp_path / "therapie-2023.pdf", EDITION_2023),
+    }
+    rag = make_rag(tmp_path)
+    embedded = []
+    embed_documents = rag.embeddings.embed_documents
+    rag.embeddings.embed_documents = lambda texts: embedded.append(len(texts)) or embed_documents(texts)
+    rag.index_pdf(editions["2022"])
+    result = rag.index_pdf(editions["2023"])
+
+    assert result["chunks_added"] == 2 and result["chunks_deduplicated"] == 1
+    assert embedded == [2, 1]
+    assert rag.get_index_stats()["total_vectors"] == 3
+    zinc = [r for r in rag.search("zinc copper absorption", k=3) if "Zinc" in r["content"]]
+    assert len(zinc) == 1
+    assert [s["book_title"] for s in zinc[0]["metadata"]["sources"]] == ["therapie-2022", "therapie-2023"]
+    assert any("Zinc" in r["content"] for r in rag.search("zinc", k=3, filter_metadata={"book_title": "therapie-2023"}))
+
+    # Removing the first edition keeps the shared chunk for the second one, also after a restart
+    assert rag.remove_document(editions["2022"])["chunks_removed"] == 2
+    reloaded = make_rag(tmp_path)
+    zinc = [r for r in reloaded.search("zinc copper absorption", k=3) if "Zinc" in r["content"]]
+    assert len(zinc) == 1
+    assert zinc[0]["metadata"]["source"] == editions["2023"]
+    assert "sources" not in zinc[0]["metadata"]
+    assert reloaded.get_index_stats()["deduplication"]["aliased_chunks"] == 0
+
+
+def test_filtered_search_returns_the_matching_occurrence_of_a_shared_chunk(tmp_path):
+    """Test that a filter matched by a deduplicated occurrence returns that occurrence's citation."""
+    editions = {
+        "2022": write_pdf(tmp_path / "therapie-2022.pdf", EDITION_2022),
+        "2023": write_pdf(tmp_path / "therapie-2023.pdf", ["Preface to the 2023 edition.", *EDITION_2023]),
+    }
+    rag = make_rag(tmp_path)
+    rag.index_pdf(editions["2022"])
+    rag.index_pdf(editions["2023"])
+
+    def zinc(filter_metadata):
+        results = rag.search("zinc copper absorption", k=3, filter_metadata=filter_metadata)
+        return [r["metadata"] for r in results if "Zinc" in r["content"]]
+
+    # Indexed field: the stored chunk is the 2022 one, the 2023 citation comes first
+    [metadata] = zinc({"book_title": "therapie-2023"})
+    assert (metadata["source"], metadata["book_title"], metadata["page"]) == (editions["2023"], "therapie-2023", 1)
+    assert [s["book_title"] for s in metadata["sources"]] == ["therapie-2023", "therapie-2022"]
+    # Field filtered after the search: matched by the 2023 occurrence only
+    [metadata] = zinc({"page": 1})
+    assert metadata["book_title"] == "therapie-2023"
+    [metadata] = zinc(None)
+    assert metadata["book_title"] == "therapie-2022"
+    # Both fields must hold for the same occurrence
+    assert zinc({"book_title": "therapie-2023", "page": 0}) == []
+
+
+def test_search_collapses_duplicates_indexed_without_deduplication(tmp_path):
+    """Test that identical chunks stored twice come back as one result citing both books."""
+    rag = make_rag(tmp_path, deduplicate_chunks=False)
+    rag.index_pdf(write_pdf(tmp_path / "therapie-2022.pdf", EDITION_2022))
+    rag.index_pdf(write_pdf(tmp_path / "therapie-2023.pdf", EDITION_2023))
+    assert rag.get_index_stats()["total_vectors"] == 4
+
+    results = rag.search("zinc copper absorption", k=4)
+    assert sum("Zinc" in r["content"] for r in results) == 1
+    zinc = next(r for r in results if "Zinc" in r["content"])
+    assert [s["book_title"] for s in zinc["metadata"]["sources"]] == ["therapie-2022", "therapie-2023"]
@@ -0,0 +1,55 @@
+"""
+Tests for the budgeted second-stage re-ranker.
+"""
+import time
+
+import numpy as np
+
+from utils.reranker import BudgetedReranker, Reranker
+
+
+class LengthReranker(Reranker):
+    """Scores chunk ids by value, sleeping `delay` seconds per batch"""
+
+    name = "test"
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def score(self, query, query_vector, chunk_ids, vector_store):
+        self.calls += 1
+        time.sleep(self.delay)
+        return np.asarray(chunk_ids, dtype=np.float32)
+
+
+def first_stage(n):
+    return [(chunk_id, {"similarity_score": float(chunk_id)}) for chunk_id in range(n)]
+
+
+def test_rerank_reorders_candidates_within_budget():
+    """Test that all candidates are re-scored when the budget allows it."""
+    reranker = BudgetedReranker(LengthReranker(), candidates=10, budget_ms=1000)
+    hits = reranker.rerank("query", None, first_stage(20), None)
+    assert [chunk_id for chunk_id, _ in hits[:10]] == list(range(9, -1, -1))
+    assert [chunk_id for chunk_id, _ in hits[10:]] == list(range(10, 20))
+    assert hits[0][1] == {"similarity_score": 9.0, "rerank_score": 9.0}
+    assert hits[10][1]["rerank_score"] is None
+    assert reranker.stats()["degraded"] == 0
+
+
+def test_rerank_degrades_to_first_stage_order_when_over_budget():
+    """Test that a slow re-ranker stops at the deadline and is then skipped."""
+    slow = LengthReranker(delay=0.2)
+    reranker = BudgetedReranker(slow, candidates=64, budget_ms=20)
+    hits = reranker.rerank("query", None, first_stage(64), None)
+    # The first batch runs, the deadline stops the next ones
+    assert slow.calls == 1
+    assert [chunk_id for chunk_id, _ in hits[16:]] == list(range(16, 64))
+    assert reranker.stats()["degraded"] == 1
+
+    # The cost estimate now exceeds the budget: first-stage order only
+    hits = reranker.rerank("query", None, first_stage(64), None)
+    assert slow.calls == 1
+    assert [chunk_id for chunk_id, _ in hits] == list(range(64))
+    assert reranker.stats()["skipped"] == 1
@@ -0,0 +1,40 @@
+"""
+Tests for the per-stage latency histograms.
+"""
+import time
+
+from utils.timings import LatencyHistogram, StageLatencies, StageTimer
+
+
+def test_histogram_percentiles_use_bucket_bounds():
+    """Test that percentiles are estimated from the fixed buckets."""
+    histogram = LatencyHistogram()
+    assert histogram.stats() == {"count": 0}
+    for duration_ms in [0.3] * 90 + [7.0] * 9 + [12000.0]:
+        histogram.record(duration_ms)
+
+    stats = histogram.stats()
+    assert stats["count"] == 100
+    assert stats["p50_ms"] == 0.5
+    assert stats["p95_ms"] == 10
+    assert stats["p99_ms"] == 10
+    assert stats["max_ms"] == 12000.0
+    assert stats["buckets"] == {"le_0.5ms": 90, "le_10ms": 9, "inf": 1}
+
+
+def test_stage_timer_accumulates_repeated_stages():
+    """Test that a stage timed several times adds up and feeds the histograms."""
+    latencies = StageLatencies()
+    timer = StageTimer()
+    for _ in range(2):
+        with timer.stage("embedding"):
+            time.sleep(0.005)
+    timer.add("lock_wait", 0.2)
+    timings = timer.finish(latencies)
+
+    assert timings["embedding"] >= 10
+    assert timings["total"] >= timings["embedding"]
+    assert timings["lock_wait"] == 0.2
+    stats = latencies.stats()
+    assert set(stats) == {"embedding", "lock_wait", "total"}
+    assert stats["embedding"]["count"] == 1
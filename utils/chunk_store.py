@@ -0,0 +1,441 @@
+# =======================
+# CHUNK STORE MODULE
+# =======================
+
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class ChunkStore:
+    """
+    Stockage compact des chunks, adressé par numéro de ligne (= id FAISS):
+
+    - <name>_chunks.txt: textes UTF-8 concaténés, mappés en mémoire
+    - <name>_chunks_offsets.npy: (offset, longueur) en octets, int64 de largeur fixe
+    - <name>_chunks_codes.npy: métadonnées en colonnes, encodées par dictionnaire
+      (int32, -1 = absent)
+    - <name>_chunks_meta.json: noms des colonnes et dictionnaires de valeurs
+    - <name>_chunks_deleted.npy: lignes supprimées (int64, triées), optionnel
+
+    Au chargement, seuls les dictionnaires de métadonnées sont lus; le texte
+    d'un chunk n'est décodé que lorsqu'une recherche le retourne. Les lignes
+    ajoutées restent en mémoire jusqu'à save().
+
+    Une suppression ne décale pas les numéros de ligne (ils restent alignés
+    sur les ids FAISS): la ligne est marquée supprimée jusqu'à compact().
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, directory: Path, name: str):
+        self.directory = Path(directory)
+        self.name = name
+        self.text_path = self.directory / f"{name}_chunks.txt"
+        self.offsets_path = self.directory / f"{name}_chunks_offsets.npy"
+        self.codes_path = self.directory / f"{name}_chunks_codes.npy"
+        self.meta_path = self.directory / f"{name}_chunks_meta.json"
+        self.deleted_path = self.directory / f"{name}_chunks_deleted.npy"
+
+        self._text_file = None
+        self._text: Optional[mmap.mmap] = None
+        self._offsets = np.zeros((0, 2), dtype=np.int64)
+        self._codes = np.zeros((0, 0), dtype=np.int32)
+        self._columns: List[str] = []
+        self._values: Dict[str, List[Any]] = {}
+        self._persisted = 0
+        self._deleted = np.zeros(0, dtype=np.int64)
+        self._deleted_changed = False
+
+        self._pending_texts: List[str] = []
+        self._pending_metadatas: List[Dict[str, Any]] = []
+
+    @classmethod
+    def exists(cls, directory: Path, name: str) -> bool:
+        """Vrai si un chunk store a été sauvegardé sous ce nom"""
+        return (Path(directory) / f"{name}_chunks_meta.json").exists()
+
+    @classmethod
+    def load(cls, directory: Path, name: str) -> "ChunkStore":
+        """Ouvre un chunk store sauvegardé (texte et tableaux mappés en mémoire)"""
+        store = cls(directory, name)
+        store._open()
+        return store
+
+    def _open(self):
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != self.FORMAT_VERSION:
+            raise ValueError(f"Unsupported chunk store version: {meta.get('version')}")
+
+        self._columns = meta["columns"]
+        self._values = meta["values"]
+        self._persisted = meta["count"]
+        self._offsets = np.load(self.offsets_path, mmap_mode="r")
+        self._codes = np.load(self.codes_path, mmap_mode="r")
+        if len(self._offsets) != self._persisted or len(self._codes) != self._persisted:
+            raise ValueError(f"Chunk store {self.name} is inconsistent (expected {self._persisted} rows)")
+
+        self._deleted = (
+            np.load(self.deleted_path) if self.deleted_path.exists() else np.zeros(0, dtype=np.int64)
+        )
+        self._deleted_changed = False
+
+        self._text_file = open(self.text_path, "rb")
+        if os.fstat(self._text_file.fileno()).st_size > 0:
+            self._text = mmap.mmap(self._text_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        """Libère les fichiers mappés"""
+        if self._text is not None:
+            self._text.close()
+            self._text = None
+        if self._text_file is not None:
+            self._text_file.close()
+            self._text_file = None
+        self._offsets = np.zeros((0, 2), dtype=np.int64)
+        self._codes = np.zeros((0, len(self._columns)), dtype=np.int32)
+
+    def __len__(self) -> int:
+        return self._persisted + len(self._pending_texts)
+
+    def add(self, texts: List[str], metadatas: List[Dict[str, Any]]) -> range:
+        """
+        Ajoute des chunks (persistés au prochain save())
+
+        Returns:
+            Les ids attribués aux nouveaux chunks
+        """
+        start = len(self)
+        self._pending_texts.extend(texts)
+        self._pending_metadatas.extend(dict(metadata) for metadata in metadatas)
+        return range(start, len(self))
+
+    def update_pending(self, rows, values: Dict[str, Any]):
+        """Complète les métadonnées de lignes pas encore persistées"""
+        for row in rows:
+            if row < self._persisted:
+                raise ValueError(f"Row {row} is already persisted")
+            self._pending_metadatas[row - self._persisted].update(values)
+
+    def delete(self, rows) -> int:
+        """
+        Marque des lignes supprimées (persisté au prochain save())
+
+        Returns:
+            Le nombre de lignes nouvellement supprimées
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        deleted = np.union1d(self._deleted, rows[(rows >= 0) & (rows < len(self))])
+        added = len(deleted) - len(self._deleted)
+        if added:
+            self._deleted = deleted
+            self._deleted_changed = True
+        return added
+
+    def deleted_ids(self) -> np.ndarray:
+        """Lignes supprimées, triées"""
+        return self._deleted
+
+    def live_ids(self) -> np.ndarray:
+        """Lignes non supprimées, triées"""
+        return np.setdiff1d(np.arange(len(self), dtype=np.int64), self._deleted, assume_unique=True)
+
+    def compact(self, rows) -> "ChunkStore":
+        """
+        Réécrit le chunk store avec les seules lignes `rows`, renumérotées à
+        partir de 0 dans cet ordre (fichiers temporaires puis rename)
+
+        Returns:
+            Le nouveau chunk store, ouvert; celui-ci reste lisible jusqu'à close()
+        """
+        # Lignes en attente persistées d'abord: le texte est ensuite copié
+        # d'un fichier à l'autre, chunk par chunk, sans passer par le tas
+        self.save()
+        rows = np.asarray(rows, dtype=np.int64)
+        offsets = np.zeros((len(rows), 2), dtype=np.int64)
+        tmp_text_path = self.text_path.with_name(self.text_path.name + ".tmp")
+        with open(tmp_text_path, "wb") as f:
+            position = 0
+            for i, row in enumerate(rows.tolist()):
+                offset, length = (int(v) for v in self._offsets[row])
+                if length:
+                    f.write(self._text[offset:offset + length])
+                offsets[i] = (position, length)
+                position += length
+
+        compacted = ChunkStore(self.directory, self.name)
+        compacted._deleted_changed = True
+        compacted._write_index(
+            tmp_text_path, offsets, np.asarray(self._codes[rows]), self._columns, self._values
+        )
+        compacted._open()
+        return compacted
+
+    def _save_deleted(self):
+        tmp_deleted_path = self.deleted_path.with_name(self.deleted_path.name + ".tmp")
+        with open(tmp_deleted_path, "wb") as f:
+            np.save(f, self._deleted)
+        os.replace(tmp_deleted_path, self.deleted_path)
+        self._deleted_changed = False
+
+    def get_text(self, row: int) -> str:
+        """Texte d'un chunk, décodé à la demande"""
+        if row >= self._persisted:
+            return self._pending_texts[row - self._persisted]
+        offset, length = (int(v) for v in self._offsets[row])
+        if length == 0:
+            return ""
+        return self._text[offset:offset + length].decode("utf-8")
+
+    def get_metadata(self, row: int) -> Dict[str, Any]:
+        """Métadonnées d'un chunk, reconstruites depuis les colonnes"""
+        if row >= self._persisted:
+            return dict(self._pending_metadatas[row - self._persisted])
+        return {
+            column: self._values[column][code]
+            for column, code in zip(self._columns, self._codes[row])
+            if code >= 0
+        }
+
+    def column(self, name: str) -> List[Any]:
+        """Valeurs d'une colonne de métadonnées pour toutes les lignes (None si absente)"""
+        if name in self._columns and self._persisted:
+            dictionary = self._values[name]
+            codes = self._codes[:, self._columns.index(name)]
+            values = [dictionary[code] if code >= 0 else None for code in codes.tolist()]
+        else:
+            values = [None] * self._persisted
+        values.extend(metadata.get(name) for metadata in self._pending_metadatas)
+        return values
+
+    def save(self):
+        """
+        Écrit le chunk store et le rouvre mappé; les lignes en attente
+        deviennent persistées. Seul leur texte est écrit, à la fin du fichier
+        de texte: une sauvegarde coûte la taille des ajouts, pas du corpus.
+        """
+        if not self._pending_texts and self._text_file is not None:
+            # Déjà sur disque: seules les suppressions ont pu changer
+            if self._deleted_changed:
+                self._save_deleted()
+            return
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        columns = list(self._columns)
+        values = {column: list(self._values[column]) for column in columns}
+        lookups = {
+            column: {self._value_key(v): i for i, v in enumerate(values[column])}
+            for column in columns
+        }
+        for metadata in self._pending_metadatas:
+            for column in metadata:
+                if column not in lookups:
+                    columns.append(column)
+                    values[column] = []
+                    lookups[column] = {}
+
+        n = len(self)
+        offsets = np.zeros((n, 2), dtype=np.int64)
+        codes = np.full((n, len(columns)), -1, dtype=np.int32)
+        if self._persisted:
+            offsets[:self._persisted] = self._offsets
+            codes[:self._persisted, :len(self._columns)] = self._codes
+
+        # Texte: les nouveaux chunks sont ajoutés à la fin du fichier existant
+        # (les octets déjà écrits, éventuellement mappés par d'autres
+        # processus, ne changent pas); un nouveau store écrit un fichier
+        # temporaire renommé ensuite
+        if self._text_file is not None:
+            tmp_text_path = None
+            text_file = open(self.text_path, "ab")
+        else:
+            tmp_text_path = self.text_path.with_name(self.text_path.name + ".tmp")
+            text_file = open(tmp_text_path, "wb")
+        with text_file as f:
+            # Position réelle de fin: un save interrompu a pu laisser des
+            # octets au-delà des offsets enregistrés
+            position = f.seek(0, os.SEEK_END)
+            for i, text in enumerate(self._pending_texts):
+                data = text.encode("utf-8")
+                f.write(data)
+                offsets[self._persisted + i] = (position, len(data))
+                position += len(data)
+
+        # Métadonnées: encodage par dictionnaire, une colonne par clé
+        for i, metadata in enumerate(self._pending_metadatas):
+            row = self._persisted + i
+            for column, value in metadata.items():
+                key = self._value_key(value)
+                code = lookups[column].get(key)
+                if code is None:
+                    code = len(values[column])
+                    values[column].append(value)
+                    lookups[column][key] = code
+                codes[row, columns.index(column)] = code
+
+        self.close()
+        self._write_index(tmp_text_path, offsets, codes, columns, values)
+        self._pending_texts = []
+        self._pending_metadatas = []
+        self._open()
+
+    def _write_index(
+        self,
+        tmp_text_path: Optional[Path],
+        offsets: np.ndarray,
+        codes: np.ndarray,
+        columns: List[str],
+        values: Dict[str, List[Any]]
+    ):
+        """
+        Écrit offsets, codes et métadonnées (fichiers temporaires puis rename);
+        le fichier de métadonnées, qui porte le nombre de lignes, est remplacé
+        en dernier
+        """
+        tmp_offsets_path = self.offsets_path.with_name(self.offsets_path.name + ".tmp")
+        tmp_codes_path = self.codes_path.with_name(self.codes_path.name + ".tmp")
+        tmp_meta_path = self.meta_path.with_name(self.meta_path.name + ".tmp")
+        with open(tmp_offsets_path, "wb") as f:
+            np.save(f, offsets)
+        with open(tmp_codes_path, "wb") as f:
+            np.save(f, codes)
+        with open(tmp_meta_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": self.FORMAT_VERSION,
+                    "count": len(offsets),
+                    "columns": columns,
+                    "values": values
+                },
+                f,
+                ensure_ascii=False,
+                default=str
+            )
+
+        if tmp_text_path is not None:
+            os.replace(tmp_text_path, self.text_path)
+        os.replace(tmp_offsets_path, self.offsets_path)
+        os.replace(tmp_codes_path, self.codes_path)
+        if self._deleted_changed or self.deleted_path.exists():
+            self._save_deleted()
+        os.replace(tmp_meta_path, self.meta_path)
+
+    @staticmethod
+    def _value_key(value: Any) -> str:
+        # Les valeurs JSON ne sont pas toutes hachables (listes); 1 et True diffèrent
+        return json.dumps(value, sort_keys=True, default=str)
+
+    def stats(self) -> Dict[str, Any]:
+        """Statistiques du chunk store"""
+        return {
+            "chunks": len(self),
+            "pending_chunks": len(self._pending_texts),
+            "deleted_chunks": len(self._deleted),
+            "text_bytes": len(self._text) if self._text is not None else 0,
+            "metadata_columns": len(self._columns)
+        }
+
+
+class ChunkAliases:
+    """
+    Occurrences supplémentaires des chunks dédupliqués (<name>_chunk_aliases.json):
+    un texte identique dans un autre livre ou une autre édition n'est encodé
+    et stocké qu'une fois, les métadonnées de ses autres occurrences sont
+    rattachées à la ligne du chunk stocké
+    """
+
+    def __init__(self, directory: Path, name: str, aliases: Optional[Dict[int, List[Dict[str, Any]]]] = None):
+        self.directory = Path(directory)
+        self.name = name
+        self.path = self.directory / f"{name}_chunk_aliases.json"
+        self._aliases: Dict[int, List[Dict[str, Any]]] = aliases or {}
+        # Pas encore écrites: un nouvel index remplace le fichier d'un ancien
+        self._changed = True
+
+    @classmethod
+    def load(cls, directory: Path, name: str) -> "ChunkAliases":
+        """Lit les occurrences sauvegardées (aucune si le fichier n'existe pas)"""
+        aliases = cls(directory, name)
+        if aliases.path.exists():
+            with open(aliases.path, "r", encoding="utf-8") as f:
+                aliases._aliases = {int(row): occurrences for row, occurrences in json.load(f).items()}
+        aliases._changed = False
+        return aliases
+
+    def __len__(self) -> int:
+        return sum(len(occurrences) for occurrences in self._aliases.values())
+
+    def get(self, row: int) -> List[Dict[str, Any]]:
+        """Autres occurrences d'un chunk"""
+        return self._aliases.get(row, [])
+
+    def add(self, row: int, metadata: Dict[str, Any]):
+        """Rattache une occurrence au chunk stocké à la ligne `row`"""
+        self._aliases.setdefault(row, []).append(dict(metadata))
+        self._changed = True
+
+    def pop(self, row: int) -> List[Dict[str, Any]]:
+        """Retire et retourne les occurrences d'un chunk"""
+        occurrences = self._aliases.pop(row, [])
+        self._changed = self._changed or bool(occurrences)
+        return occurrences
+
+    def remove_source(self, source: str) -> int:
+        """
+        Retire les occurrences d'un document
+
+        Returns:
+            Le nombre d'occurrences retirées
+        """
+        removed = 0
+        for row in list(self._aliases):
+            kept = [o for o in self._aliases[row] if o.get("source") != source]
+            removed += len(self._aliases[row]) - len(kept)
+            if kept:
+                self._aliases[row] = kept
+            else:
+                del self._aliases[row]
+        self._changed = self._changed or bool(removed)
+        return removed
+
+    def update_source(self, source: str, values: Dict[str, Any]):
+        """Complète les métadonnées des occurrences d'un document"""
+        for occurrences in self._aliases.values():
+            for occurrence in occurrences:
+                if occurrence.get("source") == source:
+                    occurrence.update(values)
+                    self._changed = True
+
+    def items(self):
+        return self._aliases.items()
+
+    def renumber(self, rows) -> "ChunkAliases":
+        """Occurrences après ChunkStore.compact(rows): les lignes `rows` renumérotées à partir de 0"""
+        new_rows = {int(row): i for i, row in enumerate(rows)}
+        renumbered = ChunkAliases(self.directory, self.name, {
+            new_rows[row]: occurrences
+            for row, occurrences in self._aliases.items()
+            if row in new_rows
+        })
+        return renumbered
+
+    def save(self):
+        """Écrit les occurrences si elles ont changé (fichier temporaire puis rename)"""
+        if not self._changed:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {str(row): occurrences for row, occurrences in sorted(self._aliases.items())},
+                f,
+                ensure_ascii=False,
+                default=str
+            )
+        os.replace(tmp_path, self.path)
+        self._changed = False
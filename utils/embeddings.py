@@ -0,0 +1,381 @@
+# =======================
+# EMBEDDING BACKENDS MODULE
+# =======================
+
+import inspect
+import json
+import logging
+import re
+import unicodedata
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Phrases de contrôle de parité entre le modèle PyTorch et son export ONNX
+PARITY_SENTENCES = [
+    "Optimaler Ferritinwert bei Müdigkeit und Haarausfall",
+    "Vitamin D3 mit K2: empfohlene Tagesdosis",
+    "Magnesiumglycinat vor dem Schlafengehen",
+    "What is the optimal TSH range for thyroid health?",
+    "Zink-Kupfer-Verhältnis bei Supplementierung",
+    "Holotranscobalamin als Marker für einen B12-Mangel",
+    "Omega-3-Index, EPA und DHA in der Triglyceridform",
+    "hs-CRP and homocysteine as inflammation markers",
+]
+
+
+class EmbeddingBackend(ABC):
+    """
+    Interface des backends d'embedding: retourne des vecteurs float32
+    normalisés (L2), une ligne par texte
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        """Vecteurs des textes, une ligne par texte"""
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Description du backend (rapportée par get_index_stats)"""
+        return {"backend": self.name}
+
+
+class TorchEmbeddingBackend(EmbeddingBackend):
+    """Modèle sentence-transformers exécuté par PyTorch (via LangChain)"""
+
+    name = "torch"
+
+    def __init__(self, model_name: str):
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        self.model_name = model_name
+        self._model = HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={'device': 'cpu'},
+            encode_kwargs={'normalize_embeddings': True}
+        )
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self._model.embed_documents(texts), dtype=np.float32)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "model": self.model_name}
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    Embedder déterministe hors ligne: n-grammes de caractères hachés et
+    projetés sur `dimension` composantes signées, pondération sous-linéaire,
+    normalisation L2. Aucun poids à télécharger: sert aux tests et aux
+    benchmarks du chemin de recherche (index, caches, ANN, concurrence) à des
+    dimensions et tailles de corpus réalistes. Les textes qui partagent des
+    n-grammes sont proches, sans compréhension sémantique.
+
+    Sélectionné par embedding_model: "hashing" (384 dimensions, comme
+    MiniLM) ou "hashing:<dimension>".
+    """
+
+    name = "hashing"
+
+    # Constantes de hachage (arithmétique uint64 modulo 2^64, identique sur
+    # toutes les plateformes)
+    _BASE = np.uint64(0x100000001B3)
+    _MIX = np.uint64(0x9E3779B97F4A7C15)
+
+    def __init__(self, dimension: int = 384, ngram_range: tuple = (3, 5)):
+        self.dimension = dimension
+        self.ngram_range = ngram_range
+
+    def _embed_one(self, text: str) -> np.ndarray:
+        normalized = " " + " ".join(unicodedata.normalize("NFC", text).lower().split()) + " "
+        codes = np.frombuffer(normalized.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        vector = np.zeros(self.dimension, dtype=np.float64)
+        with np.errstate(over="ignore"):
+            for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+                if len(codes) < n:
+                    continue
+                # Hachage polynomial de toutes les fenêtres de n caractères
+                hashes = np.full(len(codes) - n + 1, np.uint64(n), dtype=np.uint64)
+                for offset in range(n):
+                    hashes = hashes * self._BASE + codes[offset:len(codes) - n + 1 + offset]
+                hashes = hashes * self._MIX
+                hashes ^= hashes >> np.uint64(29)
+                buckets = (hashes % np.uint64(self.dimension)).astype(np.int64)
+                signs = np.where(hashes >> np.uint64(63), -1.0, 1.0)
+                vector += np.bincount(buckets, weights=signs, minlength=self.dimension)
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.stack([self._embed_one(text) for text in texts])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "dimension": self.dimension,
+            "ngram_range": list(self.ngram_range)
+        }
+
+
+def _model_slug(model_name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name.strip("/"))
+
+
+def _mean_pool(hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """Pooling moyen sur les tokens réels puis normalisation L2 (pipeline sentence-transformers)"""
+    mask = attention_mask[..., None].astype(np.float32)
+    pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+    norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+    return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+
+def cosine_parity(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """Similarité cosinus ligne à ligne entre deux matrices d'embeddings"""
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosines = (reference * candidate).sum(axis=1)
+    return {
+        "min_cosine": round(float(cosines.min()), 5),
+        "mean_cosine": round(float(cosines.mean()), 5)
+    }
+
+
+def export_onnx_model(
+    model_name: str,
+    model_dir: Path,
+    quantize: bool = True,
+    max_seq_length: int = 256
+) -> Dict[str, Any]:
+    """
+    Exporte un modèle Hugging Face (encodeur type MiniLM) en ONNX, une seule
+    fois, avec son tokenizer; optionnellement quantifié en int8 dynamique.
+    Nécessite torch et transformers (uniquement pour l'export).
+
+    Un contrôle de parité compare les embeddings ONNX à ceux de PyTorch
+    sur PARITY_SENTENCES; le résultat est enregistré dans export.json.
+
+    Returns:
+        Les métadonnées d'export (fichiers, parité)
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    model_dir = Path(model_dir)
+    model_dir.mkdir(parents=True, exist_ok=True)
+    logger.info(f"Exporting {model_name} to ONNX in {model_dir}")
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    model.config.return_dict = False
+    tokenizer.save_pretrained(str(model_dir))
+
+    sample = tokenizer(PARITY_SENTENCES, padding=True, truncation=True,
+                       max_length=max_seq_length, return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    class _Encoder(torch.nn.Module):
+        """Entrées positionnelles fixes -> last_hidden_state (l'ordre de
+        forward() du modèle varie selon les versions de transformers)"""
+
+        def __init__(self, encoder):
+            super().__init__()
+            self.encoder = encoder
+
+        def forward(self, *args):
+            return self.encoder(**dict(zip(input_names, args)))[0]
+
+    export_kwargs: Dict[str, Any] = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # Exporteur TorchScript: axes dynamiques sans dépendance à onnxscript
+        export_kwargs["dynamo"] = False
+    fp32_path = model_dir / "model.onnx"
+    with torch.no_grad():
+        # Référence calculée avant l'export, qui modifie l'état du modèle tracé
+        reference = _mean_pool(
+            model(**{name: sample[name] for name in input_names})[0].numpy(),
+            sample["attention_mask"].numpy()
+        )
+        torch.onnx.export(
+            _Encoder(model),
+            tuple(sample[name] for name in input_names),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            **export_kwargs
+        )
+
+    metadata: Dict[str, Any] = {
+        "model_name": model_name,
+        "max_seq_length": max_seq_length,
+        "pad_token": tokenizer.pad_token,
+        "files": {"fp32": fp32_path.name},
+        "parity": {}
+    }
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = model_dir / "model.int8.onnx"
+        quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+        metadata["files"]["int8"] = int8_path.name
+
+    with open(model_dir / "export.json", "w") as f:
+        json.dump(metadata, f, indent=2)
+
+    # Parité de chaque variante contre PyTorch
+    for variant in metadata["files"]:
+        backend = OnnxEmbeddingBackend(model_name, model_dir, quantize=(variant == "int8"), intra_op_threads=1)
+        parity = cosine_parity(reference, backend.embed_documents(PARITY_SENTENCES))
+        metadata["parity"][variant] = parity
+        logger.info(f"ONNX {variant} parity vs torch: {parity}")
+        if parity["min_cosine"] < 0.99:
+            logger.warning(f"ONNX {variant} embeddings deviate from torch (min cosine {parity['min_cosine']})")
+
+    with open(model_dir / "export.json", "w") as f:
+        json.dump(metadata, f, indent=2)
+    return metadata
+
+
+class OnnxEmbeddingBackend(EmbeddingBackend):
+    """
+    Modèle exporté en ONNX et exécuté par ONNX Runtime sur CPU: pas de
+    PyTorch au service, quantification int8 dynamique optionnelle et nombre
+    de threads intra-op configurable. Même pipeline que sentence-transformers
+    (tokenisation, pooling moyen, normalisation L2).
+    """
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_name: str,
+        model_dir: Path,
+        quantize: bool = True,
+        intra_op_threads: Optional[int] = None,
+        batch_size: int = 32
+    ):
+        """
+        Args:
+            model_name: Modèle Hugging Face exporté au premier usage
+            model_dir: Répertoire du modèle exporté (model.onnx, tokenizer.json)
+            quantize: Utilise la variante quantifiée int8
+            intra_op_threads: Threads d'ONNX Runtime par inférence (défaut: ORT)
+            batch_size: Nombre de textes par inférence
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        self.model_dir = Path(model_dir)
+        self.batch_size = batch_size
+        self.intra_op_threads = intra_op_threads
+
+        metadata_path = self.model_dir / "export.json"
+        metadata = json.loads(metadata_path.read_text()) if metadata_path.exists() else {}
+        if not metadata or (quantize and "int8" not in metadata["files"]):
+            metadata = export_onnx_model(model_name, self.model_dir, quantize=quantize)
+        self.variant = "int8" if quantize else "fp32"
+        self.parity = metadata.get("parity", {}).get(self.variant)
+
+        self._tokenizer = Tokenizer.from_file(str(self.model_dir / "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=metadata["max_seq_length"])
+        pad_token = metadata.get("pad_token") or "[PAD]"
+        self._tokenizer.enable_padding(pad_id=self._tokenizer.token_to_id(pad_token), pad_token=pad_token)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.inter_op_num_threads = 1
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self._session = ort.InferenceSession(
+            str(self.model_dir / metadata["files"][self.variant]),
+            options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self._session.get_inputs()}
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self._tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64)
+        }
+        hidden = self._session.run(
+            None, {name: value for name, value in inputs.items() if name in self._input_names}
+        )[0]
+        return _mean_pool(hidden, inputs["attention_mask"])
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # Textes de longueurs proches dans un même lot: moins de padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches = [
+            self._embed_batch([texts[i] for i in order[start:start + self.batch_size]])
+            for start in range(0, len(order), self.batch_size)
+        ]
+        embedded = np.concatenate(batches)
+        result = np.empty_like(embedded)
+        result[order] = embedded
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "model": self.model_name,
+            "variant": self.variant,
+            "intra_op_threads": self.intra_op_threads,
+            "parity_vs_torch": self.parity
+        }
+
+
+def create_embedding_backend(
+    model_name: str,
+    backend: str = "torch",
+    model_dir: Optional[Path] = None,
+    quantize: bool = True,
+    intra_op_threads: Optional[int] = None
+) -> EmbeddingBackend:
+    """
+    Crée le backend d'embedding demandé
+
+    Args:
+        model_name: Modèle sentence-transformers, ou "hashing[:dimension]" pour
+            l'embedder déterministe hors ligne (quel que soit le backend)
+        backend: "torch" (PyTorch via LangChain) ou "onnx" (ONNX Runtime)
+        model_dir: Répertoire racine des modèles ONNX exportés
+        quantize: Variante int8 du modèle ONNX
+        intra_op_threads: Threads intra-op d'ONNX Runtime
+    """
+    if model_name == "hashing" or model_name.startswith("hashing:"):
+        _, _, dimension = model_name.partition(":")
+        return HashingEmbeddingBackend(int(dimension) if dimension else 384)
+    if backend == "torch":
+        return TorchEmbeddingBackend(model_name)
+    if backend == "onnx":
+        if model_dir is None:
+            raise ValueError("The onnx embedding backend requires a model directory")
+        return OnnxEmbeddingBackend(
+            model_name,
+            Path(model_dir) / _model_slug(model_name),
+            quantize=quantize,
+            intra_op_threads=intra_op_threads
+        )
+    raise ValueError(f"Unknown embedding backend: {backend}")
@@ -0,0 +1,297 @@
+# =======================
+# FAISS INDEX FACTORY MODULE
+# =======================
+
+import logging
+import mmap
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+METRICS = {
+    "l2": faiss.METRIC_L2,
+    "ip": faiss.METRIC_INNER_PRODUCT
+}
+
+
+def build_index(
+    factory: str,
+    dimension: int,
+    metric: str,
+    train_vectors: np.ndarray
+) -> Tuple[Any, str]:
+    """
+    Construit (et entraîne si nécessaire) un index FAISS à partir d'une
+    chaîne de fabrique: "Flat", "IVF256,Flat", "HNSW32", ...
+
+    Si l'index ne peut pas être entraîné (trop peu de vecteurs pour le
+    nombre de centroïdes, par exemple), on se replie sur un index Flat.
+
+    Args:
+        factory: Chaîne de fabrique FAISS
+        dimension: Dimension des vecteurs
+        metric: "l2" ou "ip" (produit scalaire, = cosinus sur vecteurs normalisés)
+        train_vectors: Vecteurs d'entraînement pour les index qui en ont besoin
+
+    Returns:
+        (index, chaîne de fabrique effectivement utilisée)
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric} (expected one of {list(METRICS)})")
+
+    try:
+        index = faiss.index_factory(dimension, factory, METRICS[metric])
+        if not index.is_trained:
+            logger.info(f"Training '{factory}' index on {len(train_vectors)} vectors...")
+            index.train(np.ascontiguousarray(train_vectors, dtype=np.float32))
+        return index, factory
+    except RuntimeError as e:
+        logger.warning(f"Cannot build '{factory}' index ({e}); falling back to Flat")
+        return faiss.index_factory(dimension, "Flat", METRICS[metric]), "Flat"
+
+
+def training_sample_size(factory: str, dimension: int, metric: str) -> int:
+    """
+    Nombre de vecteurs à réunir avant de construire un index entraîné:
+    min_points_per_centroid de FAISS (39) par centroïde du quantificateur
+    le plus fin (listes IVF, sous-quantificateurs PQ), et au moins la
+    dimension (plages des quantificateurs scalaires, matrices OPQ/PCA).
+
+    Returns:
+        0 si l'index ne s'entraîne pas (Flat, HNSW) ou si la fabrique est
+        invalide (build_index se repliera sur Flat)
+    """
+    try:
+        index = faiss.index_factory(dimension, factory, METRICS[metric])
+    except (KeyError, RuntimeError):
+        return 0
+    if index.is_trained:
+        return 0
+    core = _core_index(index)
+    centroids = core.nlist if isinstance(core, faiss.IndexIVF) else 1
+    if hasattr(core, "pq"):
+        centroids = max(centroids, core.pq.ksub)
+    return max(faiss.ClusteringParameters().min_points_per_centroid * centroids, dimension)
+
+
+def read_index(path: Path, use_mmap: bool = False):
+    """
+    Lit un index FAISS. En mode mmap, les pages de l'index restent dans le
+    cache de pages de l'OS et sont partagées entre processus au lieu d'être
+    copiées dans le tas de chacun. L'index est alors en lecture seule.
+
+    IO_FLAG_MMAP_IFC (FAISS récent) mappe tous les index à codes plats ainsi
+    que les listes IVF; à défaut, IO_FLAG_MMAP ne mappe que les listes IVF.
+    """
+    if not use_mmap:
+        return faiss.read_index(str(path))
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    return faiss.read_index(str(path), flags)
+
+
+def write_index(index, path: Path):
+    """
+    Écrit un index FAISS de façon atomique (fichier temporaire puis rename):
+    les processus qui mappent l'ancien fichier continuent sur l'ancien inode
+    au lieu de voir un fichier tronqué.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    faiss.write_index(index, str(tmp_path))
+    os.replace(tmp_path, path)
+
+
+def prefault_file(path: Path) -> int:
+    """
+    Précharge un fichier dans le cache de pages (warm-up d'un index mappé):
+    les premières recherches ne paient plus les défauts de page sur disque.
+
+    Returns:
+        Nombre d'octets préchargés
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_WILLNEED"):
+                mapped.madvise(mmap.MADV_WILLNEED)
+            for offset in range(0, size, mmap.PAGESIZE):
+                mapped[offset]
+    return size
+
+
+def metric_name(index) -> str:
+    """Retourne le nom de la métrique d'un index ("l2" ou "ip")"""
+    return "ip" if index.metric_type == faiss.METRIC_INNER_PRODUCT else "l2"
+
+
+def _core_index(index):
+    """Descend à travers les index enveloppes (transformations, id maps, raffinage)"""
+    index = faiss.downcast_index(index)
+    while True:
+        if isinstance(index, (faiss.IndexPreTransform, faiss.IndexIDMap)):
+            index = faiss.downcast_index(index.index)
+        elif isinstance(index, faiss.IndexRefine):
+            index = faiss.downcast_index(index.base_index)
+        else:
+            return index
+
+
+def make_search_params(
+    index,
+    selector=None,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    refine_k_factor: Optional[float] = None
+):
+    """
+    Construit les paramètres de recherche adaptés au type d'index: FAISS
+    exige SearchParametersIVF pour un IVF, SearchParametersHNSW pour un
+    HNSW et IndexRefineSearchParameters pour un index raffiné, et ces
+    paramètres remplacent les valeurs portées par l'index.
+
+    Args:
+        index: Index FAISS interrogé
+        selector: IDSelector de pré-filtrage (optionnel)
+        nprobe: Nombre de listes inversées visitées (IVF)
+        ef_search: Taille de la file de recherche (HNSW)
+        refine_k_factor: Nombre de candidats re-classés sur les vecteurs exacts,
+            en multiple de k (index "...,RFlat")
+
+    Returns:
+        Les paramètres, ou None si les valeurs de l'index suffisent
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexRefine):
+        return faiss.IndexRefineSearchParameters(
+            k_factor=refine_k_factor or index.k_factor,
+            base_index_params=make_search_params(index.base_index, selector, nprobe, ef_search)
+        )
+
+    core = _core_index(index)
+    if isinstance(core, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe or core.nprobe)
+    if isinstance(core, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search or core.hnsw.efSearch)
+    if selector is not None:
+        return faiss.SearchParameters(sel=selector)
+    return None
+
+
+def enable_reconstruction(index):
+    """
+    Permet reconstruct() sur un index IVF (table directe id -> liste inversée);
+    les autres types d'index reconstruisent leurs vecteurs sans préparation
+    """
+    core = _core_index(index)
+    if isinstance(core, faiss.IndexIVF) and core.direct_map.type == faiss.DirectMap.NoMap:
+        core.make_direct_map()
+
+
+def compact_index(index, keep_ids: np.ndarray):
+    """
+    Copie de l'index ne contenant que les vecteurs `keep_ids`, renumérotés à
+    partir de 0 dans cet ordre. Les vecteurs sont reconstruits par l'index et
+    ajoutés à un clone vidé, qui garde l'entraînement (IVF, PQ): rien n'est
+    ré-encodé par le modèle. Lève RuntimeError si l'index ne sait pas
+    reconstruire ses vecteurs.
+    """
+    enable_reconstruction(index)
+    compacted = faiss.clone_index(index)
+    compacted.reset()
+    if len(keep_ids):
+        compacted.add(index.reconstruct_batch(np.asarray(keep_ids, dtype=np.int64)))
+    return compacted
+
+
+def exact_search(
+    index,
+    vectors: np.ndarray,
+    k: int,
+    candidate_ids: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Recherche exhaustive parmi un petit ensemble d'ids, à partir des vecteurs
+    reconstruits par l'index. Même convention de scores que FAISS (distance L2
+    au carré, ou produit scalaire).
+    """
+    candidates = index.reconstruct_batch(candidate_ids)
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        scores = vectors @ candidates.T
+        order = np.argsort(-scores, axis=1)[:, :k]
+    else:
+        scores = (
+            (vectors ** 2).sum(axis=1, keepdims=True)
+            - 2 * vectors @ candidates.T
+            + (candidates ** 2).sum(axis=1)
+        )
+        order = np.argsort(scores, axis=1)[:, :k]
+    return (
+        np.take_along_axis(scores, order, axis=1).astype(np.float32),
+        candidate_ids[order]
+    )
+
+
+def evaluate_index(
+    index,
+    vectors: np.ndarray,
+    k: int = 10,
+    n_queries: int = 200,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    refine_k_factor: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Mesure le compromis mémoire/précision d'un index fraîchement construit:
+    octets par vecteur (taille sérialisée) et recall@k contre une recherche
+    exacte sur les mêmes vecteurs.
+
+    Args:
+        index: Index contenant exactement `vectors`, dans le même ordre
+        vectors: Vecteurs d'origine
+        k: Nombre de voisins comparés
+        n_queries: Nombre de vecteurs tirés comme requêtes
+    """
+    n = len(vectors)
+    bytes_per_vector = faiss.serialize_index(index).size / max(n, 1)
+    report = {
+        "bytes_per_vector": round(float(bytes_per_vector), 1),
+        "float32_bytes_per_vector": index.d * 4,
+        "recall_at_k": None,
+        "k": k
+    }
+    if n == 0:
+        return report
+
+    k = min(k, n)
+    rng = np.random.default_rng(0)
+    queries = np.ascontiguousarray(
+        vectors[rng.choice(n, size=min(n_queries, n), replace=False)],
+        dtype=np.float32
+    )
+    baseline = faiss.IndexFlat(index.d, index.metric_type)
+    baseline.add(np.ascontiguousarray(vectors, dtype=np.float32))
+    _, expected = baseline.search(queries, k)
+    _, found = index.search(
+        queries, k, params=make_search_params(index, None, nprobe, ef_search, refine_k_factor)
+    )
+    hits = sum(len(np.intersect1d(e, f[f >= 0])) for e, f in zip(expected, found))
+    report["recall_at_k"] = round(hits / (len(queries) * k), 4)
+    report["k"] = k
+    return report
+
+
+def describe_index(index) -> Dict[str, Any]:
+    """Décrit un index FAISS chargé (type, métrique, entraînement)"""
+    return {
+        "type": type(faiss.downcast_index(index)).__name__,
+        "metric": metric_name(index),
+        "dimension": index.d,
+        "is_trained": index.is_trained,
+        "ntotal": index.ntotal
+    }
@@ -0,0 +1,272 @@
+# =======================
+# LEXICAL INDEX MODULE (BM25)
+# =======================
+
+import math
+import os
+import re
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Découpe un texte en termes: Unicode NFKC, casefold (ß -> ss), suites de
+    caractères alphanumériques ("25-OH" -> "25", "oh"). Pas de stemming ni de
+    mots vides: les termes exacts des analyses (TSH, Holotranscobalamin)
+    doivent correspondre tels quels, l'IDF écrase les mots fréquents.
+    """
+    return _TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", text).casefold())
+
+
+class LexicalIndex:
+    """
+    Index inversé BM25 des chunks, adressé par id de chunk (= id FAISS).
+
+    Les postings sont stockés en colonnes compactes (format CSR): pour le
+    terme t, doc_ids[offsets[t]:offsets[t + 1]] (int32, triés) et les
+    fréquences correspondantes (uint16). Les ajouts restent en attente et
+    sont fusionnés dans ces tableaux une fois, à la recherche ou à la
+    sauvegarde suivante: une ingestion par lots ne réécrit pas les tableaux
+    à chaque lot.
+    """
+
+    FORMAT_VERSION = 1
+    # Requêtes "termes exacts": peu de termes, tous présents et rares
+    FAST_PATH_MAX_TERMS = 3
+    FAST_PATH_MAX_DOCUMENT_RATIO = 0.05
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._terms: Dict[str, int] = {}
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._doc_ids = np.zeros(0, dtype=np.int32)
+        self._frequencies = np.zeros(0, dtype=np.uint16)
+        self._doc_lengths = np.zeros(0, dtype=np.int32)
+        self._length_norms = np.zeros(0, dtype=np.float32)
+
+        self._pending_terms: List[int] = []
+        self._pending_doc_ids: List[int] = []
+        self._pending_frequencies: List[int] = []
+        self._pending_lengths: List[int] = []
+        # Fusion des ajouts déclenchée par la première recherche: plusieurs
+        # lecteurs concurrents (verrou de lecture du RAG) la font une seule fois
+        self._compact_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths) + len(self._pending_lengths)
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> "LexicalIndex":
+        """Construit l'index de chunks numérotés à partir de 0"""
+        index = cls()
+        for text in texts:
+            index._add_one(text)
+        index._compact()
+        return index
+
+    def add(self, ids: Iterable[int], texts: Iterable[str]):
+        """Ajoute des chunks; leurs ids doivent suivre les ids existants"""
+        for chunk_id, text in zip(ids, texts):
+            if chunk_id != len(self):
+                raise ValueError(f"Expected chunk id {len(self)}, got {chunk_id}")
+            self._add_one(text)
+
+    def _add_one(self, text: str):
+        chunk_id = len(self)
+        counts: Dict[str, int] = {}
+        tokens = tokenize(text)
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, count in counts.items():
+            term_id = self._terms.setdefault(token, len(self._terms))
+            self._pending_terms.append(term_id)
+            self._pending_doc_ids.append(chunk_id)
+            self._pending_frequencies.append(min(count, np.iinfo(np.uint16).max))
+        self._pending_lengths.append(len(tokens))
+
+    def _compact(self):
+        """
+        Fusionne les postings en attente dans les tableaux CSR. Seuls les
+        postings en attente sont triés (par terme); leurs chunks ayant des ids
+        plus grands, ils s'insèrent à la fin de la liste de leur terme: une
+        seule copie des tableaux existants, sans les retrier.
+
+        Les lecteurs qui ne voient plus d'ajouts en attente lisent les
+        tableaux sans verrou: tout est calculé à part, publié, et la file
+        d'attente n'est vidée qu'ensuite.
+        """
+        with self._compact_lock:
+            if not self._pending_lengths:
+                return
+            n_terms = len(self._terms)
+            terms = np.asarray(self._pending_terms, dtype=np.int64)
+            order = np.argsort(terms, kind="stable")
+            terms = terms[order]
+
+            # Fin de la liste de chaque terme (fin des tableaux pour un terme nouveau)
+            old_counts = np.diff(self._offsets)
+            ends = np.full(n_terms, self._offsets[-1], dtype=np.int64)
+            ends[:len(old_counts)] = self._offsets[1:]
+            positions = ends[terms]
+            doc_ids = np.insert(
+                self._doc_ids, positions, np.asarray(self._pending_doc_ids, dtype=np.int32)[order]
+            )
+            frequencies = np.insert(
+                self._frequencies, positions, np.asarray(self._pending_frequencies, dtype=np.uint16)[order]
+            )
+            counts = np.bincount(terms, minlength=n_terms)
+            counts[:len(old_counts)] += old_counts
+            offsets = np.zeros(n_terms + 1, dtype=np.int64)
+            np.cumsum(counts, out=offsets[1:])
+            doc_lengths = np.concatenate(
+                [self._doc_lengths, np.asarray(self._pending_lengths, dtype=np.int32)]
+            )
+            length_norms = self._length_norms_of(doc_lengths)
+
+            self._offsets = offsets
+            self._doc_ids = doc_ids
+            self._frequencies = frequencies
+            self._length_norms = length_norms
+            self._doc_lengths = doc_lengths
+            self._pending_terms = []
+            self._pending_doc_ids = []
+            self._pending_frequencies = []
+            self._pending_lengths = []
+
+    def _ensure_compacted(self):
+        """Fusionne les ajouts en attente avant une lecture des tableaux"""
+        if self._pending_lengths:
+            self._compact()
+
+    def _length_norms_of(self, doc_lengths: np.ndarray) -> np.ndarray:
+        """Normalisation BM25 par longueur de chunk, k1 * (1 - b + b * dl / avgdl)"""
+        average_length = max(float(doc_lengths.mean()), 1.0) if len(doc_lengths) else 1.0
+        return (self.k1 * (1 - self.b + self.b * doc_lengths / average_length)).astype(np.float32)
+
+    def _query_terms(self, query: str) -> List[Optional[int]]:
+        """Ids des termes distincts de la requête (None si absent de l'index)"""
+        return [self._terms.get(token) for token in dict.fromkeys(tokenize(query))]
+
+    def is_selective(self, query: str) -> bool:
+        """
+        Vrai pour une requête de termes exacts ("TSH", "Holotranscobalamin"):
+        au plus FAST_PATH_MAX_TERMS termes, tous présents dans l'index et
+        chacun dans au plus FAST_PATH_MAX_DOCUMENT_RATIO des chunks
+        """
+        terms = self._query_terms(query)
+        if not terms or len(terms) > self.FAST_PATH_MAX_TERMS or None in terms:
+            return False
+        self._ensure_compacted()
+        max_documents = self.FAST_PATH_MAX_DOCUMENT_RATIO * len(self)
+        return all(self._offsets[t + 1] - self._offsets[t] <= max_documents for t in terms)
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        candidate_ids: Optional[np.ndarray] = None,
+        require_all_terms: bool = False,
+        excluded_ids: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Recherche BM25: seuls les postings des termes de la requête sont lus
+
+        Args:
+            query: Requête
+            k: Nombre de résultats
+            candidate_ids: Restreint la recherche à ces ids de chunks (triés)
+            require_all_terms: Ne garde que les chunks contenant tous les termes
+            excluded_ids: Ids de chunks supprimés, jamais retournés
+
+        Returns:
+            Les (id du chunk, score BM25), par score décroissant
+        """
+        terms = self._query_terms(query)
+        known = [t for t in terms if t is not None]
+        if not known or (require_all_terms and len(known) < len(terms)):
+            return []
+        self._ensure_compacted()
+
+        # Accumulation dense: un tableau de scores par chunk, sans tri des postings
+        n = len(self._doc_lengths)
+        scores = np.zeros(n, dtype=np.float32)
+        matched = np.zeros(n, dtype=np.int32) if require_all_terms else None
+        for term in known:
+            start, end = self._offsets[term], self._offsets[term + 1]
+            docs = self._doc_ids[start:end]
+            frequencies = self._frequencies[start:end].astype(np.float32)
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            # Un chunk apparaît au plus une fois par terme
+            scores[docs] += idf * (self.k1 + 1) * frequencies / (frequencies + self._length_norms[docs])
+            if matched is not None:
+                matched[docs] += 1
+
+        if matched is not None:
+            scores[matched < len(known)] = 0
+        if candidate_ids is not None:
+            allowed = np.zeros(n, dtype=bool)
+            allowed[candidate_ids[candidate_ids < n]] = True
+            scores[~allowed] = 0
+        if excluded_ids is not None and len(excluded_ids):
+            scores[excluded_ids[excluded_ids < n]] = 0
+
+        docs = np.flatnonzero(scores > 0)
+        if len(docs) > k:
+            docs = docs[np.argpartition(-scores[docs], k - 1)[:k]]
+        # Score décroissant, puis id croissant pour un ordre déterministe
+        order = np.lexsort((docs, -scores[docs]))
+        return [(int(docs[i]), float(scores[docs[i]])) for i in order]
+
+    @classmethod
+    def load(cls, path: Path) -> "LexicalIndex":
+        """Charge un index sauvegardé par save()"""
+        index = cls()
+        with np.load(path) as data:
+            if int(data["version"]) != cls.FORMAT_VERSION:
+                raise ValueError(f"Unsupported lexical index version: {int(data['version'])}")
+            index._terms = {term: i for i, term in enumerate(data["terms"].tolist())}
+            index._offsets = data["offsets"]
+            index._doc_ids = data["doc_ids"]
+            index._frequencies = data["frequencies"]
+            index._doc_lengths = data["doc_lengths"]
+        index._length_norms = index._length_norms_of(index._doc_lengths)
+        return index
+
+    def save(self, path: Path):
+        """Écrit l'index (fichier temporaire puis rename)"""
+        self._compact()
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        terms = np.array(list(self._terms), dtype=str) if self._terms else np.zeros(0, dtype="<U1")
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                version=np.array(self.FORMAT_VERSION),
+                terms=terms,
+                offsets=self._offsets,
+                doc_ids=self._doc_ids,
+                frequencies=self._frequencies,
+                doc_lengths=self._doc_lengths
+            )
+        os.replace(tmp_path, path)
+
+    def stats(self) -> Dict[str, int]:
+        """Taille de l'index inversé"""
+        self._ensure_compacted()
+        return {
+            "chunks": len(self),
+            "terms": len(self._terms),
+            "postings": len(self._doc_ids),
+            "bytes": int(
+                self._offsets.nbytes + self._doc_ids.nbytes
+                + self._frequencies.nbytes + self._doc_lengths.nbytes
+            )
+        }
@@ -0,0 +1,232 @@
+# =======================
+# RESULT PASSAGES MODULE
+# =======================
+
+import hashlib
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+# Chevauchement minimal reconnu entre deux chunks voisins: en dessous, une
+# coïncidence (un point, un espace) supprimerait du texte
+MIN_OVERLAP = 8
+
+
+def strip_overlap(previous: str, following: str, max_overlap: int) -> str:
+    """
+    Retire du début de `following` le texte qu'il répète à la fin de
+    `previous` (chevauchement du découpage), au plus max_overlap caractères
+
+    Returns:
+        La partie de `following` qui prolonge `previous`
+    """
+    limit = min(len(previous), len(following), max_overlap)
+    for length in range(limit, MIN_OVERLAP - 1, -1):
+        if previous.endswith(following[:length]):
+            return following[length:]
+    return following
+
+
+def content_hash(text: str) -> str:
+    """
+    Empreinte du texte normalisé d'un chunk (NFKC, espaces réduits): la même
+    pour un passage repris tel quel dans un autre livre ou une autre édition
+    """
+    normalized = " ".join(unicodedata.normalize("NFKC", text).split())
+    return hashlib.md5(normalized.encode("utf-8")).hexdigest()
+
+
+def citation(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Référence d'une occurrence: document, titre et page"""
+    return {key: metadata[key] for key in ("source", "book_title", "page") if key in metadata}
+
+
+def collapse_duplicates(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Regroupe les résultats au texte identique (même content_hash) en un seul,
+    au rang du mieux classé, qui cite toutes leurs occurrences dans
+    metadata["sources"]
+    """
+    by_hash: Dict[str, int] = {}
+    collapsed: List[Dict[str, Any]] = []
+    for result in results:
+        key = content_hash(result["content"])
+        position = by_hash.get(key)
+        if position is None:
+            by_hash[key] = len(collapsed)
+            collapsed.append(result)
+            continue
+        first = collapsed[position]
+        sources = list(first["metadata"].get("sources") or [citation(first["metadata"])])
+        for source in result["metadata"].get("sources") or [citation(result["metadata"])]:
+            if source not in sources:
+                sources.append(source)
+        collapsed[position] = {**first, "metadata": {**first["metadata"], "sources": sources}}
+    return collapsed if len(collapsed) < len(results) else results
+
+
+def _passage_key(metadata: Dict[str, Any]) -> Optional[tuple]:
+    if "source" not in metadata or not isinstance(metadata.get("chunk_index"), int):
+        return None
+    # document_hash: les chunks d'une ancienne version du même fichier ne se
+    # fusionnent pas avec ceux de la nouvelle
+    return (metadata["source"], metadata.get("document_hash"))
+
+
+def merge_adjacent_chunks(results: List[Dict[str, Any]], max_overlap: int) -> List[Dict[str, Any]]:
+    """
+    Fusionne les résultats qui sont des chunks voisins d'un même document
+    (même source, chunk_index consécutifs) en un seul passage contigu, sans
+    le texte répété par le chevauchement du découpage.
+
+    Un passage prend le rang et les scores de son chunk le mieux classé; ses
+    métadonnées sont celles de son premier chunk, avec la liste des chunks
+    fusionnés dans "merged_chunk_indices". Les résultats sans source ni
+    chunk_index sont conservés tels quels.
+
+    Args:
+        results: Résultats formatés, par rang
+        max_overlap: Chevauchement maximal recherché entre deux chunks
+            (chunk_overlap du découpage)
+    """
+    # Chunks de chaque document, par chunk_index
+    by_document: Dict[tuple, Dict[int, int]] = {}
+    for position, result in enumerate(results):
+        key = _passage_key(result["metadata"])
+        if key is not None:
+            by_document.setdefault(key, {})[result["metadata"]["chunk_index"]] = position
+
+    # Suites de chunk_index consécutifs; chaque suite est rattachée à son
+    # membre le mieux classé (plus petite position)
+    runs: Dict[int, List[int]] = {}
+    for positions in by_document.values():
+        run: List[int] = []
+        for chunk_index in sorted(positions):
+            if run and chunk_index != results[run[-1]]["metadata"]["chunk_index"] + 1:
+                runs[min(run)] = run
+                run = []
+            run.append(positions[chunk_index])
+        runs[min(run)] = run
+    if all(len(run) == 1 for run in runs.values()):
+        return results
+
+    merged_into = {position: head for head, run in runs.items() for position in run}
+    passages = []
+    for position, result in enumerate(results):
+        head = merged_into.get(position, position)
+        if head != position:
+            continue
+        run = runs.get(position)
+        if run is None or len(run) == 1:
+            passages.append(result)
+            continue
+
+        first = results[run[0]]
+        content = first["content"]
+        for member in run[1:]:
+            following = results[member]["content"]
+            rest = strip_overlap(content, following, max_overlap)
+            # Sans chevauchement, le séparateur retiré par le découpage est perdu
+            content += rest if len(rest) < len(following) else "\n" + rest
+        passages.append({
+            **result,
+            "content": content,
+            "metadata": {
+                **first["metadata"],
+                "merged_chunk_indices": [results[member]["metadata"]["chunk_index"] for member in run]
+            }
+        })
+    return passages
+
+
+# Estimation des tokens sans tokenizer: ~4 caractères par token (texte
+# anglais/allemand, tokenizers BPE des LLM)
+CHARS_PER_TOKEN = 4
+# En dessous, un morceau tronqué n'apporte rien: le résultat est omis
+MIN_TRUNCATED_CHARS = 80
+
+_SENTENCE_END = re.compile(r"[.!?…](?=\s|$)")
+
+
+def truncate_at_sentence(text: str, max_chars: int) -> str:
+    """
+    Tronque un texte à au plus max_chars caractères, à la fin de la dernière
+    phrase complète (à défaut, au dernier espace)
+    """
+    if len(text) <= max_chars:
+        return text
+    head = text[:max_chars]
+    ends = [match.end() for match in _SENTENCE_END.finditer(head)]
+    if ends:
+        return head[:ends[-1]]
+    if text[max_chars].isspace():
+        return head.rstrip()
+    space = head.rfind(" ")
+    return head[:space] if space > 0 else head
+
+
+def pack_results(
+    results: List[Dict[str, Any]],
+    max_chars: int
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Remplit un budget de caractères avec les meilleurs résultats, dans
+    l'ordre du classement: les doublons exacts sont ignorés, le premier
+    résultat qui dépasse le budget est tronqué à une fin de phrase, les
+    autres résultats trop longs pour la place restante sont omis.
+
+    Returns:
+        (résultats retenus, rapport: caractères retournés et omis, résultats
+         omis, troncature)
+    """
+    packed: List[Dict[str, Any]] = []
+    seen = set()
+    used = 0
+    omitted_results = 0
+    omitted_chars = 0
+    truncated = False
+    for result in results:
+        content = result["content"]
+        key = " ".join(content.split())
+        if key in seen:
+            # Même texte qu'un résultat déjà retenu (livre indexé deux fois...)
+            continue
+        seen.add(key)
+
+        remaining = max_chars - used
+        if len(content) <= remaining:
+            packed.append(result)
+            used += len(content)
+            continue
+        if not truncated and remaining >= MIN_TRUNCATED_CHARS:
+            kept = truncate_at_sentence(content, remaining)
+            packed.append({**result, "content": kept, "truncated": True})
+            used += len(kept)
+            omitted_chars += len(content) - len(kept)
+            truncated = True
+            continue
+        omitted_results += 1
+        omitted_chars += len(content)
+
+    return packed, {
+        "max_chars": max_chars,
+        "returned_chars": used,
+        "estimated_tokens": -(-used // CHARS_PER_TOKEN),
+        "omitted_results": omitted_results,
+        "omitted_chars": omitted_chars,
+        "truncated": truncated
+    }
+
+
+def budget_chars(max_tokens: Optional[int] = None, max_chars: Optional[int] = None) -> Optional[int]:
+    """
+    Budget en caractères d'une réponse (le plus strict des deux), None sans limite
+
+    Raises:
+        ValueError: Si un budget est nul ou négatif
+    """
+    for name, value in (("max_tokens", max_tokens), ("max_chars", max_chars)):
+        if value is not None and value <= 0:
+            raise ValueError(f"{name} must be positive, got {value}")
+    budgets = [value for value in (max_chars, max_tokens and max_tokens * CHARS_PER_TOKEN) if value is not None]
+    return min(budgets) if budgets else None
@@ -0,0 +1,215 @@
+# =======================
+# RAG CACHE MODULE
+# =======================
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Cache LRU borné et thread-safe avec TTL optionnel et compteurs de hits/misses/évictions"""
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        """
+        Args:
+            max_size: Nombre maximal d'entrées (0 désactive le cache)
+            ttl: Durée de vie d'une entrée en secondes (None = pas d'expiration)
+        """
+        self.max_size = max_size
+        self.ttl = ttl or None
+        self._data: "OrderedDict[Hashable, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Retourne la valeur associée à la clé, ou None si absente ou expirée"""
+        with self._lock:
+            try:
+                value, expires_at = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        """Ajoute ou remplace une entrée, en évinçant la moins récemment utilisée"""
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Vide le cache (les compteurs sont conservés)"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Retourne les statistiques du cache"""
+        lookups = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class SQLiteCache:
+    """
+    Cache LRU + TTL persistant dans une base SQLite, pour survivre aux redémarrages.
+    Même interface que LRUCache; les clés sont des chaînes et les valeurs doivent
+    être sérialisables en JSON.
+    """
+
+    def __init__(self, path: str, max_size: int = 1024, ttl: Optional[float] = None):
+        """
+        Args:
+            path: Chemin du fichier SQLite
+            max_size: Nombre maximal d'entrées (0 désactive le cache)
+            ttl: Durée de vie d'une entrée en secondes (None = pas d'expiration)
+        """
+        self.path = Path(path)
+        self.max_size = max_size
+        self.ttl = ttl or None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL,"
+                " last_access REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS cache_last_access ON cache (last_access)"
+            )
+
+    def get(self, key: str) -> Optional[Any]:
+        """Retourne la valeur associée à la clé, ou None si absente ou expirée"""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE cache SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(value)
+
+    def put(self, key: str, value: Any):
+        """Ajoute ou remplace une entrée, en évinçant les moins récemment utilisées"""
+        if self.max_size <= 0:
+            return
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        payload = json.dumps(value, ensure_ascii=False, default=str)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, payload, expires_at, now)
+            )
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+            if size > self.max_size:
+                deleted = self._conn.execute(
+                    "DELETE FROM cache WHERE key IN "
+                    "(SELECT key FROM cache ORDER BY last_access LIMIT ?)",
+                    (size - self.max_size,)
+                ).rowcount
+                self.evictions += deleted
+
+    def clear(self):
+        """Vide le cache (les compteurs sont conservés)"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache")
+
+    def __len__(self) -> int:
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+        return size
+
+    def stats(self) -> Dict[str, Any]:
+        """Retourne les statistiques du cache (compteurs propres au processus)"""
+        lookups = self.hits + self.misses
+        return {
+            "backend": "sqlite",
+            "path": str(self.path),
+            "size": len(self),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def create_cache(
+    backend: str = "memory",
+    max_size: int = 1024,
+    ttl: Optional[float] = None,
+    path: Optional[str] = None
+):
+    """
+    Crée un cache selon le backend demandé
+
+    Args:
+        backend: "memory" (dict LRU en mémoire) ou "sqlite" (persistant sur disque)
+        max_size: Nombre maximal d'entrées
+        ttl: Durée de vie d'une entrée en secondes
+        path: Fichier SQLite (requis pour le backend "sqlite")
+    """
+    if backend == "memory":
+        return LRUCache(max_size=max_size, ttl=ttl)
+    if backend == "sqlite":
+        if not path:
+            raise ValueError("The sqlite cache backend requires a path")
+        return SQLiteCache(path, max_size=max_size, ttl=ttl)
+    raise ValueError(f"Unknown cache backend: {backend}")
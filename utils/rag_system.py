@@ -3,20 +3,424 @@
 # =======================
 
 import os
+import asyncio
+import functools
+import itertools
 import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain.schema import Document
+from typing import List, Dict, Any, Optional, Callable, Tuple, AsyncIterator, Iterator
 import hashlib
 import json
 import pickle
+import unicodedata
+import faiss
+import numpy as np
+
+from utils.rag_cache import LRUCache, create_cache
+from utils.chunk_store import ChunkAliases, ChunkStore
+from utils.embeddings import EmbeddingBackend, create_embedding_backend
+from utils.lexical_index import LexicalIndex
+from utils.passages import (
+    budget_chars,
+    citation,
+    collapse_duplicates,
+    content_hash,
+    merge_adjacent_chunks,
+    pack_results
+)
+from utils.reranker import BudgetedReranker, create_reranker
+from utils.timings import StageLatencies, StageTimer
+from utils.faiss_index import (
+    build_index,
+    compact_index,
+    describe_index,
+    enable_reconstruction,
+    evaluate_index,
+    exact_search,
+    make_search_params,
+    metric_name,
+    prefault_file,
+    read_index,
+    training_sample_size,
+    write_index
+)
 
 logger = logging.getLogger(__name__)
 
+# Vecteurs d'origine gardés pour le rapport de construction d'un index créé
+# par une ingestion en flux (75 Mo en dimension 384); au-delà, le rapport est
+# mesuré sur ces premiers vecteurs
+BUILD_REPORT_MAX_VECTORS = 50_000
+
+
+def document_hash(file_path: str) -> str:
+    """Calcule le hash MD5 d'un fichier"""
+    hash_md5 = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(4096), b""):
+            hash_md5.update(chunk)
+    return hash_md5.hexdigest()
+
+
+def _overlap_tail(text: str, overlap: int) -> str:
+    """Fin d'un chunk reprise au début du suivant: au plus `overlap` caractères, en mots entiers"""
+    if overlap <= 0 or not text:
+        return ""
+    tail = text[-overlap:]
+    if len(text) > overlap and not text[-overlap - 1].isspace():
+        # Premier mot coupé: on le laisse au chunk précédent
+        space = tail.find(" ")
+        tail = tail[space + 1:] if space >= 0 else ""
+    return tail.lstrip()
+
+
+def iter_pdf_chunks(
+    pdf_path: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    doc_hash: str
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Découpe un PDF en chunks au fil de la lecture: les pages sont lues une à
+    une (lazy_load) et découpées dès leur lecture, la mémoire ne dépend pas
+    du nombre de pages. Le chevauchement est reporté d'une page à l'autre: le
+    premier chunk d'une page reprend la fin du dernier chunk de la page
+    précédente, une phrase coupée par un saut de page reste lisible.
+    
+    Yields:
+        (texte du chunk, métadonnées: celles de sa page, source, hash,
+         position du chunk dans le document et titre du livre)
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_community.document_loaders import PyPDFLoader
+    
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=["\n\n", "\n", " ", ""]
+    )
+    book_title = Path(pdf_path).stem
+    carry = ""
+    chunk_index = 0
+    pages = 0
+    for page in PyPDFLoader(pdf_path).lazy_load():
+        pages += 1
+        if not page.page_content.strip():
+            continue
+        pieces = text_splitter.split_text(f"{carry} {page.page_content}" if carry else page.page_content)
+        if carry and pieces and carry.endswith(pieces[0]):
+            # Chunk fait du seul chevauchement: déjà retourné avec la page précédente
+            pieces = pieces[1:]
+        for piece in pieces:
+            yield piece, {
+                **page.metadata,
+                "source": pdf_path,
+                "document_hash": doc_hash,
+                "chunk_index": chunk_index,
+                "book_title": book_title
+            }
+            chunk_index += 1
+        if pieces:
+            carry = _overlap_tail(pieces[-1], chunk_overlap)
+    logger.info(f"Split {pages} pages from {pdf_path} into {chunk_index} chunks")
+
+
+def split_pdf(
+    pdf_path: str,
+    chunk_size: int,
+    chunk_overlap: int
+) -> Tuple[List[str], List[Dict[str, Any]], str]:
+    """
+    Charge un PDF et le découpe en chunks avec leurs métadonnées (même
+    découpage que iter_pdf_chunks). Fonction de module: exécutable dans un
+    processus de travail (index_pdfs).
+    
+    Returns:
+        (textes des chunks, métadonnées, hash du document)
+    """
+    doc_hash = document_hash(pdf_path)
+    texts, metadatas = [], []
+    for text, metadata in iter_pdf_chunks(pdf_path, chunk_size, chunk_overlap, doc_hash):
+        texts.append(text)
+        metadatas.append(metadata)
+    for metadata in metadatas:
+        metadata["total_chunks"] = len(texts)
+    return texts, metadatas, doc_hash
+
+
+class _ReadWriteLock:
+    """Verrou lecteurs/écrivain: recherches concurrentes, mutations de l'index exclusives"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self, timer: Optional[StageTimer] = None):
+        started = time.perf_counter()
+        with self._cond:
+            # Les écrivains en attente sont prioritaires pour éviter la famine
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        if timer is not None:
+            # Attente derrière une mutation de l'index (ajout, rechargement)
+            timer.add("lock_wait", (time.perf_counter() - started) * 1000)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class MetadataFilterIndex:
+    """
+    Index inversé des métadonnées (valeur -> ids FAISS) construit à l'indexation,
+    pour restreindre la recherche aux chunks qui correspondent au filtre au lieu
+    de filtrer après coup le top-k
+    """
+
+    FIELDS = ("book_title", "source", "document_hash")
+
+    def __init__(self, fields: Tuple[str, ...] = FIELDS):
+        self.fields = tuple(fields)
+        self._postings: Dict[str, Dict[Any, List[int]]] = {field: {} for field in self.fields}
+        self._arrays: Dict[Tuple[str, Any], np.ndarray] = {}
+
+    @classmethod
+    def from_vector_store(cls, vector_store) -> "MetadataFilterIndex":
+        """Construit l'index à partir des colonnes de métadonnées du chunk store"""
+        filter_index = cls()
+        if vector_store is not None:
+            deleted = set(vector_store.chunks.deleted_ids().tolist())
+            for field in filter_index.fields:
+                postings = filter_index._postings[field]
+                for row, value in enumerate(vector_store.chunks.column(field)):
+                    if value is not None and row not in deleted:
+                        postings.setdefault(value, []).append(row)
+            # Occurrences dédupliquées: le chunk stocké répond aussi aux
+            # filtres sur leurs documents
+            for row, occurrences in vector_store.aliases.items():
+                if row not in deleted:
+                    filter_index.add([row] * len(occurrences), occurrences)
+        return filter_index
+
+    def add(self, ids, metadatas):
+        """Ajoute des chunks (ids FAISS et métadonnées correspondantes)"""
+        for faiss_id, metadata in zip(ids, metadatas):
+            for field in self.fields:
+                if field in metadata:
+                    self._postings[field].setdefault(metadata[field], []).append(int(faiss_id))
+        self._arrays.clear()
+
+    def remove(self, ids):
+        """Retire des chunks supprimés de toutes les valeurs"""
+        removed = set(int(faiss_id) for faiss_id in ids)
+        for postings in self._postings.values():
+            for value in list(postings):
+                kept = [faiss_id for faiss_id in postings[value] if faiss_id not in removed]
+                if kept:
+                    postings[value] = kept
+                else:
+                    del postings[value]
+        self._arrays.clear()
+    
+    def _ids(self, field: str, value: Any) -> np.ndarray:
+        key = (field, value)
+        ids = self._arrays.get(key)
+        if ids is None:
+            ids = np.unique(np.asarray(self._postings[field].get(value, []), dtype=np.int64))
+            self._arrays[key] = ids
+        return ids
+
+    def resolve(
+        self,
+        filter_metadata: Optional[Dict[str, Any]]
+    ) -> Tuple[Optional[np.ndarray], Dict[str, Any]]:
+        """
+        Traduit un filtre en ensemble d'ids candidats
+        
+        Returns:
+            (ids candidats, ou None si aucun champ indexé n'est filtré;
+             filtres restants à appliquer après la recherche)
+        """
+        if not filter_metadata:
+            return None, {}
+        
+        candidate_ids = None
+        remaining = {}
+        for field, value in filter_metadata.items():
+            if field not in self._postings:
+                remaining[field] = value
+                continue
+            ids = self._ids(field, value)
+            candidate_ids = ids if candidate_ids is None else np.intersect1d(
+                candidate_ids, ids, assume_unique=True
+            )
+        return candidate_ids, remaining
+
+    def stats(self) -> Dict[str, Any]:
+        """Nombre de valeurs distinctes par champ indexé"""
+        return {field: len(postings) for field, postings in self._postings.items()}
+
+
+class _VectorStore:
+    """
+    Index FAISS, chunk store et occurrences dédupliquées associés: la
+    position d'un vecteur est l'id de son chunk
+    """
+
+    def __init__(self, index, chunks: ChunkStore, aliases: Optional[ChunkAliases] = None):
+        self.index = index
+        self.chunks = chunks
+        self.aliases = aliases if aliases is not None else ChunkAliases(chunks.directory, chunks.name)
+        # Empreinte du texte -> id du chunk non supprimé, calculé à la première
+        # ingestion (inutile pour servir des recherches)
+        self._content_ids: Optional[Dict[str, int]] = None
+
+    def add(self, vectors: np.ndarray, texts: List[str], metadatas: List[Dict[str, Any]]) -> range:
+        """Ajoute des chunks et leurs vecteurs; retourne les ids attribués"""
+        ids = self.chunks.add(texts, metadatas)
+        self.index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+        if self._content_ids is not None:
+            for chunk_id, text in zip(ids, texts):
+                self._content_ids.setdefault(content_hash(text), chunk_id)
+        return ids
+
+    def find_content(self, text_hash: str) -> Optional[int]:
+        """Id du chunk stocké dont le texte normalisé a cette empreinte"""
+        if self._content_ids is None:
+            deleted = set(self.chunks.deleted_ids().tolist())
+            content_ids: Dict[str, int] = {}
+            for row in range(len(self.chunks)):
+                if row not in deleted:
+                    content_ids.setdefault(content_hash(self.chunks.get_text(row)), row)
+            self._content_ids = content_ids
+        return self._content_ids.get(text_hash)
+
+    def forget_contents(self):
+        """Après suppression de chunks: les empreintes seront recalculées"""
+        self._content_ids = None
+
+
+class _QueryBatcher:
+    """
+    Micro-batching des recherches asynchrones: les requêtes arrivant dans une
+    fenêtre de quelques millisecondes (ou jusqu'à max_batch_size requêtes) sont
+    encodées en un seul lot et cherchées en un seul appel FAISS.
+    """
+
+    def __init__(self, rag_system: "RAGSystem", window_ms: float, max_batch_size: int):
+        self._rag = rag_system
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._pending: List[
+            Tuple[Tuple[str, int, Optional[Dict[str, Any]]], asyncio.Future, Optional[Dict[str, float]]]
+        ] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.batches = 0
+        self.batched_queries = 0
+        self.largest_batch = 0
+
+    async def submit(
+        self,
+        query: str,
+        k: int,
+        filter_metadata: Optional[Dict[str, Any]],
+        timings: Optional[Dict[str, float]] = None
+    ) -> List[Dict[str, Any]]:
+        """Ajoute une recherche au lot courant et attend son résultat"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(((query, k, filter_metadata), future, timings))
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        
+        return await future
+
+    def _flush(self):
+        """Envoie le lot courant au pool de recherche"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        
+        self.batches += 1
+        self.batched_queries += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        requests = [request for request, _, _ in batch]
+        timings: Dict[str, float] = {}
+        try:
+            async with self._rag._pending_searches:
+                results = await self._rag._run_in_executor(
+                    self._rag._search_executor,
+                    self._rag._search_many,
+                    requests,
+                    timings
+                )
+        except Exception as e:
+            logger.error(f"Batched search failed: {e}")
+            results = [[] for _ in requests]
+        
+        for (_, future, request_timings), result in zip(batch, results):
+            if request_timings is not None:
+                # Les étapes du lot sont communes à toutes ses requêtes
+                request_timings.update(timings, batch_size=len(batch))
+            # L'appelant a pu être annulé entre-temps
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Retourne les statistiques de micro-batching"""
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+            "batches": self.batches,
+            "batched_queries": self.batched_queries,
+            "average_batch_size": round(self.batched_queries / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch
+        }
+
+
 class RAGSystem:
     """Système RAG pour indexer et rechercher dans des documents PDF avec FAISS"""
     
@@ -26,7 +430,42 @@ class RAGSystem:
         index_directory: str = "./faiss_index",
         embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2",
         chunk_size: int = 1000,
-        chunk_overlap: int = 200
+        chunk_overlap: int = 200,
+        search_workers: Optional[int] = None,
+        max_pending_searches: int = 64,
+        query_cache_size: int = 1024,
+        result_cache_size: int = 256,
+        result_cache_ttl: Optional[float] = 3600,
+        result_cache_backend: str = "memory",
+        result_cache_path: Optional[str] = None,
+        batch_window_ms: float = 2.0,
+        max_batch_size: int = 32,
+        index_factory: str = "Flat",
+        metric: str = "l2",
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        refine_k_factor: Optional[float] = None,
+        mmap_index: bool = False,
+        prefault_index: bool = False,
+        background_warmup: bool = False,
+        warmup_wait: float = 2.0,
+        embedding_backend: str = "torch",
+        onnx_quantize: bool = True,
+        onnx_threads: Optional[int] = None,
+        onnx_model_dir: Optional[str] = None,
+        retrieval_mode: str = "hybrid",
+        rrf_k: int = 60,
+        fusion_candidates: int = 20,
+        lexical_fast_path: bool = True,
+        rerank: Optional[str] = None,
+        rerank_candidates: int = 50,
+        rerank_budget_ms: float = 50.0,
+        reranker_model: Optional[str] = None,
+        merge_adjacent: bool = False,
+        index_watch_interval: Optional[float] = None,
+        compact_deleted_ratio: float = 0.25,
+        deduplicate_chunks: bool = True,
+        collapse_duplicates: bool = True
     ):
         """
         Initialise le système RAG avec FAISS
@@ -37,6 +476,75 @@ class RAGSystem:
             embedding_model: Modèle d'embedding à utiliser
             chunk_size: Taille des chunks en caractères
             chunk_overlap: Chevauchement entre chunks
+            search_workers: Nombre de threads pour l'embedding et la recherche FAISS
+                (défaut: nombre de cœurs, plafonné à 4)
+            max_pending_searches: Nombre maximal de recherches asynchrones en cours
+                ou en attente; au-delà, les appelants attendent une place
+            query_cache_size: Nombre d'embeddings de requêtes gardés en cache LRU
+                (0 désactive le cache)
+            result_cache_size: Nombre de résultats de recherche gardés en cache
+                (0 désactive le cache)
+            result_cache_ttl: Durée de vie d'un résultat en cache, en secondes
+            result_cache_backend: "memory" ou "sqlite" (persistant entre redémarrages)
+            result_cache_path: Fichier SQLite du cache de résultats
+                (défaut: <index_directory>/<index_name>_results.sqlite)
+            batch_window_ms: Fenêtre de regroupement des recherches concurrentes
+                en millisecondes (0 désactive le micro-batching)
+            max_batch_size: Taille maximale d'un micro-lot de requêtes
+            index_factory: Type d'index FAISS pour les nouveaux index, en chaîne de
+                fabrique FAISS: "Flat" (exact), "IVF256,Flat", "HNSW32", ou
+                compressé: "SQ8", "SQfp16", "PQ48", "OPQ48,IVF256,PQ48"...
+                Le suffixe ",RFlat" re-classe les candidats sur les vecteurs exacts.
+            metric: "l2" ou "ip" (produit scalaire, = cosinus car les embeddings
+                sont normalisés)
+            nprobe: Nombre de listes visitées à la recherche (index IVF)
+            ef_search: Taille de la file de recherche (index HNSW)
+            refine_k_factor: Candidats re-classés sur les vecteurs exacts, en
+                multiple de k (index "...,RFlat")
+            mmap_index: Mappe l'index en mémoire (lecture seule) au lieu de le copier
+                dans le tas: les processus d'un même nœud partagent ses pages
+            prefault_index: Précharge les pages de l'index mappé au démarrage
+            background_warmup: Charge le modèle d'embedding et l'index en
+                arrière-plan au lieu de bloquer le constructeur (serveurs: le
+                port est ouvert avant la fin du chargement)
+            warmup_wait: Attente maximale d'un outil MCP pendant le warm-up,
+                en secondes, avant de répondre avec le statut "warming"
+            embedding_backend: "torch" (sentence-transformers) ou "onnx" (ONNX
+                Runtime, modèle exporté une fois au premier chargement)
+            onnx_quantize: Utilise la variante int8 (quantification dynamique)
+                du modèle ONNX
+            onnx_threads: Threads intra-op d'ONNX Runtime par inférence
+            onnx_model_dir: Répertoire des modèles ONNX exportés
+                (défaut: <index_directory>/onnx)
+            retrieval_mode: "hybrid" (BM25 + vecteurs, fusion RRF), "vector"
+                ou "lexical" (BM25 seul, sans embedding)
+            rrf_k: Constante de la fusion par rangs réciproques, 1 / (rrf_k + rang)
+            fusion_candidates: Candidats de chaque recherche avant fusion
+                (au moins k)
+            lexical_fast_path: En mode hybride, répond aux requêtes de termes
+                exacts et rares ("TSH") par BM25 seul, sans calculer d'embedding
+            rerank: Second étage de re-classement des candidats: None (désactivé),
+                "vectors" (re-score exact sur les vecteurs de l'index) ou
+                "cross-encoder"
+            rerank_candidates: Candidats du premier étage re-scorés au plus
+            rerank_budget_ms: Budget de temps du second étage par requête; au-delà,
+                les candidats restants gardent l'ordre du premier étage
+            reranker_model: Modèle du cross-encoder
+                (défaut: cross-encoder/ms-marco-MiniLM-L-6-v2)
+            merge_adjacent: Fusionne les résultats qui sont des chunks voisins
+                d'un même document en un passage, sans le texte répété par
+                le chevauchement
+            index_watch_interval: Intervalle en secondes de surveillance du
+                fichier d'index: une reconstruction par un autre processus est
+                rechargée à chaud (None désactive la surveillance)
+            compact_deleted_ratio: Part de chunks supprimés (documents retirés
+                ou remplacés) au-delà de laquelle l'index est compacté
+            deduplicate_chunks: Un chunk au texte (normalisé) déjà indexé, repris
+                d'un autre livre ou d'une autre édition, n'est ni encodé ni
+                stocké une seconde fois: son occurrence est rattachée au chunk
+                existant
+            collapse_duplicates: Regroupe les résultats au texte identique en un
+                seul, qui cite tous leurs livres
         """
         self.index_name = index_name
         self.index_directory = Path(index_directory)
@@ -44,37 +552,419 @@ class RAGSystem:
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         
+        # Exécuteurs dédiés: les recherches ne doivent pas bloquer la boucle
+        # d'événements, et une indexation longue ne doit pas occuper les
+        # threads de recherche. PyTorch et FAISS relâchent le GIL.
+        self.search_workers = search_workers or min(4, os.cpu_count() or 1)
+        self._search_executor = ThreadPoolExecutor(
+            max_workers=self.search_workers,
+            thread_name_prefix="rag-search"
+        )
+        self._index_executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="rag-index"
+        )
+        self._pending_searches = asyncio.Semaphore(max_pending_searches)
+        self._lock = _ReadWriteLock()
+        
+        # Cache LRU requête normalisée -> embedding: les workflows répètent
+        # souvent les mêmes requêtes, autant éviter le passage dans le transformer
+        self._query_embedding_cache = LRUCache(query_cache_size)
+        
+        # Micro-batching des recherches asynchrones concurrentes
+        self._batcher = (
+            _QueryBatcher(self, batch_window_ms, max_batch_size)
+            if batch_window_ms > 0 and max_batch_size > 1
+            else None
+        )
+        
         # Chemins des fichiers
         self.index_path = self.index_directory / f"{index_name}.faiss"
         self.metadata_path = self.index_directory / f"{index_name}_metadata.pkl"
+        # Ancien docstore LangChain picklé, migré une fois vers le chunk store
+        self.docstore_path = self.index_directory / f"{index_name}.pkl"
         self.hash_path = self.index_directory / f"{index_name}_hashes.json"
+        self.lexical_path = self.index_directory / f"{index_name}_lexical.npz"
+        self.index_config_path = self.index_directory / f"{index_name}_index.json"
+        
+        # Type d'index demandé pour les nouveaux index, et paramètres de recherche.
+        # Un index existant garde le type avec lequel il a été construit
+        # (persisté dans <index_name>_index.json) jusqu'à sa reconstruction.
+        self.index_factory = index_factory
+        self.metric = metric
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.refine_k_factor = refine_k_factor
+        self.mmap_index = mmap_index
+        self.prefault_index = prefault_index
+        self._index_mmapped = False
+        self.index_config = {"index_factory": index_factory, "metric": metric}
+        # Vecteurs d'un index créé par l'ingestion en cours, pour son rapport
+        # de construction une fois tous les lots ajoutés
+        self._build_vectors: Optional[List[np.ndarray]] = None
         
-        # Configuration de l'embedding
-        logger.info(f"Initializing embeddings with model: {embedding_model}")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=embedding_model,
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
+        # Cache de résultats versionné par la génération de l'index: toute
+        # mutation change la génération, donc les entrées périmées ne sont
+        # plus jamais adressées (elles expirent ou sont évincées)
+        self.index_generation = 0
+        # Les chunks d'un document retiré ou remplacé sont marqués supprimés
+        # dans le chunk store (les ids FAISS ne changent pas), puis retirés
+        # physiquement quand ils dépassent cette part de l'index
+        self.compact_deleted_ratio = compact_deleted_ratio
+        self._compactions = 0
+        self._loaded_index_mtime: Optional[int] = None
+        self._result_cache = create_cache(
+            backend=result_cache_backend,
+            max_size=result_cache_size,
+            ttl=result_cache_ttl,
+            path=result_cache_path or str(self.index_directory / f"{index_name}_results.sqlite")
         )
         
-        # Charger ou initialiser le vector store
-        self.vector_store = self._load_or_create_vector_store()
+        # Modèle d'embedding et index: chargés par warm_up(). LangChain et
+        # sentence-transformers (torch) ne sont importés qu'à ce moment-là,
+        # le découpage des PDFs qu'à la première indexation.
+        self.embedding_model = embedding_model
+        self.embedding_backend = embedding_backend
+        self.onnx_quantize = onnx_quantize
+        self.onnx_threads = onnx_threads
+        self.onnx_model_dir = Path(onnx_model_dir) if onnx_model_dir else self.index_directory / "onnx"
+        self.embeddings: Optional[EmbeddingBackend] = None
+        self.vector_store = None
+        self._filter_index = MetadataFilterIndex()
+        
+        # Recherche lexicale BM25 sur les mêmes chunks, fusionnée avec la
+        # recherche vectorielle (les termes exacts des analyses sont mal
+        # servis par les embeddings denses)
+        if retrieval_mode not in ("hybrid", "vector", "lexical"):
+            raise ValueError(f"Unknown retrieval mode: {retrieval_mode}")
+        self.retrieval_mode = retrieval_mode
+        self.rrf_k = rrf_k
+        self.fusion_candidates = fusion_candidates
+        self.lexical_fast_path = lexical_fast_path
+        self._lexical_index = LexicalIndex()
+        self._lexical_fast_path_hits = 0
+        
+        # Second étage optionnel, chargé avec le modèle d'embedding
+        self.rerank = rerank
+        self.rerank_candidates = rerank_candidates
+        self.rerank_budget_ms = rerank_budget_ms
+        self.reranker_model = reranker_model
+        self._reranker: Optional[BudgetedReranker] = None
+        
+        # Post-traitement: moins d'octets envoyés et de tokens dans le contexte du LLM
+        self.merge_adjacent = merge_adjacent
+        self._merged_chunks = 0
+        self.deduplicate_chunks = deduplicate_chunks
+        self.collapse_duplicates = collapse_duplicates
+        self._collapsed_results = 0
+        
+        # Réglages qui changent les résultats d'une requête sans changer
+        # l'index: ils entrent dans la clé du cache de résultats, que le
+        # backend SQLite conserve d'un redémarrage à l'autre
+        self._result_config_hash = hashlib.md5(json.dumps({
+            "embedding_model": embedding_model,
+            "embedding_backend": embedding_backend,
+            "onnx_quantize": onnx_quantize,
+            "nprobe": nprobe,
+            "ef_search": ef_search,
+            "refine_k_factor": refine_k_factor,
+            "retrieval_mode": retrieval_mode,
+            "rrf_k": rrf_k,
+            "fusion_candidates": fusion_candidates,
+            "lexical_fast_path": lexical_fast_path,
+            "rerank": rerank,
+            "rerank_candidates": rerank_candidates,
+            "rerank_budget_ms": rerank_budget_ms,
+            "reranker_model": reranker_model,
+            "merge_adjacent": merge_adjacent,
+            "chunk_overlap": chunk_overlap,
+            "collapse_duplicates": collapse_duplicates
+        }, sort_keys=True, default=str).encode()).hexdigest()
+        # Histogrammes de latence par étape du chemin de recherche
+        self._search_latency = StageLatencies()
+        
+        # État de préparation: les recherches et l'indexation attendent la fin
+        # du warm-up, les outils MCP n'attendent que warmup_wait secondes
+        self.warmup_wait = warmup_wait
+        self.warmup_state = "pending"
+        self.warmup_error: Optional[str] = None
+        self._warmup_components: Dict[str, Dict[str, Any]] = {
+            name: {"state": "pending", "seconds": None}
+            for name in ("embedding_model", "index", "first_query")
+        }
+        self._ready = threading.Event()
         
         # Charger les hashes des documents indexés
         self.indexed_hashes = self._load_indexed_hashes()
+        
+        # Rechargement à chaud d'un index reconstruit par un autre processus
+        self.index_watch_interval = index_watch_interval
+        self._reload_stats: Dict[str, Any] = {
+            "reloads": 0, "failed": 0, "last_error": None, "last_reload_seconds": None
+        }
+        self._closed = threading.Event()
+        if index_watch_interval:
+            threading.Thread(
+                target=self._watch_index_file, name="rag-index-watch", daemon=True
+            ).start()
+        
+        if background_warmup:
+            # L'exécuteur d'indexation est mono-thread: une indexation
+            # demandée pendant le warm-up passe après lui
+            self._index_executor.submit(self._warm_up_in_background)
+        else:
+            self.warm_up()
     
-    def _load_or_create_vector_store(self) -> Optional[FAISS]:
-        """Charge un index FAISS existant ou retourne None"""
-        if self.index_path.exists():
+    def _load_embeddings(self):
+        """Charge le modèle d'embedding avec le backend configuré"""
+        logger.info(
+            f"Initializing embeddings with model: {self.embedding_model} "
+            f"({self.embedding_backend} backend)"
+        )
+        self.embeddings = create_embedding_backend(
+            self.embedding_model,
+            backend=self.embedding_backend,
+            model_dir=self.onnx_model_dir,
+            quantize=self.onnx_quantize,
+            intra_op_threads=self.onnx_threads
+        )
+        if self.rerank:
+            logger.info(f"Initializing {self.rerank} reranker")
+            self._reranker = BudgetedReranker(
+                create_reranker(self.rerank, self.reranker_model),
+                candidates=self.rerank_candidates,
+                budget_ms=self.rerank_budget_ms
+            )
+    
+    def _load_index(self):
+        """Charge le vector store et l'index des métadonnées"""
+        self.vector_store = self._load_or_create_vector_store()
+        self._filter_index = MetadataFilterIndex.from_vector_store(self.vector_store)
+        self._lexical_index = self._load_lexical_index(self.vector_store)
+        self._prepare_index(self.vector_store)
+        self._refresh_index_generation()
+    
+    def _prepare_index(self, vector_store: Optional[_VectorStore]):
+        """
+        Prépare un index chargé ou modifié (sans lecteurs concurrents): table
+        directe des IVF pour compléter les recherches filtrées par une
+        recherche exacte, puis préparation du re-classeur
+        """
+        if vector_store is None:
+            return
+        enable_reconstruction(vector_store.index)
+        if self._reranker is not None:
+            self._reranker.reranker.prepare(vector_store)
+    
+    def _load_lexical_index(self, vector_store: Optional[_VectorStore]) -> LexicalIndex:
+        """Charge l'index BM25, ou le reconstruit depuis le chunk store s'il manque"""
+        if vector_store is None:
+            return LexicalIndex()
+        chunks = vector_store.chunks
+        if self.lexical_path.exists():
             try:
-                logger.info(f"Loading existing FAISS index from {self.index_path}")
-                vector_store = FAISS.load_local(
-                    str(self.index_directory),
-                    self.embeddings,
-                    index_name=self.index_name,
-                    allow_dangerous_deserialization=True  # Nécessaire pour charger les metadatas
+                lexical_index = LexicalIndex.load(self.lexical_path)
+                if len(lexical_index) == len(chunks):
+                    return lexical_index
+                logger.warning(
+                    f"Lexical index has {len(lexical_index)} chunks for {len(chunks)}, rebuilding"
                 )
-                logger.info("FAISS index loaded successfully")
+            except Exception as e:
+                logger.warning(f"Failed to load lexical index: {e}")
+        
+        logger.info(f"Building lexical index from {len(chunks)} chunks")
+        lexical_index = LexicalIndex.build(chunks.get_text(row) for row in range(len(chunks)))
+        lexical_index.save(self.lexical_path)
+        return lexical_index
+    
+    def _warm_component(self, name: str, load: Callable[[], Any]):
+        """Exécute une étape du warm-up en mesurant sa durée"""
+        component = self._warmup_components[name]
+        component["state"] = "loading"
+        started = time.perf_counter()
+        try:
+            load()
+        except Exception:
+            component["state"] = "failed"
+            raise
+        finally:
+            component["seconds"] = round(time.perf_counter() - started, 3)
+        component["state"] = "ready"
+        logger.info(f"RAG warm-up: {name} ready in {component['seconds']}s")
+    
+    def warm_up(self):
+        """
+        Charge le modèle d'embedding et l'index, puis encode une première
+        requête pour que la première vraie recherche ne paie pas
+        l'initialisation paresseuse du modèle
+        """
+        self.warmup_state = "warming"
+        try:
+            self._warm_component("embedding_model", self._load_embeddings)
+            self._warm_component("index", self._load_index)
+            self._warm_component("first_query", lambda: self.embeddings.embed_query("warm-up"))
+            self.warmup_state = "ready"
+        except Exception as e:
+            self.warmup_state = "failed"
+            self.warmup_error = str(e)
+            raise
+        finally:
+            self._ready.set()
+    
+    def _warm_up_in_background(self):
+        try:
+            self.warm_up()
+        except Exception as e:
+            logger.error(f"RAG warm-up failed: {e}")
+    
+    def readiness(self) -> Dict[str, Any]:
+        """État de préparation par composant, avec les durées de chargement"""
+        return {
+            "ready": self.warmup_state == "ready",
+            "state": self.warmup_state,
+            "error": self.warmup_error,
+            "components": {name: dict(component) for name, component in self._warmup_components.items()}
+        }
+    
+    async def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        Attend la fin du warm-up sans bloquer la boucle d'événements
+        
+        Returns:
+            True si le système est prêt, False s'il est encore en warm-up
+            (ou si le warm-up a échoué)
+        """
+        if not self._ready.is_set():
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._ready.wait, timeout)
+        return self.warmup_state == "ready"
+    
+    def _load_index_config(self) -> Dict[str, Any]:
+        """Charge la configuration persistée de l'index (type, métrique)"""
+        if self.index_config_path.exists():
+            try:
+                with open(self.index_config_path, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.error(f"Failed to load index config: {e}")
+        # Index construits avant la persistance de la configuration
+        return {"index_factory": "Flat", "metric": "l2"}
+    
+    def _save_index_config(self):
+        """Sauvegarde la configuration de l'index à côté de celui-ci"""
+        with open(self.index_config_path, 'w') as f:
+            json.dump(self.index_config, f)
+    
+    def _create_vector_store(self, vectors: np.ndarray) -> _VectorStore:
+        """
+        Crée un vector store vide avec le type d'index configuré,
+        entraîné sur les vecteurs fournis si nécessaire
+        """
+        index, effective_factory = build_index(
+            self.index_factory,
+            vectors.shape[1],
+            self.metric,
+            vectors
+        )
+        self.index_config = {
+            "index_factory": effective_factory,
+            "requested_index_factory": self.index_factory,
+            "metric": self.metric,
+            "trained_on": len(vectors),
+            # Les requêtes doivent être encodées par le modèle des chunks
+            "embedding_model": self.embedding_model,
+            "embedding_backend": self.embedding_backend,
+            "dimension": int(vectors.shape[1])
+        }
+        return _VectorStore(index, ChunkStore(self.index_directory, self.index_name))
+    
+    def _report_index_build(self, vectors: np.ndarray):
+        """
+        Mesure octets/vecteur et recall@10 du nouvel index contre un index
+        exact. `vectors` sont les vecteurs d'origine de l'index, dans l'ordre;
+        s'ils n'en sont que les premiers, la mesure porte sur un index de même
+        type entraîné sur les mêmes vecteurs et ne contenant qu'eux.
+        """
+        index = self.vector_store.index
+        try:
+            if len(vectors) < index.ntotal:
+                index, _ = build_index(
+                    self.index_config["index_factory"],
+                    index.d,
+                    self.index_config["metric"],
+                    vectors[:self.index_config["trained_on"]]
+                )
+                index.add(vectors)
+            report = evaluate_index(
+                index,
+                vectors,
+                nprobe=self.nprobe,
+                ef_search=self.ef_search,
+                refine_k_factor=self.refine_k_factor
+            )
+        except Exception as e:
+            logger.warning(f"Failed to evaluate index build: {e}")
+            return
+        self.index_config["build_report"] = report
+        logger.info(
+            f"Index '{self.index_config['index_factory']}': "
+            f"{report['bytes_per_vector']} bytes/vector "
+            f"(float32: {report['float32_bytes_per_vector']}), "
+            f"recall@{report['k']} vs flat: {report['recall_at_k']}"
+        )
+    
+    def _embedding_dimension(self) -> int:
+        """Dimension des vecteurs produits par le modèle d'embedding chargé"""
+        dimension = getattr(self.embeddings, "dimension", None)
+        if dimension is None:
+            dimension = len(self.embeddings.embed_query("dimension"))
+        return int(dimension)
+    
+    def _check_embedding_model(self, index_config: Dict[str, Any]):
+        """
+        Refuse un index encodé par un autre modèle d'embedding: ses vecteurs
+        ne sont pas comparables à ceux des requêtes. Les backends torch et
+        onnx d'un même modèle sont interchangeables (parité vérifiée à
+        l'export). Les index construits avant la persistance du modèle ne
+        sont contrôlés que sur leur dimension.
+        
+        Raises:
+            ValueError: Si le modèle ou la dimension de l'index diffèrent
+        """
+        model = index_config.get("embedding_model")
+        if model is not None and model != self.embedding_model:
+            raise ValueError(
+                f"Index was built with embedding model '{model}', configured "
+                f"model is '{self.embedding_model}': rebuild the index or configure '{model}'"
+            )
+        dimension = index_config.get("dimension")
+        if dimension is not None and dimension != self._embedding_dimension():
+            raise ValueError(
+                f"Index has {dimension}-dimensional vectors, embedding model "
+                f"'{self.embedding_model}' produces {self._embedding_dimension()}"
+            )
+    
+    def _training_sample_size(self) -> int:
+        """Chunks à réunir avant de créer un index du type configuré (0 sans entraînement)"""
+        return training_sample_size(self.index_factory, self._embedding_dimension(), self.metric)
+    
+    def _finish_index_build(self):
+        """Rapport de construction de l'index créé par l'ingestion qui se termine"""
+        build_vectors, self._build_vectors = self._build_vectors, None
+        if build_vectors and self.vector_store is not None:
+            self._report_index_build(np.concatenate(build_vectors))
+    
+    def _load_or_create_vector_store(self) -> Optional[_VectorStore]:
+        """
+        Charge un index FAISS existant ou retourne None. Un index encodé par
+        un autre modèle d'embedding fait échouer le warm-up au lieu d'être
+        ignoré (puis écrasé par la prochaine indexation).
+        """
+        if self.index_path.exists():
+            self._check_embedding_model(self._load_index_config())
+            try:
+                vector_store, self.index_config = self._read_vector_store()
+                self._index_mmapped = self.mmap_index
                 return vector_store
             except Exception as e:
                 logger.error(f"Failed to load FAISS index: {e}")
@@ -83,15 +973,223 @@ class RAGSystem:
             logger.info("No existing FAISS index found")
             return None
     
+    def _read_vector_store(self) -> Tuple[_VectorStore, Dict[str, Any]]:
+        """
+        Lit l'index FAISS et le chunk store sauvegardés, sans modifier l'état
+        courant (chargement initial et rechargement à chaud)
+        
+        Returns:
+            (vector store, configuration persistée de l'index)
+        """
+        logger.info(f"Loading existing FAISS index from {self.index_path}")
+        index_config = self._load_index_config()
+        index = read_index(self.index_path, use_mmap=self.mmap_index)
+        # La dimension est portée par l'index lui-même
+        index_config["dimension"] = index.d
+        self._check_embedding_model(index_config)
+        if self.mmap_index and self.prefault_index:
+            size = prefault_file(self.index_path)
+            logger.info(f"Prefaulted {size} bytes of mapped FAISS index")
+        
+        # Chunks: seuls les dictionnaires de métadonnées sont lus ici
+        if ChunkStore.exists(self.index_directory, self.index_name):
+            chunks = ChunkStore.load(self.index_directory, self.index_name)
+        else:
+            chunks = self._migrate_docstore(index.ntotal)
+        if len(chunks) < index.ntotal:
+            chunks.close()
+            raise ValueError(
+                f"Chunk store has {len(chunks)} chunks for {index.ntotal} vectors"
+            )
+        vector_store = _VectorStore(index, chunks, ChunkAliases.load(self.index_directory, self.index_name))
+        
+        # La métrique est portée par l'index lui-même
+        index_config["metric"] = metric_name(vector_store.index)
+        if index_config.get("index_factory") != self.index_factory:
+            logger.warning(
+                f"Index was built as '{index_config.get('index_factory')}', "
+                f"configured type '{self.index_factory}' applies after a rebuild"
+            )
+        logger.info("FAISS index loaded successfully")
+        return vector_store, index_config
+    
+    def _migrate_docstore(self, ntotal: int) -> ChunkStore:
+        """
+        Convertit l'ancien docstore LangChain picklé en chunk store (une seule
+        fois): les chargements suivants n'ont plus à désérialiser de pickle
+        """
+        logger.info(f"Migrating pickled docstore {self.docstore_path} to chunk store")
+        # Fichier local écrit par les versions précédentes de ce module
+        with open(self.docstore_path, 'rb') as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        documents = [docstore.search(index_to_docstore_id[i]) for i in range(ntotal)]
+        
+        chunks = ChunkStore(self.index_directory, self.index_name)
+        chunks.add(
+            [doc.page_content for doc in documents],
+            [doc.metadata for doc in documents]
+        )
+        chunks.save()
+        logger.info(f"Migrated {ntotal} chunks; {self.docstore_path.name} is no longer used")
+        return chunks
+    
+    def _ensure_writable_index(self):
+        """Un index mappé est en lecture seule: le recharger dans le tas avant mutation"""
+        if self.vector_store is not None and self._index_mmapped:
+            logger.info("Loading mapped FAISS index into memory for update")
+            self.vector_store.index = read_index(self.index_path)
+            self._index_mmapped = False
+            self._prepare_index(self.vector_store)
+    
     def _save_vector_store(self):
         """Sauvegarde l'index FAISS"""
-        if self.vector_store:
-            logger.info(f"Saving FAISS index to {self.index_path}")
-            self.vector_store.save_local(
-                str(self.index_directory),
-                index_name=self.index_name
-            )
-            logger.info("FAISS index saved successfully")
+        try:
+            if self.vector_store:
+                logger.info(f"Saving FAISS index to {self.index_path}")
+                # Écritures atomiques: d'autres processus peuvent mapper l'index
+                # et le chunk store. Les chunks d'abord: un index ne référence
+                # jamais un chunk absent du disque.
+                self.vector_store.chunks.save()
+                self.vector_store.aliases.save()
+                self._lexical_index.save(self.lexical_path)
+                write_index(self.vector_store.index, self.index_path)
+                self._save_index_config()
+                logger.info("FAISS index saved successfully")
+                
+                if self.mmap_index:
+                    # Rendre la copie privée et repartager les pages du fichier
+                    self.vector_store.index = read_index(self.index_path, use_mmap=True)
+                    self._index_mmapped = True
+                self._prepare_index(self.vector_store)
+        finally:
+            # Le store en mémoire a changé même si la sauvegarde échoue
+            self._refresh_index_generation()
+    
+    def _refresh_index_generation(self):
+        """
+        Met à jour la génération de l'index après chargement ou mutation.
+        Dérivée du mtime du fichier d'index pour rester stable entre
+        redémarrages (cache SQLite) et changer à chaque sauvegarde.
+        """
+        mtime = self._index_file_mtime()
+        # Version du fichier chargée ou écrite par ce processus: un autre
+        # mtime signale une reconstruction par un autre processus (init_rag.py)
+        self._loaded_index_mtime = mtime
+        if mtime is not None:
+            # Deux sauvegardes dans la même résolution d'horloge: forcer un changement
+            self.index_generation = max(mtime, self.index_generation + 1)
+        else:
+            self.index_generation += 1
+    
+    def _index_file_mtime(self) -> Optional[int]:
+        """mtime (ns) du fichier d'index sur disque, None s'il n'existe pas"""
+        try:
+            return self.index_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+    
+    def index_changed_on_disk(self) -> bool:
+        """Vrai si le fichier d'index a été réécrit depuis son chargement"""
+        mtime = self._index_file_mtime()
+        return mtime is not None and mtime != self._loaded_index_mtime
+    
+    def reload_index(self, force: bool = False) -> Dict[str, Any]:
+        """
+        Recharge à chaud l'index reconstruit sur disque (scripts/init_rag.py)
+        
+        La nouvelle génération (index FAISS, chunk store, index BM25 et des
+        métadonnées) est chargée sans verrou, pendant que les recherches
+        continuent sur l'ancienne. L'échange prend ensuite le verrou
+        d'écriture: les recherches en cours se terminent sur l'ancienne
+        génération, les suivantes attendent le temps de l'échange (quelques
+        affectations). L'ancienne génération est alors libérée (fichiers
+        mappés fermés), aucun lecteur ne pouvant plus la référencer.
+        
+        À appeler hors des mutations de l'index: areload_index et la
+        surveillance du fichier passent par l'exécuteur d'indexation.
+        
+        Args:
+            force: Recharge même si le fichier d'index n'a pas changé
+        
+        Returns:
+            Dict avec le statut ("reloaded", "unchanged" ou "error") et les générations
+        """
+        self._ready.wait()
+        previous_generation = self.index_generation
+        mtime = self._index_file_mtime()
+        if mtime is None or not (force or mtime != self._loaded_index_mtime):
+            return {"status": "unchanged", "index_generation": previous_generation}
+        
+        started = time.perf_counter()
+        logger.info(f"Reloading FAISS index from {self.index_path}")
+        try:
+            vector_store, index_config = self._read_vector_store()
+            try:
+                current = self.vector_store
+                if current is not None and current.index.d != vector_store.index.d:
+                    raise ValueError(
+                        f"Index dimension {vector_store.index.d} does not match "
+                        f"the loaded index ({current.index.d})"
+                    )
+                filter_index = MetadataFilterIndex.from_vector_store(vector_store)
+                lexical_index = self._load_lexical_index(vector_store)
+                self._prepare_index(vector_store)
+                indexed_hashes = self._load_indexed_hashes()
+                if self._index_file_mtime() != mtime:
+                    # Écriture en cours: la prochaine tentative verra l'index complet
+                    raise RuntimeError("Index file changed while reloading")
+            except Exception:
+                vector_store.chunks.close()
+                raise
+        except Exception as e:
+            self._reload_stats["failed"] += 1
+            self._reload_stats["last_error"] = str(e)
+            logger.error(f"Failed to reload FAISS index, keeping generation {previous_generation}: {e}")
+            return {"status": "error", "error": str(e), "index_generation": previous_generation}
+        load_seconds = time.perf_counter() - started
+        
+        with self._lock.write():
+            previous = self.vector_store
+            self.vector_store = vector_store
+            self.index_config = index_config
+            self._index_mmapped = self.mmap_index
+            self._filter_index = filter_index
+            self._lexical_index = lexical_index
+            self.indexed_hashes = indexed_hashes
+            self._refresh_index_generation()
+            self._loaded_index_mtime = mtime
+        
+        # Plus aucun lecteur sur l'ancienne génération: libérer ses fichiers mappés
+        if previous is not None:
+            previous.chunks.close()
+        
+        total_seconds = time.perf_counter() - started
+        self._reload_stats["reloads"] += 1
+        self._reload_stats["last_error"] = None
+        self._reload_stats["last_reload_seconds"] = round(total_seconds, 3)
+        logger.info(
+            f"Reloaded FAISS index ({vector_store.index.ntotal} vectors) in {total_seconds:.2f}s "
+            f"(swap {(total_seconds - load_seconds) * 1000:.1f} ms), "
+            f"generation {previous_generation} -> {self.index_generation}"
+        )
+        return {
+            "status": "reloaded",
+            "previous_generation": previous_generation,
+            "index_generation": self.index_generation,
+            "total_vectors": vector_store.index.ntotal,
+            "seconds": round(total_seconds, 3)
+        }
+    
+    def _watch_index_file(self):
+        """Surveille le fichier d'index et planifie un rechargement s'il change"""
+        while not self._closed.wait(self.index_watch_interval):
+            if self._ready.is_set() and self.index_changed_on_disk():
+                logger.info("FAISS index changed on disk, scheduling reload")
+                try:
+                    self._index_executor.submit(self.reload_index).result()
+                except RuntimeError:
+                    # Exécuteur arrêté (close)
+                    return
     
     def _load_indexed_hashes(self) -> Dict[str, str]:
         """Charge les hashes des documents déjà indexés"""
@@ -110,29 +1208,80 @@ class RAGSystem:
     
     def _get_document_hash(self, file_path: str) -> str:
         """Calcule le hash MD5 d'un fichier"""
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+        return document_hash(file_path)
     
     def _is_document_indexed(self, file_path: str) -> bool:
         """Vérifie si un document est déjà indexé"""
         doc_hash = self._get_document_hash(file_path)
         return file_path in self.indexed_hashes and self.indexed_hashes[file_path] == doc_hash
     
-    def index_pdf(self, pdf_path: str, force_reindex: bool = False) -> Dict[str, Any]:
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        """Normalise une requête (Unicode NFC, espaces) pour servir de clé de cache"""
+        return " ".join(unicodedata.normalize("NFC", query).split())
+    
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Calcule les embeddings de plusieurs requêtes en un seul appel au modèle,
+        en passant par le cache LRU (les doublons ne sont encodés qu'une fois)
+        """
+        keys = [self._normalize_query(query) for query in queries]
+        vectors: Dict[str, np.ndarray] = {}
+        missing: List[str] = []
+        for key in keys:
+            if key in vectors or key in missing:
+                continue
+            cached = self._query_embedding_cache.get(key)
+            if cached is None:
+                missing.append(key)
+            else:
+                vectors[key] = cached
+        
+        if missing:
+            # Le modèle n'utilise pas d'instruction spécifique aux requêtes:
+            # embed_documents encode un lot de requêtes en une seule passe
+            embedded = np.asarray(self.embeddings.embed_documents(missing), dtype=np.float32)
+            for key, embedding in zip(missing, embedded):
+                embedding.flags.writeable = False
+                self._query_embedding_cache.put(key, embedding)
+                vectors[key] = embedding
+        
+        return np.stack([vectors[key] for key in keys])
+    
+    def _embed_query(self, query: str) -> np.ndarray:
+        """Calcule l'embedding d'une requête en passant par le cache LRU"""
+        return self._embed_queries([query])[0]
+    
+    def index_pdf(
+        self,
+        pdf_path: str,
+        force_reindex: bool = False,
+        embed_batch_size: int = 256
+    ) -> Dict[str, Any]:
         """
         Indexe un fichier PDF dans le vector store FAISS
         
+        L'indexation est en flux: les pages sont lues et découpées au fil de
+        l'eau, les chunks encodés et ajoutés par lots de embed_batch_size. Les
+        pages et les vecteurs en mémoire sont bornés par la taille du lot, pas
+        par celle du PDF (seul le texte des chunks reste en attente jusqu'à la
+        sauvegarde, unique, à la fin). Le premier lot d'un nouvel index
+        entraîné (IVF, PQ) réunit son échantillon d'entraînement, et le
+        rapport de construction est mesuré à la fin.
+        
+        Les chunks d'une version précédente du même fichier sont remplacés:
+        seul ce PDF est ré-encodé, les autres documents de l'index sont conservés.
+        
         Args:
             pdf_path: Chemin vers le fichier PDF
             force_reindex: Force la réindexation même si le document existe
+            embed_batch_size: Chunks encodés et ajoutés par lot
             
         Returns:
             Dict avec les statistiques d'indexation
         """
         logger.info(f"Starting PDF indexing: {pdf_path}")
+        self._ready.wait()
         
         # Vérifier si le document est déjà indexé
         if not force_reindex and self._is_document_indexed(pdf_path):
@@ -143,78 +1292,952 @@ class RAGSystem:
                 "chunks_added": 0
             }
         
+        chunks_removed = None
         try:
-            # 1. Charger le PDF
-            logger.info("Loading PDF...")
-            loader = PyPDFLoader(pdf_path)
-            documents = loader.load()
-            logger.info(f"Loaded {len(documents)} pages from PDF")
-            
-            # 2. Découper en chunks
-            logger.info("Splitting documents into chunks...")
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=self.chunk_size,
-                chunk_overlap=self.chunk_overlap,
-                length_function=len,
-                separators=["\n\n", "\n", " ", ""]
-            )
-            
-            chunks = text_splitter.split_documents(documents)
-            logger.info(f"Created {len(chunks)} chunks")
-            
-            # 3. Ajouter des métadonnées
-            doc_hash = self._get_document_hash(pdf_path)
-            for i, chunk in enumerate(chunks):
-                chunk.metadata.update({
-                    "source": pdf_path,
-                    "document_hash": doc_hash,
-                    "chunk_index": i,
-                    "total_chunks": len(chunks),
-                    "book_title": Path(pdf_path).stem
-                })
-            
-            # 4. Créer ou mettre à jour le vector store
-            if self.vector_store is None or force_reindex:
-                # Créer un nouveau vector store
-                logger.info("Creating new FAISS index...")
-                self.vector_store = FAISS.from_documents(
-                    chunks,
-                    self.embeddings
-                )
-            else:
-                # Ajouter au vector store existant
-                logger.info("Adding chunks to existing FAISS index...")
-                self.vector_store.add_documents(chunks)
-            
-            # 5. Sauvegarder l'index et les métadonnées
-            self._save_vector_store()
+            doc_hash = document_hash(pdf_path)
+            chunks = iter_pdf_chunks(pdf_path, self.chunk_size, self.chunk_overlap, doc_hash)
+            added_ids: List[int] = []
+            chunks_added = 0
+            chunks_deduplicated = 0
+            while True:
+                # 1-3. Lire, découper et annoter le lot suivant de chunks. Un
+                # nouvel index entraîné (IVF, PQ) l'est sur son premier lot:
+                # celui-ci réunit d'abord l'échantillon d'entraînement
+                batch_size = embed_batch_size
+                if self.vector_store is None:
+                    batch_size = max(batch_size, self._training_sample_size())
+                batch = list(itertools.islice(chunks, batch_size))
+                if not batch:
+                    break
+                texts = [text for text, _ in batch]
+                metadatas = [metadata for _, metadata in batch]
+                
+                if chunks_removed is None:
+                    # 4. Le premier lot retire les chunks d'une version
+                    # précédente du document (avant de chercher les textes déjà indexés)
+                    with self._lock.write():
+                        chunks_removed = self._remove_document_chunks(pdf_path)
+                        if chunks_removed:
+                            self._refresh_index_generation()
+                
+                # 5. Calculer hors verrou les embeddings des seuls textes pas
+                # encore indexés: les recherches continuent pendant cette
+                # étape, la plus coûteuse
+                positions = self._new_content_positions(texts)
+                vectors = self._embed_positions(texts, positions)
+                
+                with self._lock.write():
+                    # 6. Ajouter le lot au vector store; les textes déjà
+                    # indexés (autre livre, autre édition) y sont rattachés
+                    ids, aliased = self._add_chunks(texts, metadatas, positions, vectors)
+                    self._refresh_index_generation()
+                added_ids.extend(ids)
+                chunks_added += len(batch)
+                chunks_deduplicated += len(aliased)
+                logger.info(f"Indexed {chunks_added} chunks of {pdf_path} ({chunks_deduplicated} deduplicated)")
             
-            # 6. Mettre à jour les hashes
-            self.indexed_hashes[pdf_path] = doc_hash
-            self._save_indexed_hashes()
+            with self._lock.write():
+                if chunks_removed is None:
+                    # PDF sans texte: l'ancienne version est tout de même retirée
+                    chunks_removed = self._remove_document_chunks(pdf_path)
+                if self.vector_store is not None:
+                    self.vector_store.chunks.update_pending(added_ids, {"total_chunks": chunks_added})
+                    self.vector_store.aliases.update_source(pdf_path, {"total_chunks": chunks_added})
+                if chunks_removed:
+                    self._compact_if_needed()
+                self._finish_index_build()
+                
+                # 7. Sauvegarder l'index et les métadonnées
+                self._save_vector_store()
+                
+                # 8. Mettre à jour les hashes
+                self.indexed_hashes[pdf_path] = doc_hash
+                self._save_indexed_hashes()
             
-            logger.info(f"Successfully indexed {len(chunks)} chunks")
+            logger.info(f"Successfully indexed {chunks_added} chunks (replaced {chunks_removed})")
             
             return {
                 "status": "success",
                 "pdf_path": pdf_path,
-                "chunks_added": len(chunks),
+                "chunks_added": chunks_added,
+                "chunks_deduplicated": chunks_deduplicated,
+                "chunks_removed": chunks_removed,
                 "document_hash": doc_hash
             }
             
         except Exception as e:
             logger.error(f"Failed to index PDF: {e}")
+            if chunks_removed is not None:
+                # Lots déjà ajoutés: un document incomplet ne doit pas être
+                # retourné, et sera réindexé au prochain appel
+                with self._lock.write():
+                    self._remove_document_chunks(pdf_path)
+                    self._finish_index_build()
+                    self._refresh_index_generation()
+                    if self.indexed_hashes.pop(pdf_path, None) is not None:
+                        self._save_indexed_hashes()
             return {
                 "status": "error",
                 "pdf_path": pdf_path,
                 "error": str(e)
             }
     
+    def index_pdfs(
+        self,
+        pdf_paths: List[str],
+        force_reindex: bool = False,
+        parse_workers: Optional[int] = None,
+        embed_batch_size: int = 256,
+        checkpoint_every: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Indexe plusieurs PDFs en pipeline: lecture et découpage dans un pool
+        de processus, embeddings par grands lots (chunks de plusieurs
+        documents) au fil des documents prêts, ajouts groupés au vector store
+        et une seule sauvegarde à la fin (ou tous les checkpoint_every
+        documents). Chaque document remplace sa version précédente, comme
+        avec index_pdf. Si un lot échoue, les documents qui y ont des chunks
+        sont retirés et rapportés en erreur; les autres restent indexés.
+        
+        Args:
+            pdf_paths: Chemins des fichiers PDF
+            force_reindex: Force la réindexation des documents déjà indexés
+            parse_workers: Processus de lecture des PDFs (défaut: nombre de
+                cœurs; 0 lit les PDFs dans ce processus)
+            embed_batch_size: Chunks encodés par appel au modèle
+            checkpoint_every: Sauvegarde l'index tous les N documents indexés,
+                dès qu'aucun document n'est partiellement ajouté
+            
+        Returns:
+            Un dict de statistiques par PDF, dans l'ordre de pdf_paths
+        """
+        self._ready.wait()
+        results: Dict[str, Dict[str, Any]] = {}
+        pending = []
+        for pdf_path in dict.fromkeys(pdf_paths):
+            try:
+                already_indexed = not force_reindex and self._is_document_indexed(pdf_path)
+            except OSError:
+                # Fichier illisible: l'erreur est rapportée par la lecture du PDF
+                already_indexed = False
+            if already_indexed:
+                results[pdf_path] = {"status": "already_indexed", "pdf_path": pdf_path, "chunks_added": 0}
+            else:
+                pending.append(pdf_path)
+        if not pending:
+            return [results[pdf_path] for pdf_path in pdf_paths]
+        
+        workers = (os.cpu_count() or 1) if parse_workers is None else parse_workers
+        logger.info(f"Indexing {len(pending)} PDFs with {workers} parse workers")
+        started = time.perf_counter()
+        
+        # Chunks lus mais pas encore encodés, et documents en cours d'ajout
+        batch_texts: List[str] = []
+        batch_metadatas: List[Dict[str, Any]] = []
+        unfinished: Dict[str, Dict[str, Any]] = {}
+        indexed_since_checkpoint = 0
+        # Un nouvel index entraîné (IVF, PQ) l'est sur le premier lot: celui-ci
+        # réunit d'abord l'échantillon d'entraînement
+        training_sample = self._training_sample_size() if self.vector_store is None else 0
+        
+        def fail_unfinished(error: Exception):
+            # Comme index_pdf: les lots déjà ajoutés d'un document incomplet
+            # sont retirés, il sera réindexé au prochain appel
+            with self._lock.write():
+                for pdf_path, document in unfinished.items():
+                    if document["chunks_removed"] is not None:
+                        self._remove_document_chunks(pdf_path)
+                        self.indexed_hashes.pop(pdf_path, None)
+                    results[pdf_path] = {"status": "error", "pdf_path": pdf_path, "error": str(error)}
+                self._refresh_index_generation()
+            unfinished.clear()
+        
+        def flush_batch():
+            try:
+                add_batch()
+            except Exception as e:
+                logger.error(f"Failed to index a batch of {len(batch_texts)} chunks: {e}")
+                fail_unfinished(e)
+            batch_texts.clear()
+            batch_metadatas.clear()
+        
+        def add_batch():
+            nonlocal indexed_since_checkpoint
+            if not batch_texts:
+                return
+            with self._lock.write():
+                # Le premier lot d'un document retire sa version précédente
+                # (avant de chercher les textes déjà indexés)
+                for metadata in batch_metadatas:
+                    document = unfinished[metadata["source"]]
+                    if document["chunks_removed"] is None:
+                        document["chunks_removed"] = self._remove_document_chunks(metadata["source"])
+            positions = self._new_content_positions(batch_texts)
+            vectors = self._embed_positions(batch_texts, positions)
+            with self._lock.write():
+                _, aliased = self._add_chunks(list(batch_texts), list(batch_metadatas), positions, vectors)
+                self._refresh_index_generation()
+                for position in aliased:
+                    unfinished[batch_metadatas[position]["source"]]["chunks_deduplicated"] += 1
+                
+                for metadata in batch_metadatas:
+                    document = unfinished[metadata["source"]]
+                    document["remaining"] -= 1
+                    if document["remaining"] == 0:
+                        # Tous ses chunks sont ajoutés: le document devient indexé
+                        del unfinished[metadata["source"]], document["remaining"]
+                        self.indexed_hashes[document["pdf_path"]] = document["document_hash"]
+                        results[document["pdf_path"]] = {"status": "success", **document}
+                        indexed_since_checkpoint += 1
+                # Sauvegarde à une frontière de documents seulement: un
+                # document en cours a perdu sa version précédente et n'a
+                # qu'une partie de ses chunks, et l'index sauvegardé est
+                # rechargé à chaud par les autres processus
+                if checkpoint_every and indexed_since_checkpoint >= checkpoint_every and not unfinished:
+                    self._checkpoint_ingestion()
+                    indexed_since_checkpoint = 0
+        
+        def consume(pdf_path: str, split):
+            texts, metadatas, doc_hash = split
+            logger.info(f"Parsed {pdf_path}: {len(texts)} chunks")
+            document = {
+                "pdf_path": pdf_path,
+                "chunks_added": len(texts),
+                "chunks_deduplicated": 0,
+                "chunks_removed": None,
+                "document_hash": doc_hash,
+                "remaining": len(texts)
+            }
+            if not texts:
+                with self._lock.write():
+                    document["chunks_removed"] = self._remove_document_chunks(pdf_path)
+                    self.indexed_hashes[pdf_path] = doc_hash
+                del document["remaining"]
+                results[pdf_path] = {"status": "success", **document}
+                return
+            unfinished[pdf_path] = document
+            for text, metadata in zip(texts, metadatas):
+                batch_texts.append(text)
+                batch_metadatas.append(metadata)
+                batch_size = embed_batch_size
+                if self.vector_store is None:
+                    batch_size = max(batch_size, training_sample)
+                if len(batch_texts) >= batch_size:
+                    flush_batch()
+                    if pdf_path not in unfinished:
+                        # Lot en échec: le reste du document n'est pas indexé
+                        return
+            if checkpoint_every and indexed_since_checkpoint >= checkpoint_every:
+                # Sauvegarde différée par un document à cheval sur deux lots:
+                # ajouter le lot maintenant que tous ses documents sont lus
+                flush_batch()
+        
+        try:
+            if workers == 0:
+                for pdf_path in pending:
+                    try:
+                        split = split_pdf(pdf_path, self.chunk_size, self.chunk_overlap)
+                    except Exception as e:
+                        logger.error(f"Failed to parse PDF {pdf_path}: {e}")
+                        results[pdf_path] = {"status": "error", "pdf_path": pdf_path, "error": str(e)}
+                        continue
+                    consume(pdf_path, split)
+            else:
+                # spawn: pas de fork d'un processus qui a déjà démarré les
+                # threads de PyTorch/OpenMP
+                with ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+                ) as pool:
+                    # Au plus deux lectures d'avance par processus: la mémoire
+                    # reste bornée si les embeddings sont plus lents
+                    queue = iter(pending)
+                    in_flight = {}
+                    for pdf_path in queue:
+                        in_flight[pool.submit(split_pdf, pdf_path, self.chunk_size, self.chunk_overlap)] = pdf_path
+                        if len(in_flight) >= 2 * workers:
+                            break
+                    while in_flight:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            pdf_path = in_flight.pop(future)
+                            next_path = next(queue, None)
+                            if next_path is not None:
+                                in_flight[pool.submit(
+                                    split_pdf, next_path, self.chunk_size, self.chunk_overlap
+                                )] = next_path
+                            try:
+                                split = future.result()
+                            except Exception as e:
+                                logger.error(f"Failed to parse PDF {pdf_path}: {e}")
+                                results[pdf_path] = {"status": "error", "pdf_path": pdf_path, "error": str(e)}
+                                continue
+                            consume(pdf_path, split)
+            flush_batch()
+        except Exception as e:
+            # Hors d'un lot (pool de lecture, retrait d'un document vide...):
+            # les documents non terminés sont retirés et rapportés en erreur
+            logger.error(f"PDF ingestion interrupted: {e}")
+            fail_unfinished(e)
+            for pdf_path in pending:
+                results.setdefault(pdf_path, {"status": "error", "pdf_path": pdf_path, "error": str(e)})
+        
+        # Sauvegarde des seuls documents complets
+        with self._lock.write():
+            self._finish_index_build()
+            self._checkpoint_ingestion()
+        
+        indexed = [r for r in results.values() if r["status"] == "success"]
+        logger.info(
+            f"Indexed {len(indexed)} PDFs ({sum(r['chunks_added'] for r in indexed)} chunks) "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+        return [results[pdf_path] for pdf_path in pdf_paths]
+    
+    def _checkpoint_ingestion(self):
+        """Sauvegarde l'index et les hashes pendant une ingestion (sous le verrou d'écriture)"""
+        if self.vector_store is None:
+            return
+        self._compact_if_needed()
+        self._save_vector_store()
+        self._save_indexed_hashes()
+    
+    def remove_document(self, source: str) -> Dict[str, Any]:
+        """
+        Retire un document de l'index sans le reconstruire
+        
+        Args:
+            source: Chemin du PDF, tel qu'indexé (métadonnée "source")
+            
+        Returns:
+            Dict avec le statut ("removed" ou "not_found") et le nombre de chunks retirés
+        """
+        logger.info(f"Removing document: {source}")
+        self._ready.wait()
+        with self._lock.write():
+            chunks_removed = self._remove_document_chunks(source)
+            if chunks_removed:
+                self._compact_if_needed()
+                self._save_vector_store()
+            was_indexed = self.indexed_hashes.pop(source, None) is not None
+            if was_indexed:
+                self._save_indexed_hashes()
+        
+        if not chunks_removed and not was_indexed:
+            logger.info(f"Document not found in index: {source}")
+            return {"status": "not_found", "source": source, "chunks_removed": 0}
+        logger.info(f"Removed {chunks_removed} chunks of {source}")
+        return {"status": "removed", "source": source, "chunks_removed": chunks_removed}
+    
+    def _remove_document_chunks(self, source: str) -> int:
+        """
+        Marque supprimés les chunks d'un document et retire ses occurrences
+        dédupliquées (sous le verrou d'écriture). Un chunk stocké que d'autres
+        documents partagent est conservé au nom de l'une de leurs occurrences.
+        
+        Returns:
+            Le nombre de chunks du document retirés
+        """
+        store = self.vector_store
+        if store is None:
+            return 0
+        ids, _ = self._filter_index.resolve({"source": source})
+        aliases_removed = store.aliases.remove_source(source)
+        rows = [
+            int(row) for row in ids
+            if store.chunks.get_metadata(int(row)).get("source") == source
+        ]
+        shared = {row: store.aliases.pop(row) for row in rows if store.aliases.get(row)}
+        removed = store.chunks.delete(rows)
+        if removed:
+            store.forget_contents()
+        if shared:
+            self._readd_shared_chunks(shared)
+        if aliases_removed or shared:
+            self._filter_index = MetadataFilterIndex.from_vector_store(self.vector_store)
+        elif removed:
+            self._filter_index.remove(rows)
+        return removed + aliases_removed
+    
+    def _readd_shared_chunks(self, shared: Dict[int, List[Dict[str, Any]]]):
+        """
+        Ré-ajoute des chunks supprimés que d'autres documents partagent, au nom
+        de leur première autre occurrence: le vecteur est reconstruit par
+        l'index (ré-encodé si l'index ne le permet pas)
+        """
+        store = self.vector_store
+        rows = list(shared)
+        texts = [store.chunks.get_text(row) for row in rows]
+        self._ensure_writable_index()
+        try:
+            enable_reconstruction(store.index)
+            vectors = store.index.reconstruct_batch(np.asarray(rows, dtype=np.int64))
+        except RuntimeError:
+            vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+        ids = self._add_to_vector_store(texts, [shared[row][0] for row in rows], vectors)
+        for chunk_id, row in zip(ids, rows):
+            for occurrence in shared[row][1:]:
+                store.aliases.add(chunk_id, occurrence)
+    
+    def _new_content_positions(self, texts: List[str]) -> List[int]:
+        """
+        Positions des chunks d'un lot à encoder: ceux dont le texte n'est ni
+        déjà indexé ni répété plus tôt dans le lot (tous sans déduplication)
+        """
+        if not self.deduplicate_chunks:
+            return list(range(len(texts)))
+        positions = []
+        seen = set()
+        with self._lock.read():
+            store = self.vector_store
+            for position, text in enumerate(texts):
+                key = content_hash(text)
+                if key in seen or (store is not None and store.find_content(key) is not None):
+                    continue
+                seen.add(key)
+                positions.append(position)
+        return positions
+    
+    def _embed_positions(self, texts: List[str], positions: List[int]) -> Optional[np.ndarray]:
+        """Embeddings des chunks retenus par _new_content_positions"""
+        if not positions:
+            return None
+        return np.asarray(
+            self.embeddings.embed_documents([texts[p] for p in positions]), dtype=np.float32
+        )
+    
+    def _add_chunks(
+        self,
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        positions: List[int],
+        vectors: Optional[np.ndarray]
+    ) -> Tuple[List[int], List[int]]:
+        """
+        Ajoute un lot de chunks (sous le verrou d'écriture): les chunks encodés
+        (positions) sont stockés, les autres sont rattachés comme occurrences
+        au chunk stocké de même texte
+        
+        Returns:
+            (ids des chunks stockés, positions des occurrences rattachées)
+        """
+        if not self.deduplicate_chunks:
+            return list(self._add_to_vector_store(texts, metadatas, vectors)), []
+        
+        keys = [content_hash(text) for text in texts]
+        store = self.vector_store
+        # Un autre écrivain a pu indexer le même texte depuis _new_content_positions
+        new = [
+            i for i, position in enumerate(positions)
+            if store is None or store.find_content(keys[position]) is None
+        ]
+        ids: List[int] = []
+        if new:
+            ids = list(self._add_to_vector_store(
+                [texts[positions[i]] for i in new],
+                [metadatas[positions[i]] for i in new],
+                vectors[new]
+            ))
+        stored = {positions[i] for i in new}
+        aliased = []
+        for position, (metadata, key) in enumerate(zip(metadatas, keys)):
+            if position in stored:
+                continue
+            row = self.vector_store.find_content(key) if self.vector_store is not None else None
+            if row is None:
+                # Chunk de même texte retiré entre-temps: encodé maintenant
+                vector = np.asarray(self.embeddings.embed_documents([texts[position]]), dtype=np.float32)
+                ids.extend(self._add_to_vector_store([texts[position]], [metadata], vector))
+                continue
+            self.vector_store.aliases.add(row, metadata)
+            self._filter_index.add([row], [metadata])
+            aliased.append(position)
+        return ids, aliased
+    
+    def _compact_if_needed(self):
+        """Compacte l'index si les chunks supprimés dépassent compact_deleted_ratio"""
+        chunks = self.vector_store.chunks
+        if len(chunks.deleted_ids()) > self.compact_deleted_ratio * len(chunks):
+            self._compact_vector_store()
+    
+    def _compact_vector_store(self):
+        """
+        Retire physiquement les chunks supprimés: index FAISS (vecteurs
+        reconstruits, sans ré-encodage), chunk store et index BM25 sont
+        réécrits avec les seuls chunks restants, renumérotés (sous le verrou
+        d'écriture, avant _save_vector_store)
+        """
+        store = self.vector_store
+        if store is None or not len(store.chunks.deleted_ids()):
+            return
+        live = store.chunks.live_ids()
+        logger.info(f"Compacting FAISS index: keeping {len(live)} of {len(store.chunks)} chunks")
+        self._ensure_writable_index()
+        try:
+            index = compact_index(store.index, live)
+        except RuntimeError as e:
+            # Index incapable de reconstruire ses vecteurs: les chunks restent
+            # marqués supprimés, exclus des recherches
+            logger.warning(f"FAISS index cannot be compacted: {e}")
+            return
+        chunks = store.chunks.compact(live)
+        store.chunks.close()
+        self.vector_store = _VectorStore(index, chunks, store.aliases.renumber(live))
+        if self._build_vectors:
+            # Vecteurs gardés pour le rapport de construction, renumérotés de même
+            build_vectors = np.concatenate(self._build_vectors)
+            self._build_vectors = [build_vectors[live[live < len(build_vectors)]]]
+        self._filter_index = MetadataFilterIndex.from_vector_store(self.vector_store)
+        self._lexical_index = LexicalIndex.build(chunks.get_text(row) for row in range(len(chunks)))
+        self._compactions += 1
+    
+    def _add_to_vector_store(
+        self,
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        vectors: np.ndarray,
+        rebuild: bool = False
+    ) -> range:
+        """
+        Ajoute des chunks déjà encodés au vector store (sous le verrou d'écriture)
+        
+        Returns:
+            Les ids des chunks ajoutés
+        """
+        if self.vector_store is None or rebuild:
+            # Créer un nouveau vector store (entraîné sur ces chunks si besoin).
+            # Son rapport de construction est mesuré par _finish_index_build,
+            # une fois l'ingestion terminée.
+            logger.info(f"Creating new FAISS index ({self.index_factory})...")
+            if self.vector_store is not None:
+                self.vector_store.chunks.close()
+            self.vector_store = self._create_vector_store(vectors)
+            self._index_mmapped = False
+            enable_reconstruction(self.vector_store.index)
+            self._build_vectors = []
+            ids = self.vector_store.add(vectors, texts, metadatas)
+            self._filter_index = MetadataFilterIndex.from_vector_store(self.vector_store)
+            self._lexical_index = LexicalIndex()
+        else:
+            # Ajouter au vector store existant
+            logger.info("Adding chunks to existing FAISS index...")
+            self._ensure_writable_index()
+            ids = self.vector_store.add(vectors, texts, metadatas)
+            self._filter_index.add(ids, metadatas)
+        if self._build_vectors is not None:
+            kept = sum(len(v) for v in self._build_vectors)
+            if kept < BUILD_REPORT_MAX_VECTORS:
+                self._build_vectors.append(vectors[:BUILD_REPORT_MAX_VECTORS - kept])
+        self._lexical_index.add(ids, texts)
+        return ids
+    
+    def index_texts(
+        self,
+        texts: List[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        rebuild: bool = False
+    ) -> int:
+        """
+        Indexe des chunks de texte déjà découpés tels quels (ingestion
+        programmatique, benchmarks): ni déduplication ni suivi de document,
+        contrairement à index_pdf, qui passe par _add_chunks. Les deux
+        finissent dans _add_to_vector_store.
+        
+        Args:
+            texts: Textes des chunks
+            metadatas: Métadonnées des chunks (book_title, source... pour les filtres)
+            rebuild: Remplace l'index existant au lieu d'y ajouter les chunks
+            
+        Returns:
+            Nombre de chunks indexés
+        """
+        self._ready.wait()
+        if not texts:
+            return 0
+        metadatas = metadatas if metadatas is not None else [{} for _ in texts]
+        vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+        with self._lock.write():
+            self._add_to_vector_store(texts, metadatas, vectors, rebuild=rebuild)
+            self._finish_index_build()
+            self._save_vector_store()
+        return len(texts)
+    
+    def _result_cache_key(
+        self,
+        query: str,
+        k: int,
+        filter_metadata: Optional[Dict[str, Any]],
+        generation: int
+    ) -> str:
+        """
+        Clé du cache de résultats: (requête normalisée, k, filtres, génération
+        de l'index, empreinte des réglages de recherche)
+        """
+        return json.dumps(
+            [self._normalize_query(query), k, filter_metadata or {}, generation, self._result_config_hash],
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str
+        )
+    
+    def _search_vectors(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        candidate_ids: Optional[np.ndarray] = None,
+        excluded_ids: Optional[np.ndarray] = None
+    ) -> List[List[Any]]:
+        """
+        Recherche multi-requêtes: un seul appel FAISS pour toute la matrice
+        de requêtes. À appeler sous le verrou de lecture.
+        
+        Args:
+            vectors: Matrice des embeddings de requêtes
+            k: Nombre de résultats par requête
+            candidate_ids: Restreint la recherche à ces ids FAISS (pré-filtrage)
+            excluded_ids: Ids des chunks supprimés, exclus de la recherche
+                (inutile avec candidate_ids, qui n'en contient pas)
+        
+        Returns:
+            Pour chaque requête, la liste des (id du chunk, score) trouvés
+        """
+        store = self.vector_store
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        selector = None
+        if candidate_ids is not None:
+            # Le sélecteur doit rester référencé pendant toute la recherche
+            selector = faiss.IDSelectorBatch(candidate_ids)
+            k = min(k, len(candidate_ids))
+        elif excluded_ids is not None and len(excluded_ids):
+            # Chunks supprimés: exclus jusqu'au compactage de l'index
+            excluded_selector = faiss.IDSelectorBatch(excluded_ids)
+            selector = faiss.IDSelectorNot(excluded_selector)
+        params = make_search_params(
+            store.index, selector, self.nprobe, self.ef_search, self.refine_k_factor
+        )
+        try:
+            scores, indices = store.index.search(vectors, k, params=params)
+        except RuntimeError:
+            # Certains index compressés (PQ) n'acceptent pas de sélecteur
+            if selector is None:
+                raise
+            if candidate_ids is not None:
+                scores, indices = exact_search(store.index, vectors, k, candidate_ids)
+            else:
+                # Sans sélecteur: chercher plus profond, puis écarter les supprimés
+                params = make_search_params(
+                    store.index, None, self.nprobe, self.ef_search, self.refine_k_factor
+                )
+                depth = min(k + len(excluded_ids), store.index.ntotal)
+                scores, indices = store.index.search(vectors, depth, params=params)
+                indices[np.isin(indices, excluded_ids)] = -1
+        
+        if candidate_ids is not None:
+            # Le sélecteur ne s'applique qu'aux vecteurs parcourus: les nprobe
+            # listes d'un IVF, le parcours d'un graphe HNSW. Un filtre
+            # sélectif y trouve moins de k chunks: on complète par une
+            # recherche exacte parmi les candidats (k <= nombre de candidats)
+            incomplete = (indices == -1).any(axis=1)
+            if incomplete.any():
+                try:
+                    scores[incomplete], indices[incomplete] = exact_search(
+                        store.index, vectors[incomplete], k, candidate_ids
+                    )
+                except RuntimeError as e:
+                    # Index sans reconstruction: les chunks trouvés restent
+                    logger.warning(f"Cannot complete filtered search: {e}")
+        
+        hits = []
+        for row_scores, row_indices in zip(scores, indices):
+            row = []
+            for score, idx in zip(row_scores, row_indices):
+                if idx == -1:
+                    # Moins de k vecteurs dans l'index
+                    continue
+                row.append((int(idx), float(score)))
+            hits.append(row[:k])
+        return hits
+    
+    def _search_many(
+        self,
+        requests: List[Tuple[str, int, Optional[Dict[str, Any]]]],
+        timings: Optional[Dict[str, float]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Exécute plusieurs recherches (requête, k, filtres) ensemble: les
+        requêtes absentes du cache de résultats sont encodées en un lot et
+        cherchées en un seul appel FAISS. En mode hybride, les résultats FAISS
+        et BM25 sont fusionnés par rangs (RRF); les requêtes de termes exacts
+        sont servies par BM25 seul, sans embedding.
+        
+        La durée de chaque étape est ajoutée aux histogrammes de latence et,
+        si `timings` est fourni, copiée dans ce dictionnaire (ms par étape,
+        pour tout le lot).
+        """
+        timer = StageTimer()
+        with timer.stage("warmup_wait"):
+            self._ready.wait()
+        if self.vector_store is None:
+            logger.warning("No vector store available")
+            return [[] for _ in requests]
+        
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(requests)
+        generation = self.index_generation
+        pending = []
+        with timer.stage("result_cache"):
+            for i, (query, k, filter_metadata) in enumerate(requests):
+                cached = self._result_cache.get(
+                    self._result_cache_key(query, k, filter_metadata, generation)
+                )
+                if cached is None:
+                    pending.append(i)
+                else:
+                    results[i] = cached
+        
+        if pending:
+            generations: Dict[int, int] = {}
+            
+            # Requêtes de termes exacts: BM25 seul, sans embedding. La lecture
+            # de l'index inversé prend moins d'une milliseconde.
+            if self.retrieval_mode == "lexical" or (
+                self.retrieval_mode == "hybrid" and self.lexical_fast_path
+            ):
+                with self._lock.read(timer):
+                    generation = self.index_generation
+                    store = self.vector_store
+                    deleted = store.chunks.deleted_ids()
+                    remaining = []
+                    for i in pending:
+                        query, k, filter_metadata = requests[i]
+                        with timer.stage("filter"):
+                            candidate_ids, _ = self._filter_index.resolve(filter_metadata)
+                        with timer.stage("lexical_search"):
+                            if self.retrieval_mode == "lexical":
+                                lexical = self._lexical_index.search(
+                                    query, k, candidate_ids, excluded_ids=deleted
+                                )
+                            elif self._lexical_index.is_selective(query):
+                                lexical = self._lexical_index.search(
+                                    query, k, candidate_ids, require_all_terms=True, excluded_ids=deleted
+                                )
+                            else:
+                                lexical = None
+                        if lexical is None or (self.retrieval_mode != "lexical" and len(lexical) < k):
+                            # Requête non sélective, ou trop peu de correspondances
+                            # exactes: recherche hybride
+                            remaining.append(i)
+                            continue
+                        if self.retrieval_mode != "lexical":
+                            self._lexical_fast_path_hits += 1
+                        with timer.stage("docstore"):
+                            results[i] = self._format_hits(
+                                store, self._fuse([], lexical), k, filter_metadata
+                            )
+                        generations[i] = generation
+                vector_pending = remaining
+            else:
+                vector_pending = pending
+            
+            if vector_pending:
+                # L'embedding des requêtes ne touche pas l'index: hors verrou
+                with timer.stage("embedding"):
+                    embeddings = self._embed_queries([requests[i][0] for i in vector_pending])
+                
+                # Une recherche FAISS par filtre distinct (en pratique: une seule)
+                groups: Dict[str, List[int]] = {}
+                for position, i in enumerate(vector_pending):
+                    filter_key = json.dumps(requests[i][2] or {}, sort_keys=True, default=str)
+                    groups.setdefault(filter_key, []).append(position)
+                
+                # Recherche par similarité
+                with self._lock.read(timer):
+                    generation = self.index_generation
+                    store = self.vector_store
+                    deleted = store.chunks.deleted_ids()
+                    for positions in groups.values():
+                        filter_metadata = requests[vector_pending[positions[0]]][2]
+                        with timer.stage("filter"):
+                            candidate_ids, _ = self._filter_index.resolve(filter_metadata)
+                        depth = max(
+                            self._first_stage_depth(requests[vector_pending[p]][1])
+                            for p in positions
+                        )
+                        if candidate_ids is not None and len(candidate_ids) == 0:
+                            rows = [[] for _ in positions]
+                        else:
+                            with timer.stage("vector_search"):
+                                rows = self._search_vectors(
+                                    embeddings[positions], depth, candidate_ids, deleted
+                                )
+                        
+                        for position, row in zip(positions, rows):
+                            i = vector_pending[position]
+                            query, k, filter_metadata = requests[i]
+                            # On ne garde que la profondeur de cette requête pour
+                            # rester identique à une recherche seule
+                            candidates = self._first_stage_depth(k)
+                            if self.retrieval_mode == "hybrid":
+                                with timer.stage("lexical_search"):
+                                    lexical = self._lexical_index.search(
+                                        query, candidates, candidate_ids, excluded_ids=deleted
+                                    )
+                                with timer.stage("fusion"):
+                                    hits = self._fuse(row[:candidates], lexical)
+                                    self._fill_similarity_scores(store, embeddings[position], hits)
+                            else:
+                                hits = [
+                                    (chunk_id, {"similarity_score": score})
+                                    for chunk_id, score in row[:candidates]
+                                ]
+                            if self._reranker is not None:
+                                # Second étage, borné par son budget de temps
+                                with timer.stage("rerank"):
+                                    hits = self._reranker.rerank(
+                                        query, embeddings[position], hits, self.vector_store
+                                    )
+                            with timer.stage("docstore"):
+                                results[i] = self._format_hits(store, hits, k, filter_metadata)
+                            generations[i] = generation
+            
+            for i in pending:
+                if self.collapse_duplicates:
+                    # Doublons d'avant la déduplication à l'indexation
+                    with timer.stage("merge"):
+                        collapsed = collapse_duplicates(results[i])
+                    self._collapsed_results += len(results[i]) - len(collapsed)
+                    results[i] = collapsed
+                if self.merge_adjacent:
+                    with timer.stage("merge"):
+                        merged = merge_adjacent_chunks(results[i], self.chunk_overlap)
+                    self._merged_chunks += len(results[i]) - len(merged)
+                    results[i] = merged
+                
+                # Les résultats sont rangés sous la génération lue avec l'index
+                query, k, filter_metadata = requests[i]
+                with timer.stage("result_cache"):
+                    self._result_cache.put(
+                        self._result_cache_key(query, k, filter_metadata, generations[i]),
+                        results[i]
+                    )
+        
+        stage_timings = timer.finish(self._search_latency)
+        if timings is not None:
+            timings.update(stage_timings)
+        logger.debug(f"Search stages (ms): {stage_timings}")
+        return results
+    
+    def _first_stage_depth(self, k: int) -> int:
+        """Candidats du premier étage pour k résultats (fusion, re-classement)"""
+        depth = k
+        if self.retrieval_mode == "hybrid":
+            depth = max(depth, self.fusion_candidates)
+        if self._reranker is not None:
+            depth = max(depth, self.rerank_candidates)
+        return depth
+    
+    def _fuse(
+        self,
+        vector_hits: List[Tuple[int, float]],
+        lexical_hits: List[Tuple[int, float]]
+    ) -> List[Tuple[int, Dict[str, Optional[float]]]]:
+        """
+        Fusion par rangs réciproques (RRF): chaque liste apporte
+        1 / (rrf_k + rang) aux chunks qu'elle contient. Les scores vectoriels
+        (distances) et BM25 ne sont pas comparables, leurs rangs le sont.
+        fusion_score est donc toujours numérique, même pour un chunk trouvé
+        par une seule des deux listes.
+        """
+        fused: Dict[int, Dict[str, Optional[float]]] = {}
+        for name, hits in (("similarity_score", vector_hits), ("lexical_score", lexical_hits)):
+            for rank, (chunk_id, score) in enumerate(hits, start=1):
+                scores = fused.setdefault(
+                    chunk_id,
+                    {"similarity_score": None, "lexical_score": None, "fusion_score": 0.0}
+                )
+                scores[name] = score
+                scores["fusion_score"] += 1.0 / (self.rrf_k + rank)
+        return sorted(fused.items(), key=lambda item: (-item[1]["fusion_score"], item[0]))
+    
+    @staticmethod
+    def _fill_similarity_scores(
+        store: _VectorStore,
+        query_vector: np.ndarray,
+        hits: List[Tuple[int, Dict[str, Optional[float]]]]
+    ):
+        """
+        Score vectoriel des chunks trouvés par BM25 seul, calculé sur leurs
+        vecteurs reconstruits par l'index (même convention que FAISS). À
+        appeler sous le verrou de lecture.
+        """
+        missing = np.array(
+            [chunk_id for chunk_id, scores in hits if scores["similarity_score"] is None],
+            dtype=np.int64
+        )
+        if not len(missing):
+            return
+        try:
+            scores, ids = exact_search(store.index, query_vector[None, :], len(missing), missing)
+        except RuntimeError as e:
+            # Index sans reconstruction: similarity_score reste None
+            logger.debug(f"Cannot score lexical hits on their vectors: {e}")
+            return
+        by_id = dict(zip(ids[0].tolist(), scores[0].tolist()))
+        for chunk_id, hit_scores in hits:
+            if hit_scores["similarity_score"] is None:
+                hit_scores["similarity_score"] = by_id[chunk_id]
+    
+    @staticmethod
+    def _format_hits(
+        store: _VectorStore,
+        hits: List[Tuple[int, Dict[str, Optional[float]]]],
+        k: int,
+        filter_metadata: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Formate les k premiers chunks et applique le filtre aux occurrences
+        de chaque chunk. Seuls les chunks retournés sont lus sur disque; à
+        appeler sous le verrou de lecture.
+        
+        Un chunk dédupliqué est retourné avec les métadonnées de sa première
+        occurrence qui satisfait le filtre (la stockée sans filtre), pas
+        forcément celles de la stockée, et cite toutes ses occurrences dans
+        metadata["sources"], celle-ci en premier. Les champs indexés ont déjà
+        restreint la recherche, mais à l'union des occurrences: ils sont
+        vérifiés ici occurrence par occurrence, avec les autres champs.
+        """
+        chunks = store.chunks
+        formatted_results = []
+        for chunk_id, scores in hits[:k]:
+            occurrences = [chunks.get_metadata(chunk_id), *store.aliases.get(chunk_id)]
+            if filter_metadata:
+                matching = [
+                    occurrence for occurrence in occurrences
+                    if all(occurrence.get(key) == value for key, value in filter_metadata.items())
+                ]
+                if not matching:
+                    continue
+            else:
+                matching = occurrences
+            metadata = dict(matching[0])
+            if len(occurrences) > 1:
+                sources = [citation(metadata)]
+                for occurrence in occurrences:
+                    if citation(occurrence) not in sources:
+                        sources.append(citation(occurrence))
+                metadata["sources"] = sources
+            
+            formatted_results.append({
+                "content": chunks.get_text(chunk_id),
+                "metadata": metadata,
+                **scores
+            })
+        return formatted_results
+    
     def search(
         self,
         query: str,
         k: int = 5,
-        filter_metadata: Optional[Dict[str, Any]] = None
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        timings: Optional[Dict[str, float]] = None
     ) -> List[Dict[str, Any]]:
         """
         Recherche dans le vector store FAISS
@@ -222,48 +2245,208 @@ class RAGSystem:
         Args:
             query: Requête de recherche
             k: Nombre de résultats à retourner
-            filter_metadata: Filtres sur les métadonnées (non supporté par FAISS de base)
+            filter_metadata: Filtres sur les métadonnées; book_title, source et
+                document_hash restreignent la recherche elle-même, les autres
+                champs sont filtrés après coup
+            timings: Dictionnaire rempli avec la durée de chaque étape (ms)
             
         Returns:
             Liste des chunks pertinents avec leurs scores
         """
         logger.info(f"Searching for: {query}")
         
-        if self.vector_store is None:
-            logger.warning("No vector store available")
+        try:
+            stage_timings: Dict[str, float] = {} if timings is None else timings
+            results = self._search_many([(query, k, filter_metadata)], stage_timings)[0]
+            logger.info(f"Found {len(results)} results in {stage_timings.get('total', 0.0):.1f} ms")
+            return results
+        except Exception as e:
+            logger.error(f"Search failed: {e}")
             return []
+    
+    def search_batch(
+        self,
+        queries: List[str],
+        k: int = 5,
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Recherche plusieurs requêtes en un lot: un seul encodage et un seul
+        appel FAISS sur la matrice des requêtes
         
-        try:
-            # Recherche par similarité
-            results = self.vector_store.similarity_search_with_score(
-                query,
-                k=k
-            )
-            
-            # Formater et filtrer les résultats si nécessaire
-            formatted_results = []
-            for doc, score in results:
-                # Appliquer les filtres manuellement si spécifiés
-                if filter_metadata:
-                    match = all(
-                        doc.metadata.get(key) == value 
-                        for key, value in filter_metadata.items()
-                    )
-                    if not match:
-                        continue
-                
-                formatted_results.append({
-                    "content": doc.page_content,
-                    "metadata": doc.metadata,
-                    "similarity_score": float(score)
-                })
-            
-            logger.info(f"Found {len(formatted_results)} results")
-            return formatted_results
+        Args:
+            queries: Requêtes de recherche
+            k: Nombre de résultats à retourner par requête
+            filter_metadata: Filtres sur les métadonnées, communs à toutes les requêtes
             
+        Returns:
+            Pour chaque requête, la liste des chunks pertinents avec leurs scores
+        """
+        logger.info(f"Batch searching {len(queries)} queries")
+        
+        try:
+            results = self._search_many([(query, k, filter_metadata) for query in queries])
+            logger.info(f"Found {sum(len(r) for r in results)} results")
+            return results
         except Exception as e:
-            logger.error(f"Search failed: {e}")
+            logger.error(f"Batch search failed: {e}")
+            return [[] for _ in queries]
+    
+    async def _run_in_executor(
+        self,
+        executor: ThreadPoolExecutor,
+        func: Callable[..., Any],
+        *args,
+        **kwargs
+    ) -> Any:
+        """Exécute une fonction bloquante dans un exécuteur sans bloquer la boucle"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+    
+    async def asearch(
+        self,
+        query: str,
+        k: int = 5,
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        timings: Optional[Dict[str, float]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Version asynchrone de search: l'embedding et la recherche FAISS
+        s'exécutent dans le pool de recherche, pas sur la boucle d'événements.
+        Les recherches concurrentes sont regroupées en micro-lots si activé.
+        
+        `timings` reçoit la durée de chaque étape (ms), plus "queue": l'attente
+        avant exécution (fenêtre de micro-lot, pool de recherche occupé).
+        """
+        started = time.perf_counter()
+        if self._batcher is not None:
+            results = await self._batcher.submit(query, k, filter_metadata, timings)
+        else:
+            async with self._pending_searches:
+                results = await self._run_in_executor(
+                    self._search_executor,
+                    self.search,
+                    query,
+                    k=k,
+                    filter_metadata=filter_metadata,
+                    timings=timings
+                )
+        if timings is not None and "total" in timings:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            timings["queue"] = round(max(elapsed_ms - timings["total"], 0.0), 3)
+        return results
+    
+    async def asearch_stream(
+        self,
+        query: str,
+        k: int = 5,
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Version en flux de asearch. En mode hybride, la part lexicale (BM25,
+        sans embedding, moins d'une milliseconde) est envoyée d'abord, un
+        événement "partial" par chunk, pendant que la recherche complète
+        (embedding, FAISS, fusion) s'exécute. Suivent un événement "result"
+        par chunk du classement final, puis un événement "summary" avec le
+        délai du premier événement.
+        
+        Les résultats partiels ne sont pas fusionnés ni dédoublonnés, et le
+        classement final peut les reprendre ou les écarter: ils sont omis si
+        la recherche complète est déjà finie (cache, voie rapide lexicale).
+        """
+        started = time.perf_counter()
+        first_event_ms: Optional[float] = None
+        search = asyncio.ensure_future(self.asearch(query, k=k, filter_metadata=filter_metadata))
+        try:
+            if self.retrieval_mode == "hybrid":
+                partial = await self._run_in_executor(
+                    self._search_executor, self._search_lexical_shard, query, k, filter_metadata
+                )
+                if not search.done():
+                    for rank, result in enumerate(partial, start=1):
+                        if first_event_ms is None:
+                            first_event_ms = (time.perf_counter() - started) * 1000
+                        yield {"event": "partial", "shard": "lexical", "rank": rank, **result}
+                        # Rendre la main à la boucle pour que le transport envoie l'événement
+                        await asyncio.sleep(0)
+            results = await search
+        finally:
+            # Flux abandonné par le client: la recherche complète n'est plus attendue
+            search.cancel()
+        search_ms = (time.perf_counter() - started) * 1000
+        for rank, result in enumerate(results, start=1):
+            if first_event_ms is None:
+                first_event_ms = (time.perf_counter() - started) * 1000
+            yield {"event": "result", "rank": rank, **result}
+            await asyncio.sleep(0)
+        yield {
+            "event": "summary",
+            "query": query,
+            "results_count": len(results),
+            "first_event_ms": round(first_event_ms if first_event_ms is not None else search_ms, 2),
+            "search_ms": round(search_ms, 2),
+            "total_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+    
+    def _search_lexical_shard(
+        self,
+        query: str,
+        k: int,
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Part lexicale (BM25) d'une recherche hybride, formatée comme des
+        résultats: envoyée par asearch_stream avant le classement final
+        """
+        self._ready.wait()
+        if self.vector_store is None:
             return []
+        with self._lock.read():
+            store = self.vector_store
+            candidate_ids, _ = self._filter_index.resolve(filter_metadata)
+            lexical = self._lexical_index.search(
+                query, k, candidate_ids, excluded_ids=store.chunks.deleted_ids()
+            )
+            return self._format_hits(store, self._fuse([], lexical), k, filter_metadata)
+    
+    async def asearch_batch(
+        self,
+        queries: List[str],
+        k: int = 5,
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Version asynchrone de search_batch, exécutée dans le pool de recherche"""
+        async with self._pending_searches:
+            return await self._run_in_executor(
+                self._search_executor,
+                self.search_batch,
+                queries,
+                k=k,
+                filter_metadata=filter_metadata
+            )
+    
+    async def areload_index(self, force: bool = False) -> Dict[str, Any]:
+        """Version asynchrone de reload_index, sérialisée avec l'indexation"""
+        return await self._run_in_executor(self._index_executor, self.reload_index, force=force)
+    
+    async def aremove_document(self, source: str) -> Dict[str, Any]:
+        """Version asynchrone de remove_document, exécutée dans l'exécuteur d'indexation"""
+        return await self._run_in_executor(self._index_executor, self.remove_document, source)
+    
+    async def aindex_pdf(self, pdf_path: str, force_reindex: bool = False) -> Dict[str, Any]:
+        """Version asynchrone de index_pdf, exécutée dans l'exécuteur d'indexation"""
+        return await self._run_in_executor(
+            self._index_executor,
+            self.index_pdf,
+            pdf_path,
+            force_reindex=force_reindex
+        )
+    
+    def close(self):
+        """Arrête les exécuteurs (les tâches en cours se terminent)"""
+        self._closed.set()
+        self._search_executor.shutdown(wait=True)
+        self._index_executor.shutdown(wait=True)
     
     def get_index_stats(self) -> Dict[str, Any]:
         """Retourne des statistiques sur l'index FAISS"""
@@ -272,13 +2455,57 @@ class RAGSystem:
                 "index_name": self.index_name,
                 "index_exists": self.index_path.exists(),
                 "indexed_documents": len(self.indexed_hashes),
-                "documents": list(self.indexed_hashes.keys())
+                "documents": list(self.indexed_hashes.keys()),
+                "search_workers": self.search_workers,
+                "query_embedding_cache": self._query_embedding_cache.stats(),
+                "index_generation": self.index_generation,
+                "result_cache": self._result_cache.stats(),
+                "query_batching": self._batcher.stats() if self._batcher else None,
+                "filter_index": self._filter_index.stats(),
+                "index_config": {
+                    **self.index_config,
+                    "nprobe": self.nprobe,
+                    "ef_search": self.ef_search,
+                    "refine_k_factor": self.refine_k_factor
+                },
+                "index_mmapped": self._index_mmapped,
+                "deleted_chunks": {
+                    "count": len(self.vector_store.chunks.deleted_ids()) if self.vector_store else 0,
+                    "compact_ratio": self.compact_deleted_ratio,
+                    "compactions": self._compactions
+                },
+                "hot_reload": {
+                    "watch_interval": self.index_watch_interval,
+                    "changed_on_disk": self.index_changed_on_disk(),
+                    **self._reload_stats
+                },
+                "retrieval": {
+                    "mode": self.retrieval_mode,
+                    "rrf_k": self.rrf_k,
+                    "fusion_candidates": self.fusion_candidates,
+                    "lexical_fast_path": self.lexical_fast_path,
+                    "lexical_fast_path_hits": self._lexical_fast_path_hits
+                },
+                "lexical_index": self._lexical_index.stats(),
+                "rerank": self._reranker.stats() if self._reranker else None,
+                "merge_adjacent": {"enabled": self.merge_adjacent, "merged_chunks": self._merged_chunks},
+                "deduplication": {
+                    "enabled": self.deduplicate_chunks,
+                    "aliased_chunks": len(self.vector_store.aliases) if self.vector_store else 0,
+                    "collapse_duplicates": self.collapse_duplicates,
+                    "collapsed_results": self._collapsed_results
+                },
+                "search_latency": self._search_latency.stats(),
+                "embeddings": self.embeddings.stats() if self.embeddings else None,
+                "warmup": self.readiness()
             }
             
             if self.vector_store:
                 # Obtenir le nombre de vecteurs dans l'index
                 try:
                     stats["total_vectors"] = self.vector_store.index.ntotal
+                    stats["index"] = describe_index(self.vector_store.index)
+                    stats["chunk_store"] = self.vector_store.chunks.stats()
                 except:
                     stats["total_vectors"] = "unknown"
             
@@ -290,45 +2517,246 @@ class RAGSystem:
             }
 
 
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Formate un événement Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def stream_search_events(
+    rag_system: RAGSystem,
+    query: str,
+    k: int = 5,
+    filter_metadata: Optional[Dict[str, Any]] = None
+) -> AsyncIterator[str]:
+    """
+    Recherche en flux au format SSE (routes HTTP des serveurs): les
+    événements de asearch_stream ("partial", "result", puis "summary"), ou
+    seulement "summary" avec le statut "warming" pendant le warm-up
+    """
+    if not await rag_system.wait_ready(rag_system.warmup_wait):
+        yield _sse_event("summary", {
+            "query": query,
+            "status": rag_system.warmup_state,
+            "results_count": 0,
+            "readiness": rag_system.readiness()
+        })
+        return
+    
+    try:
+        async for event in rag_system.asearch_stream(query, k=k, filter_metadata=filter_metadata):
+            name = event.pop("event")
+            yield _sse_event(name, event)
+    except Exception as e:
+        logger.error(f"Streaming search failed: {e}")
+        yield _sse_event("error", {"query": query, "error": str(e)})
+
+
 def setup_rag_tool(mcp, rag_system: RAGSystem):
     """Configure l'outil RAG pour FastMCP"""
+    from fastmcp import Context
     
     @mcp.tool()
     async def search_book_knowledge(
         query: str,
         max_results: int = 5,
-        book_title: Optional[str] = None
+        book_title: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        max_chars: Optional[int] = None,
+        debug_timings: bool = False
     ) -> Dict[str, Any]:
         """
-        Search through the book's content using semantic search.
+        Search through the book's content using hybrid keyword and semantic search.
         
         Args:
             query: Your search query
             max_results: Maximum number of results to return (default: 5)
             book_title: Filter by specific book title (optional)
+            max_tokens: Approximate token budget for the returned text (optional,
+                about 4 characters per token; must be positive)
+            max_chars: Character budget for the returned text (optional; must
+                be positive)
+            debug_timings: Include per-stage latencies (ms) in the response
         
         Returns:
-            Relevant chunks from the book with similarity scores
+            Relevant chunks from the book with their scores, or
+            status "warming" if the knowledge base is still loading. With a
+            budget, the best chunks are packed into it, the last one cut at a
+            sentence boundary, and "packing" reports what was omitted.
+            
+            Every chunk carries a numeric ranking score: "fusion_score"
+            (reciprocal rank fusion, higher is better) in hybrid and lexical
+            mode, "similarity_score" in vector mode. In hybrid mode,
+            "similarity_score" (FAISS distance or inner product) and
+            "lexical_score" (BM25) are also given when available;
+            "similarity_score" is null only when the query was answered
+            without an embedding (lexical mode, exact-term fast path).
         """
         logger.info(f"RAG search requested: {query}")
+        started = time.perf_counter()
+        
+        # Pendant le warm-up, attendre brièvement puis répondre sans bloquer
+        if not await rag_system.wait_ready(rag_system.warmup_wait):
+            return {
+                "query": query,
+                "status": rag_system.warmup_state,
+                "results_count": 0,
+                "results": [],
+                "readiness": rag_system.readiness()
+            }
         
         # Préparer les filtres
         filter_metadata = None
         if book_title:
             filter_metadata = {"book_title": book_title}
         
-        # Effectuer la recherche
-        results = rag_system.search(
+        # Budget de taille de la réponse, validé avant la recherche
+        budget = budget_chars(max_tokens, max_chars)
+        
+        # Effectuer la recherche hors de la boucle d'événements
+        timings: Optional[Dict[str, float]] = {} if debug_timings else None
+        results = await rag_system.asearch(
             query=query,
             k=max_results,
-            filter_metadata=filter_metadata
+            filter_metadata=filter_metadata,
+            timings=timings
         )
         
-        return {
+        # Meilleurs chunks d'abord dans le budget
+        packing = None
+        if budget is not None:
+            packing_started = time.perf_counter()
+            results, packing = pack_results(results, budget)
+            if timings is not None:
+                timings["packing"] = round((time.perf_counter() - packing_started) * 1000, 3)
+        
+        response = {
             "query": query,
             "results_count": len(results),
             "results": results
         }
+        if packing is not None:
+            response["packing"] = packing
+        if timings is not None:
+            # Coût de l'encodage JSON de la réponse, mesuré à part (mode debug)
+            serialize_started = time.perf_counter()
+            json.dumps(response, ensure_ascii=False, default=str)
+            timings["serialize"] = round((time.perf_counter() - serialize_started) * 1000, 3)
+            timings["request_total"] = round((time.perf_counter() - started) * 1000, 3)
+            response["metadata"] = {"timings_ms": timings}
+        return response
+    
+    @mcp.tool()
+    async def search_book_knowledge_batch(
+        queries: List[str],
+        max_results: int = 5,
+        book_title: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Search the book's content for several queries in a single call.
+        
+        Prefer this over repeated search_book_knowledge calls when looking up
+        many blood markers or symptoms at once.
+        
+        Args:
+            queries: List of search queries
+            max_results: Maximum number of results to return per query (default: 5)
+            book_title: Filter by specific book title (optional)
+        
+        Returns:
+            Relevant chunks grouped by query, with the same scores as
+            search_book_knowledge, or status "warming" if the knowledge base
+            is still loading
+        """
+        logger.info(f"RAG batch search requested: {len(queries)} queries")
+        
+        # Pendant le warm-up, attendre brièvement puis répondre sans bloquer
+        if not await rag_system.wait_ready(rag_system.warmup_wait):
+            return {
+                "queries_count": len(queries),
+                "status": rag_system.warmup_state,
+                "results": [],
+                "readiness": rag_system.readiness()
+            }
+        
+        # Préparer les filtres
+        filter_metadata = None
+        if book_title:
+            filter_metadata = {"book_title": book_title}
+        
+        # Un seul encodage et une seule recherche FAISS pour toutes les requêtes
+        batch_results = await rag_system.asearch_batch(
+            queries=queries,
+            k=max_results,
+            filter_metadata=filter_metadata
+        )
+        
+        return {
+            "queries_count": len(queries),
+            "results": [
+                {
+                    "query": query,
+                    "results_count": len(results),
+                    "results": results
+                }
+                for query, results in zip(queries, batch_results)
+            ]
+        }
+    
+    @mcp.tool()
+    async def search_book_knowledge_stream(
+        query: str,
+        ctx: Context,
+        max_results: int = 5,
+        book_title: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Search the book's content and stream chunks before the search ends.
+        
+        Each chunk is sent as an MCP progress notification whose message is
+        the JSON-encoded event. In hybrid mode, exact-term (BM25) matches
+        arrive first as "partial" events, before the query is embedded;
+        the final ranking follows as "result" events. Partial chunks are
+        not deduplicated and may be dropped from the final ranking.
+        
+        Args:
+            query: Your search query
+            max_results: Maximum number of results to return (default: 5)
+            book_title: Filter by specific book title (optional)
+        
+        Returns:
+            The summary of the search (result count and timings), or status
+            "warming" if the knowledge base is still loading. Clients that
+            do not track progress also get the final results in "results".
+        """
+        logger.info(f"RAG streaming search requested: {query}")
+        
+        # Pendant le warm-up, attendre brièvement puis répondre sans bloquer
+        if not await rag_system.wait_ready(rag_system.warmup_wait):
+            return {
+                "query": query,
+                "status": rag_system.warmup_state,
+                "results_count": 0,
+                "readiness": rag_system.readiness()
+            }
+        
+        filter_metadata = {"book_title": book_title} if book_title else None
+        # Sans jeton de progression, report_progress n'envoie rien: les
+        # résultats vont alors dans la réponse finale
+        meta = ctx.request_context.meta if ctx.request_context else None
+        tracks_progress = meta is not None and meta.progressToken is not None
+        results = []
+        sent = 0
+        async for event in rag_system.asearch_stream(query, k=max_results, filter_metadata=filter_metadata):
+            if event["event"] == "summary":
+                del event["event"]
+                return event if tracks_progress else {**event, "results": results}
+            if event["event"] == "result":
+                results.append({key: value for key, value in event.items() if key not in ("event", "rank")})
+            sent += 1
+            await ctx.report_progress(
+                progress=sent,
+                message=json.dumps(event, ensure_ascii=False, default=str)
+            )
     
     # @mcp.tool()
     # async def get_rag_stats() -> Dict[str, Any]:
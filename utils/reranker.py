@@ -0,0 +1,181 @@
+# =======================
+# RE-RANKING MODULE
+# =======================
+
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from utils.faiss_index import enable_reconstruction
+
+logger = logging.getLogger(__name__)
+
+# Candidats re-scorés par appel au re-classeur (le budget est vérifié entre deux lots)
+RERANK_BATCH_SIZE = 16
+
+Hits = List[Tuple[int, Dict[str, Any]]]
+
+
+class Reranker(ABC):
+    """
+    Interface des re-classeurs du second étage: re-score des candidats
+    (ids de chunks) pour une requête, plus haut = plus pertinent
+    """
+
+    name = "base"
+
+    def prepare(self, vector_store):
+        """Prépare un vector store chargé ou reconstruit (sous le verrou d'écriture)"""
+
+    @abstractmethod
+    def score(self, query: str, query_vector: np.ndarray, chunk_ids: List[int], vector_store) -> np.ndarray:
+        """Scores des candidats `chunk_ids`, dans leur ordre"""
+
+
+class ExactVectorReranker(Reranker):
+    """
+    Re-score sur les vecteurs reconstruits par l'index FAISS: donne un score
+    vectoriel aux candidats venus de la seule recherche BM25. Exact pour les
+    index qui stockent les vecteurs en float32 (Flat, IVF*,Flat, HNSW*) ou
+    avec un raffinement ",RFlat"; sur un index PQ/SQ sans raffinement, les
+    vecteurs reconstruits sont ceux décodés, aussi approximatifs que la
+    recherche du premier étage.
+    """
+
+    name = "vectors"
+
+    def prepare(self, vector_store):
+        # Les index IVF ne reconstruisent un vecteur qu'avec une table directe
+        enable_reconstruction(vector_store.index)
+
+    def score(self, query: str, query_vector: np.ndarray, chunk_ids: List[int], vector_store) -> np.ndarray:
+        index = vector_store.index
+        candidates = index.reconstruct_batch(np.asarray(chunk_ids, dtype=np.int64))
+        if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            return candidates @ query_vector
+        return -((candidates - query_vector) ** 2).sum(axis=1)
+
+
+class CrossEncoderReranker(Reranker):
+    """Cross-encoder sentence-transformers: lit la requête et le chunk ensemble"""
+
+    name = "cross-encoder"
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name
+        self._model = CrossEncoder(model_name, device="cpu")
+
+    def score(self, query: str, query_vector: np.ndarray, chunk_ids: List[int], vector_store) -> np.ndarray:
+        pairs = [(query, vector_store.chunks.get_text(chunk_id)) for chunk_id in chunk_ids]
+        return np.asarray(self._model.predict(pairs, batch_size=RERANK_BATCH_SIZE), dtype=np.float32)
+
+
+def create_reranker(name: str, model_name: Optional[str] = None) -> Reranker:
+    """
+    Crée le re-classeur demandé
+
+    Args:
+        name: "vectors" (re-score exact sur les vecteurs de l'index) ou
+            "cross-encoder"
+        model_name: Modèle du cross-encoder
+    """
+    if name == "vectors":
+        return ExactVectorReranker()
+    if name == "cross-encoder":
+        return CrossEncoderReranker(model_name or "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    raise ValueError(f"Unknown reranker: {name}")
+
+
+class BudgetedReranker:
+    """
+    Second étage de recherche sous budget de temps: les candidats du premier
+    étage sont re-scorés par lots, dans leur ordre de premier étage, tant que
+    le budget le permet. Le coût moyen par candidat (moyenne mobile) limite
+    d'avance le nombre de candidats re-scorés; le reste garde l'ordre du
+    premier étage, après les candidats re-scorés. Sous charge, la recherche
+    se dégrade donc vers le classement du premier étage au lieu de dépasser
+    le SLO de latence.
+    """
+
+    def __init__(self, reranker: Reranker, candidates: int = 50, budget_ms: float = 50.0):
+        self.reranker = reranker
+        self.candidates = candidates
+        self.budget_ms = budget_ms
+        self._ms_per_candidate: Optional[float] = None
+        self._stats_lock = threading.Lock()
+        self._stats = {"queries": 0, "reranked_candidates": 0, "degraded": 0, "skipped": 0}
+
+    def rerank(self, query: str, query_vector: np.ndarray, hits: Hits, vector_store) -> Hits:
+        """
+        Re-classe les candidats du premier étage (à appeler sous le verrou de lecture)
+
+        Returns:
+            Les candidats re-scorés (avec "rerank_score") par score décroissant,
+            puis les autres dans l'ordre du premier étage
+        """
+        started = time.perf_counter()
+        limit = min(len(hits), self.candidates)
+        if self._ms_per_candidate:
+            affordable = int(self.budget_ms / self._ms_per_candidate)
+            if affordable < 2:
+                # Budget insuffisant pour changer l'ordre: premier étage seul. Le
+                # coût estimé décroît pour réessayer une fois la charge retombée.
+                with self._stats_lock:
+                    self._ms_per_candidate *= 0.9
+                    self._stats["queries"] += 1
+                    self._stats["skipped"] += 1
+                return [(chunk_id, {**scores, "rerank_score": None}) for chunk_id, scores in hits]
+            limit = min(limit, affordable)
+        if limit == 0:
+            return hits
+
+        deadline = started + self.budget_ms / 1000
+        scored: List[Tuple[float, int]] = []
+        for start in range(0, limit, RERANK_BATCH_SIZE):
+            if start and time.perf_counter() > deadline:
+                break
+            batch = [chunk_id for chunk_id, _ in hits[start:min(start + RERANK_BATCH_SIZE, limit)]]
+            scores = self.reranker.score(query, query_vector, batch, vector_store)
+            scored.extend((float(score), start + offset) for offset, score in enumerate(scores))
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        cost = elapsed_ms / len(scored)
+        with self._stats_lock:
+            self._ms_per_candidate = (
+                cost if self._ms_per_candidate is None else 0.8 * self._ms_per_candidate + 0.2 * cost
+            )
+            self._stats["queries"] += 1
+            self._stats["reranked_candidates"] += len(scored)
+            self._stats["degraded"] += len(scored) < min(len(hits), self.candidates)
+
+        # Score décroissant, puis rang du premier étage
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        reranked = [
+            (hits[position][0], {**hits[position][1], "rerank_score": score})
+            for score, position in scored
+        ]
+        remainder = [
+            (chunk_id, {**scores, "rerank_score": None})
+            for chunk_id, scores in hits[len(scored):]
+        ]
+        return reranked + remainder
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs du second étage et coût moyen par candidat"""
+        with self._stats_lock:
+            return {
+                "reranker": self.reranker.name,
+                "candidates": self.candidates,
+                "budget_ms": self.budget_ms,
+                "ms_per_candidate": (
+                    round(self._ms_per_candidate, 4) if self._ms_per_candidate else None
+                ),
+                **self._stats
+            }
@@ -0,0 +1,131 @@
+# =======================
+# LATENCY INSTRUMENTATION MODULE
+# =======================
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+# Bornes supérieures des classes d'histogramme (ms), échelle ~logarithmique:
+# du cache chaud (< 0,1 ms) au chargement à froid d'un modèle (secondes)
+BUCKET_BOUNDS_MS = (
+    0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000
+)
+
+
+class LatencyHistogram:
+    """
+    Histogramme de latences à classes fixes, thread-safe: mémoire constante
+    quel que soit le nombre de mesures, percentiles estimés par la borne
+    supérieure de leur classe
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, duration_ms: float):
+        """Ajoute une mesure"""
+        bucket = bisect.bisect_left(BUCKET_BOUNDS_MS, duration_ms)
+        with self._lock:
+            self._counts[bucket] += 1
+            self.count += 1
+            self.total_ms += duration_ms
+            self.max_ms = max(self.max_ms, duration_ms)
+
+    def _percentile(self, counts, count: int, fraction: float) -> float:
+        rank = fraction * count
+        seen = 0
+        for bucket, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= rank:
+                return BUCKET_BOUNDS_MS[bucket] if bucket < len(BUCKET_BOUNDS_MS) else self.max_ms
+        return self.max_ms
+
+    def stats(self) -> Dict[str, Any]:
+        """Nombre de mesures, moyenne, max, p50/p95/p99 et effectifs par classe"""
+        with self._lock:
+            counts = list(self._counts)
+            count, total_ms, max_ms = self.count, self.total_ms, self.max_ms
+        if not count:
+            return {"count": 0}
+        buckets = {
+            f"le_{bound:g}ms": bucket_count
+            for bound, bucket_count in zip(BUCKET_BOUNDS_MS, counts)
+            if bucket_count
+        }
+        if counts[-1]:
+            buckets["inf"] = counts[-1]
+        return {
+            "count": count,
+            "mean_ms": round(total_ms / count, 3),
+            "max_ms": round(max_ms, 3),
+            "p50_ms": self._percentile(counts, count, 0.50),
+            "p95_ms": self._percentile(counts, count, 0.95),
+            "p99_ms": self._percentile(counts, count, 0.99),
+            "buckets": buckets
+        }
+
+
+class StageLatencies:
+    """Un histogramme par étape du chemin de recherche, créé à la première mesure"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, LatencyHistogram] = {}
+
+    def record(self, timings: Dict[str, float]):
+        """Ajoute les durées (ms) d'une exécution, par étape"""
+        for stage, duration_ms in timings.items():
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                with self._lock:
+                    histogram = self._histograms.setdefault(stage, LatencyHistogram())
+            histogram.record(duration_ms)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Statistiques de chaque étape"""
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {stage: histogram.stats() for stage, histogram in histograms.items()}
+
+
+class StageTimer:
+    """
+    Chronomètre d'une exécution découpée en étapes: les durées d'une même
+    étape (mesurée dans une boucle) s'additionnent
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Mesure le bloc comme (une partie de) l'étape `name`"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - started) * 1000)
+
+    def add(self, name: str, duration_ms: float):
+        self.timings[name] = self.timings.get(name, 0.0) + duration_ms
+
+    def finish(self, latencies: Optional[StageLatencies] = None) -> Dict[str, float]:
+        """
+        Clôt la mesure: ajoute l'étape "total" et enregistre les durées dans
+        les histogrammes
+
+        Returns:
+            Les durées par étape (ms), arrondies
+        """
+        self.add("total", (time.perf_counter() - self.started) * 1000)
+        if latencies is not None:
+            latencies.record(self.timings)
+        return {stage: round(duration_ms, 3) for stage, duration_ms in self.timings.items()}